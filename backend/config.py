@@ -4,11 +4,65 @@ from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
     docker_host: str = "unix:///var/run/docker.sock"
+    cluster_name: str = "local"
+    clusters: dict[str, str] = {}
+    cluster_timeout: float = 10.0
+    docker_read_timeout: float = 10.0
+    docker_write_timeout: float = 60.0
+    docker_stream_timeout: float = 1800.0
+    docker_read_retries: int = 2
+    docker_retry_backoff: float = 0.2
+    breaker_failure_threshold: int = 5
+    breaker_reset_timeout: float = 30.0
     registry_url: str = "http://localhost:5000"
+    registry_aliases: list[str] = []
+    pin_image_digests: bool = True
+    digest_cache_ttl: float = 30.0
+    registry_concurrency: int = 8
+    registry_delete_rate: float = 5.0
     database_path: str = "./data/swarm_orchestrator.db"
     definitions_dir: str = "./definitions"
+    definitions_exclude: list[str] = []
+    sync_definitions_on_startup: bool = True
     projects_dir: str = "/projects"
     health_check_interval: int = 30
+    autoscale_interval: int = 30
+    stats_enabled: bool = True
+    stats_interval: int = 15
+    stats_buffer_size: int = 240
+    stats_workers: int = 16
+    stats_node_rate: float = 20.0
+    stats_node_docker_port: int = 0
+    autoscale_dry_run: bool = False
+    task_events_enabled: bool = True
+    task_events_interval: int = 15
+    task_events_retention_days: int = 7
+    log_archive_services: list[str] = []
+    log_archive_path: str = "./data/log_archive.db"
+    log_archive_retention_days: int = 7
+    log_archive_batch_size: int = 500
+    log_archive_flush_interval: float = 2.0
+    cluster_state_ttl: float = 5.0
+    scale_concurrency: int = 8
+    scale_conflict_retries: int = 3
+    prewarm_concurrency: int = 4
+    prewarm_timeout: float = 600.0
+    evacuation_timeout: float = 900.0
+    drain_timeout: float = 600.0
+    stack_deploy_concurrency: int = 8
+    task_logs_concurrency: int = 8
+    job_concurrency: dict[str, int] = {}
+    job_poll_interval: float = 1.0
+    job_lease_timeout: float = 30.0
+    job_max_attempts: int = 3
+    job_retention_days: int = 7
+    leader_election: bool = True
+    leader_lease_ttl: float = 15.0
+    leader_renew_interval: float = 5.0
+    mcp_page_size: int = 50
+    mcp_max_page_size: int = 500
+    mcp_max_log_bytes: int = 65536
+    mcp_watch_interval: float = 10.0
     host: str = "0.0.0.0"
     port: int = 8080
 
@@ -20,6 +74,12 @@ class Settings(BaseSettings):
         p.parent.mkdir(parents=True, exist_ok=True)
         return p
 
+    @property
+    def log_archive_db_path(self) -> Path:
+        p = Path(self.log_archive_path)
+        p.parent.mkdir(parents=True, exist_ok=True)
+        return p
+
     @property
     def defs_path(self) -> Path:
         return Path(self.definitions_dir)
@@ -1,9 +1,15 @@
 from __future__ import annotations
 
-import aiosqlite
+import hashlib
+import json
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING
 
 from backend.config import settings
 
+if TYPE_CHECKING:
+    import aiosqlite
+
 _DB_SCHEMA = """
 CREATE TABLE IF NOT EXISTS catalog_services (
     name TEXT PRIMARY KEY,
@@ -12,21 +18,259 @@ CREATE TABLE IF NOT EXISTS catalog_services (
     status TEXT NOT NULL DEFAULT 'registered',
     swarm_id TEXT,
     created_at TEXT NOT NULL,
-    updated_at TEXT NOT NULL
+    updated_at TEXT NOT NULL,
+    version INTEGER NOT NULL DEFAULT 0,
+    image_digest TEXT
+);
+
+-- Indexes for catalog queries. The json_extract expression must match the one
+-- in catalog.query_services exactly for SQLite to use the index.
+CREATE INDEX IF NOT EXISTS idx_catalog_status ON catalog_services (status, name);
+CREATE INDEX IF NOT EXISTS idx_catalog_updated ON catalog_services (updated_at);
+CREATE INDEX IF NOT EXISTS idx_catalog_image ON catalog_services (json_extract(definition, '$.image'));
+
+-- definition.labels flattened so label filters are index lookups; kept in step
+-- with catalog_services by triggers, whichever code path writes the row
+CREATE TABLE IF NOT EXISTS catalog_labels (
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    name TEXT NOT NULL,
+    PRIMARY KEY (key, value, name)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_catalog_labels_name ON catalog_labels (name);
+
+CREATE TRIGGER IF NOT EXISTS catalog_labels_insert AFTER INSERT ON catalog_services BEGIN
+    INSERT OR IGNORE INTO catalog_labels (key, value, name)
+    SELECT j.key, j.value, NEW.name FROM json_each(NEW.definition, '$.labels') j;
+END;
+CREATE TRIGGER IF NOT EXISTS catalog_labels_update AFTER UPDATE OF definition ON catalog_services BEGIN
+    DELETE FROM catalog_labels WHERE name = OLD.name;
+    INSERT OR IGNORE INTO catalog_labels (key, value, name)
+    SELECT j.key, j.value, NEW.name FROM json_each(NEW.definition, '$.labels') j;
+END;
+CREATE TRIGGER IF NOT EXISTS catalog_labels_delete AFTER DELETE ON catalog_services BEGIN
+    DELETE FROM catalog_labels WHERE name = OLD.name;
+END;
+
+-- Backfill catalogs created before catalog_labels existed
+INSERT OR IGNORE INTO catalog_labels (key, value, name)
+SELECT j.key, j.value, s.name FROM catalog_services s, json_each(s.definition, '$.labels') j
+WHERE NOT EXISTS (SELECT 1 FROM catalog_labels);
+
+-- Definition history. Blobs are content-addressed by the SHA-256 of their
+-- canonical JSON, so a definition returned to, or shared by several services,
+-- is stored once; catalog_services.version points at the current version.
+CREATE TABLE IF NOT EXISTS definition_blobs (
+    hash TEXT PRIMARY KEY,
+    definition TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS service_versions (
+    name TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    hash TEXT NOT NULL,
+    source TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    PRIMARY KEY (name, version)
+);
+CREATE INDEX IF NOT EXISTS idx_service_versions_hash ON service_versions (hash);
+CREATE TRIGGER IF NOT EXISTS service_versions_delete AFTER DELETE ON catalog_services BEGIN
+    DELETE FROM service_versions WHERE name = OLD.name;
+    DELETE FROM definition_blobs WHERE hash NOT IN (SELECT hash FROM service_versions);
+END;
+
+-- Background jobs (services/jobs.py). owner and heartbeat_at form the lease of
+-- the runner executing a job; a stale heartbeat means the runner is gone.
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    type TEXT NOT NULL,
+    params TEXT NOT NULL,
+    status TEXT NOT NULL,
+    progress REAL NOT NULL DEFAULT 0,
+    message TEXT NOT NULL DEFAULT '',
+    result TEXT,
+    error TEXT NOT NULL DEFAULT '',
+    attempt INTEGER NOT NULL DEFAULT 0,
+    owner TEXT,
+    heartbeat_at TEXT,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    created_at TEXT NOT NULL,
+    started_at TEXT,
+    finished_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at);
+CREATE INDEX IF NOT EXISTS idx_jobs_created ON jobs (created_at);
+CREATE TABLE IF NOT EXISTS job_logs (
+    job_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    ts TEXT NOT NULL,
+    line TEXT NOT NULL,
+    PRIMARY KEY (job_id, seq)
+) WITHOUT ROWID;
+
+-- Leader election (services/leader.py): the holder renews expires_at, and any
+-- process may take the lease once it has passed.
+CREATE TABLE IF NOT EXISTS leases (
+    name TEXT PRIMARY KEY,
+    holder TEXT NOT NULL,
+    term INTEGER NOT NULL,
+    acquired_at TEXT NOT NULL,
+    renewed_at TEXT NOT NULL,
+    expires_at TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS gc_plans (
+    id TEXT PRIMARY KEY,
+    created_at TEXT NOT NULL,
+    plan TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS autoscale_decisions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    service TEXT NOT NULL,
+    decision TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_autoscale_decisions_service ON autoscale_decisions (service, id);
+-- When each service was last scaled by the autoscaler, for its cooldown (unix time)
+CREATE TABLE IF NOT EXISTS autoscale_scaled (
+    service TEXT PRIMARY KEY,
+    scaled_at REAL NOT NULL
+);
+
+-- Stats sampling rounds (services/stats_collector.py), replayed by non-leader processes
+CREATE TABLE IF NOT EXISTS stats_rounds (
+    ts REAL PRIMARY KEY,
+    data TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS image_warmups (
+    id TEXT PRIMARY KEY,
+    created_at TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    warmup TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS definition_files (
+    path TEXT PRIMARY KEY,
+    service_name TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    synced_at TEXT NOT NULL,
+    missing INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS saved_replicas (
+    scope TEXT NOT NULL,
+    service TEXT NOT NULL,
+    replicas INTEGER NOT NULL,
+    saved_at TEXT NOT NULL,
+    PRIMARY KEY (scope, service)
+);
+
+CREATE TABLE IF NOT EXISTS registry_tags (
+    repository TEXT NOT NULL,
+    tag TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    PRIMARY KEY (repository, tag)
+);
+
+-- Manifests are immutable, so one fetched by digest never needs fetching again
+CREATE TABLE IF NOT EXISTS registry_manifests (
+    digest TEXT PRIMARY KEY,
+    media_type TEXT NOT NULL DEFAULT '',
+    fetched_at TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS registry_manifest_blobs (
+    manifest_digest TEXT NOT NULL,
+    blob_digest TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    PRIMARY KEY (manifest_digest, blob_digest)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS task_events (
+    id INTEGER PRIMARY KEY,
+    cluster TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    service TEXT NOT NULL,
+    slot INTEGER,
+    node_id TEXT NOT NULL,
+    state TEXT NOT NULL,
+    desired_state TEXT NOT NULL,
+    exit_code INTEGER,
+    error TEXT NOT NULL DEFAULT '',
+    message TEXT NOT NULL DEFAULT '',
+    ts TEXT NOT NULL,
+    UNIQUE (task_id, state)
 );
+CREATE INDEX IF NOT EXISTS idx_task_events_service ON task_events (service, ts);
+CREATE INDEX IF NOT EXISTS idx_task_events_node ON task_events (node_id, ts);
+-- Restart and failure counts only read ended tasks; keep this predicate in
+-- step with task_events._ENDED_SQL or the planner will not use the index
+CREATE INDEX IF NOT EXISTS idx_task_events_ended ON task_events (ts)
+    WHERE state IN ('complete', 'failed', 'rejected', 'orphaned');
 """
 
 
+_schema_ready = False
+
+
+def definition_digest(definition: str) -> tuple[str, str]:
+    """(canonical JSON, SHA-256 hex) of a stored definition; key order does not matter."""
+    canonical = json.dumps(json.loads(definition), sort_keys=True, separators=(",", ":"))
+    return canonical, hashlib.sha256(canonical.encode()).hexdigest()
+
+
+async def _migrate(db: aiosqlite.Connection) -> None:
+    """Bring an older database up to the current schema. Runs inside BEGIN IMMEDIATE, see get_db."""
+    columns = {r["name"] for r in await db.execute_fetchall("PRAGMA table_info(catalog_services)")}
+    if "version" not in columns:
+        await db.execute("ALTER TABLE catalog_services ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+    if "image_digest" not in columns:
+        await db.execute("ALTER TABLE catalog_services ADD COLUMN image_digest TEXT")
+    columns = {r["name"] for r in await db.execute_fetchall("PRAGMA table_info(definition_files)")}
+    if "missing" not in columns:
+        await db.execute("ALTER TABLE definition_files ADD COLUMN missing INTEGER NOT NULL DEFAULT 0")
+    # Services from before definition history start it with their current definition
+    rows = await db.execute_fetchall("SELECT name, definition FROM catalog_services WHERE version = 0")
+    now = datetime.now(timezone.utc).isoformat()
+    for r in rows:
+        canonical, digest = definition_digest(r["definition"])
+        await db.execute("INSERT OR IGNORE INTO definition_blobs (hash, definition) VALUES (?, ?)", (digest, canonical))
+        await db.execute(
+            "INSERT OR IGNORE INTO service_versions (name, version, hash, source, created_at)"
+            " VALUES (?, 1, ?, 'initial', ?)",
+            (r["name"], digest, now),
+        )
+        await db.execute("UPDATE catalog_services SET version = 1 WHERE name = ?", (r["name"],))
+
+
 async def get_db() -> aiosqlite.Connection:
+    """Open a connection, creating the schema on first use in this process."""
+    global _schema_ready
+    import aiosqlite
+
     db = await aiosqlite.connect(str(settings.db_path))
     db.row_factory = aiosqlite.Row
+    if not _schema_ready:
+        try:
+            await db.executescript(_DB_SCHEMA)
+            # Other connections or processes may be migrating the same file; the
+            # write lock makes them take turns, and each re-reads the columns under it
+            await db.execute("BEGIN IMMEDIATE")
+            try:
+                await _migrate(db)
+                await db.commit()
+            except Exception:
+                await db.rollback()
+                raise
+        except Exception:
+            await db.close()
+            raise
+        _schema_ready = True
     return db
 
 
 async def init_db() -> None:
     db = await get_db()
-    try:
-        await db.executescript(_DB_SCHEMA)
-        await db.commit()
-    finally:
-        await db.close()
+    await db.close()
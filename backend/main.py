@@ -1,31 +1,106 @@
 from __future__ import annotations
 
+import asyncio
 import logging
 from contextlib import asynccontextmanager
 from pathlib import Path
 
-from fastapi import FastAPI, Request
+from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
-from fastapi.staticfiles import StaticFiles
 
+from backend.config import settings
 from backend.database import init_db
-from backend.routers import health, nodes, projects, registry, services, stacks
+from backend.routers import (
+    autoscaling,
+    clusters,
+    definitions,
+    events,
+    health,
+    jobs,
+    logs,
+    nodes,
+    placement,
+    projects,
+    registry,
+    services,
+    stacks,
+    stats,
+)
+from backend.services import job_handlers  # noqa: F401  (registers the job types)
+from backend.services.autoscaler import autoscaler
+from backend.services.clusters import clusters as cluster_registry
+from backend.services.definition_sync import sync_definitions
 from backend.services.docker_client import swarm_client
 from backend.services.health_monitor import health_monitor
+from backend.services.jobs import job_runner
+from backend.services.leader import leader
+from backend.services.log_archive import log_archive
+from backend.services.stats_collector import stats_collector
+from backend.services.task_events import task_event_recorder
+from backend.spa import SpaFiles
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
 logger = logging.getLogger(__name__)
 
 
+async def _start_leader_work() -> None:
+    """Loops that poll Docker and write to the database; they run in the leader only."""
+    if settings.sync_definitions_on_startup and leader.leading():
+        try:
+            await sync_definitions()
+        except Exception as e:
+            logger.error("Definitions sync failed: %s", e)
+    await health_monitor.start()
+    await autoscaler.start()
+    if settings.task_events_enabled:
+        await task_event_recorder.start()
+    await log_archive.start()
+    await job_runner.start()
+    # Other processes answer /api/stats from the rounds the collector stores
+    if settings.stats_enabled:
+        await stats_collector.start()
+
+
+async def _stop_leader_work() -> None:
+    await stats_collector.stop()
+    await job_runner.stop()
+    await log_archive.stop()
+    await task_event_recorder.stop()
+    await autoscaler.stop()
+    await health_monitor.stop()
+
+
+async def _start_subsystems(app: FastAPI) -> None:
+    """Bring up the database and background loops once the server is accepting requests."""
+    try:
+        await init_db()
+        if settings.leader_election:
+            await leader.start(_start_leader_work, _stop_leader_work)
+        else:
+            await _start_leader_work()
+    except Exception as e:
+        logger.error("Startup failed: %s", e)
+        app.state.startup = f"error: {e}"
+        return
+    app.state.startup = "ok"
+    logger.info("Startup complete")
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logger.info("Starting swarm-orchestrator")
-    await init_db()
-    await health_monitor.start()
+    app.state.startup = "pending"
+    startup = asyncio.create_task(_start_subsystems(app))
     yield
-    await health_monitor.stop()
+    startup.cancel()
+    try:
+        await startup
+    except asyncio.CancelledError:
+        pass
+    await leader.stop()
+    await _stop_leader_work()
     swarm_client.close()
+    cluster_registry.close()
     logger.info("Swarm-orchestrator stopped")
 
 
@@ -44,16 +119,17 @@ app.include_router(services.router)
 app.include_router(stacks.router)
 app.include_router(registry.router)
 app.include_router(projects.router)
+app.include_router(definitions.router)
+app.include_router(placement.router)
+app.include_router(autoscaling.router)
+app.include_router(stats.router)
+app.include_router(clusters.router)
+app.include_router(events.router)
+app.include_router(logs.router)
+app.include_router(jobs.router)
 
-# Serve frontend static files if the dist directory exists
+# Serve the frontend build if the dist directory exists; mounted last, so only
+# requests no API route matched reach it
 _frontend_dist = Path(__file__).parent.parent / "frontend" / "dist"
 if _frontend_dist.is_dir():
-    app.mount("/assets", StaticFiles(directory=str(_frontend_dist / "assets")), name="assets")
-
-    @app.get("/{path:path}")
-    async def serve_spa(request: Request, path: str):
-        # Serve the file if it exists, otherwise return index.html for SPA routing
-        file_path = _frontend_dist / path
-        if path and file_path.is_file():
-            return FileResponse(file_path)
-        return FileResponse(_frontend_dist / "index.html")
+    app.mount("/", SpaFiles(_frontend_dist), name="spa")
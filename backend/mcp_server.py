@@ -2,65 +2,212 @@
 from __future__ import annotations
 
 import asyncio
-import json
+import logging
+from dataclasses import fields
+from datetime import datetime, timedelta, timezone
+from typing import TYPE_CHECKING, Any, Callable
 
+import orjson
 from mcp.server.fastmcp import FastMCP
 
-from backend.database import init_db
-from backend.models.schemas import ServiceCreate, ServiceDefinition
-from backend.services import catalog
+from backend.config import settings
+from backend.models.schemas import BatchScaleRequest, ServiceCreate, ServiceDefinition
+from backend.services import batch_scale, catalog, jobs, log_archive
+from backend.services import job_handlers  # noqa: F401  (registers the job types)
+from backend.services.cluster_state import cluster_state
+from backend.services.definition_sync import sync_definitions
 from backend.services.docker_client import swarm_client
+from backend.services.jobs import job_runner
 from backend.services.registry_client import registry_client
 
+if TYPE_CHECKING:
+    from mcp.server.session import ServerSession
+
+logger = logging.getLogger(__name__)
+
 mcp = FastMCP("swarm-orchestrator", instructions="Docker Swarm management tools")
 
+# Resource URI -> cluster_state kind ("catalog" is read from the database instead)
+RESOURCES = {
+    "swarm://nodes": "nodes",
+    "swarm://services": "services",
+    "swarm://stacks": "stacks",
+    "catalog://services": "catalog",
+}
+
+_subscriptions: dict[str, set[ServerSession]] = {}
+
+
+def _dumps(obj: Any) -> str:
+    return orjson.dumps(obj, default=str).decode()
+
+
+def _page(items: list[Any], key: Callable[[Any], str], limit: int, cursor: str | None) -> dict:
+    """Slice items (already sorted by key) after cursor into a bounded page."""
+    limit = max(1, min(limit, settings.mcp_max_page_size))
+    if cursor:
+        items = [i for i in items if key(i) > cursor]
+    page = items[:limit]
+    next_cursor = key(page[-1]) if len(items) > limit else None
+    return {"items": page, "next_cursor": next_cursor}
+
+
+def _node_summary(node, include_services: bool = False) -> dict:
+    data = {f.name: getattr(node, f.name) for f in fields(node) if f.name != "services"}
+    data["service_count"] = len(node.services)
+    if include_services:
+        data["services"] = node.services
+    return data
+
+
+def _catalog_summary(svc) -> dict:
+    data = svc.model_dump(mode="json", include={"name", "status", "swarm_id", "updated_at"})
+    data["image"] = svc.definition.image
+    data["replicas"] = svc.definition.replicas
+    return data
+
 
 @mcp.tool()
-async def list_services() -> str:
-    """List all services in the catalog with their current status."""
-    services = await catalog.list_services()
-    return json.dumps([s.model_dump(mode="json") for s in services], indent=2)
+async def list_services(
+    status: str | None = None,
+    name_prefix: str | None = None,
+    include_definition: bool = False,
+    limit: int = settings.mcp_page_size,
+    cursor: str | None = None,
+) -> str:
+    """List catalog services with their current status, one page at a time.
+
+    Pass the returned next_cursor back as cursor to fetch the following page.
+    Set include_definition to return full service definitions instead of summaries.
+    """
+    limit = max(1, min(limit, settings.mcp_max_page_size))
+    try:
+        services, next_cursor = await catalog.query_services(
+            status=status, name_prefix=name_prefix, limit=limit, cursor=cursor
+        )
+    except ValueError:
+        return _dumps({"error": f"Unknown status '{status}'"})
+    items = [s.model_dump(mode="json") if include_definition else _catalog_summary(s) for s in services]
+    return _dumps({"items": items, "next_cursor": next_cursor})
 
 
 @mcp.tool()
 async def deploy_service(name: str, image: str, replicas: int = 1, ports: list[str] | None = None) -> str:
-    """Deploy a service to the swarm. Creates it in the catalog if it doesn't exist."""
+    """Queue a deploy of a service to the swarm. Creates it in the catalog if it doesn't exist.
+
+    Returns the job at once; follow it with get_job.
+    """
     existing = await catalog.get_service(name)
     if not existing:
         defn = ServiceDefinition(image=image, replicas=replicas, ports=ports or [])
         await catalog.create_service(ServiceCreate(name=name, definition=defn))
-        existing = await catalog.get_service(name)
 
-    swarm_id = swarm_client.deploy_service(name, existing.definition)
-    return json.dumps({"status": "deployed", "name": name, "swarm_id": swarm_id})
+    job = await job_runner.submit("deploy", {"name": name})
+    return _dumps(job.model_dump(mode="json"))
 
 
 @mcp.tool()
 async def stop_service(name: str) -> str:
     """Stop a running service by removing it from the swarm."""
-    success = swarm_client.remove_service(name)
-    return json.dumps({"status": "stopped" if success else "failed", "name": name})
+    success = await asyncio.to_thread(swarm_client.remove_service, name)
+    cluster_state.invalidate()
+    return _dumps({"status": "stopped" if success else "failed", "name": name})
 
 
 @mcp.tool()
 async def scale_service(name: str, replicas: int) -> str:
-    """Scale a service to the specified number of replicas."""
-    success = swarm_client.scale_service(name, replicas)
-    return json.dumps({"status": "scaled" if success else "failed", "name": name, "replicas": replicas})
+    """Queue scaling a service to the specified number of replicas. Returns the job; follow it with get_job."""
+    job = await job_runner.submit("scale", {"name": name, "replicas": replicas})
+    return _dumps(job.model_dump(mode="json"))
+
+
+@mcp.tool()
+async def get_job(job_id: str, log_after: int = 0) -> str:
+    """Status, progress and result of a job, with its log lines after sequence number log_after."""
+    job = await jobs.get_job(job_id)
+    if not job:
+        return _dumps({"error": f"Job '{job_id}' not found"})
+    data = job.model_dump(mode="json")
+    data["logs"] = [l.model_dump(mode="json") for l in await jobs.get_logs(job_id, log_after)]
+    return _dumps(data)
+
+
+@mcp.tool()
+async def scale_services(
+    replicas: dict[str, int] | None = None,
+    selector: dict[str, str] | None = None,
+    multiplier: float | None = None,
+) -> str:
+    """Scale many services at once, concurrently.
+
+    Pass either replicas (service name -> replica count) or a label selector with a
+    multiplier applied to each matching service's current count. Returns a result
+    per service.
+    """
+    req = BatchScaleRequest(replicas=replicas or {}, selector=selector or {}, multiplier=multiplier)
+    result = await batch_scale.batch_scale(req)
+    return _dumps(result.model_dump())
 
 
 @mcp.tool()
 async def get_service_logs(name: str, tail: int = 100) -> str:
-    """Get recent logs from a running service."""
-    logs = swarm_client.get_service_logs(name, tail=tail)
+    """Get recent logs from a running service. Output is capped to the most recent bytes."""
+    logs = await asyncio.to_thread(swarm_client.get_service_logs, name, tail=tail)
+    limit = settings.mcp_max_log_bytes
+    if len(logs) > limit:
+        logs = "[truncated]\n" + logs[-limit:].split("\n", 1)[-1]
     return logs
 
 
 @mcp.tool()
-async def list_nodes() -> str:
-    """List all nodes in the Docker Swarm cluster."""
-    nodes = swarm_client.list_nodes()
-    return json.dumps([n.model_dump(mode="json") for n in nodes], indent=2)
+async def search_logs(
+    query: str,
+    service: str | None = None,
+    hours: float = 24,
+    limit: int = settings.mcp_page_size,
+    cursor: str | None = None,
+) -> str:
+    """Full-text search of archived service logs over the last `hours`, newest first.
+
+    query uses SQLite FTS5 syntax: words, "exact phrases", AND/OR/NOT, prefix*.
+    Only services listed in LOG_ARCHIVE_SERVICES are archived. Pass next_cursor
+    back as cursor for the next page.
+    """
+    since = datetime.now(timezone.utc) - timedelta(hours=hours)
+    limit = max(1, min(limit, settings.mcp_max_page_size))
+    try:
+        result = await log_archive.search(query, service, since, None, limit, cursor)
+    except ValueError as e:
+        return _dumps({"error": f"Invalid search: {e}"})
+    return _dumps(result.model_dump())
+
+
+@mcp.tool()
+async def list_nodes(
+    role: str | None = None,
+    status: str | None = None,
+    availability: str | None = None,
+    include_services: bool = False,
+    limit: int = settings.mcp_page_size,
+    cursor: str | None = None,
+) -> str:
+    """List nodes in the Docker Swarm cluster, one page at a time.
+
+    Filters match role (manager/worker), status (ready/down) and availability
+    (active/pause/drain). Per-node service placement is omitted unless
+    include_services is set. Pass next_cursor back as cursor for the next page.
+    """
+    nodes = await cluster_state.nodes()
+    if role:
+        nodes = [n for n in nodes if n.role == role]
+    if status:
+        nodes = [n for n in nodes if n.status.value == status]
+    if availability:
+        nodes = [n for n in nodes if n.availability.value == availability]
+    nodes = sorted(nodes, key=lambda n: n.hostname)
+    page = _page(nodes, lambda n: n.hostname, limit, cursor)
+    page["items"] = [_node_summary(n, include_services) for n in page["items"]]
+    return _dumps(page)
 
 
 @mcp.tool()
@@ -70,27 +217,34 @@ async def get_health() -> str:
     nodes = []
     service_count = 0
     try:
-        nodes = swarm_client.list_nodes()
+        nodes = await cluster_state.nodes()
     except Exception as e:
         errors.append(str(e))
     try:
-        service_count = len(swarm_client.list_services())
+        service_count = len(await cluster_state.services())
     except Exception as e:
         errors.append(str(e))
-    return json.dumps({
+    return _dumps({
         "status": "healthy" if not errors else "degraded",
         "node_count": len(nodes),
         "service_count": service_count,
         "errors": errors,
-    }, indent=2)
+    })
 
 
 @mcp.tool()
-async def get_registry_images() -> str:
-    """List all images in the private registry."""
-    repos = await registry_client.list_repositories()
+async def get_registry_images(
+    repository_prefix: str | None = None,
+    limit: int = settings.mcp_page_size,
+    cursor: str | None = None,
+) -> str:
+    """List images and tags in the private registry, one page of repositories at a time."""
+    repos = sorted(await registry_client.list_repositories())
+    if repository_prefix:
+        repos = [r for r in repos if r.startswith(repository_prefix)]
+    page = _page(repos, lambda r: r, limit, cursor)
     result = []
-    for repo in repos:
+    for repo in page["items"]:
         tags = await registry_client.list_tags(repo)
         tag_details = []
         for tag in tags:
@@ -106,7 +260,8 @@ async def get_registry_images() -> str:
                 "os": config_info.get("os", ""),
             })
         result.append({"name": repo, "tags": tag_details})
-    return json.dumps(result, indent=2)
+    page["items"] = result
+    return _dumps(page)
 
 
 @mcp.tool()
@@ -115,14 +270,111 @@ async def delete_registry_tag(repository: str, tag: str) -> str:
     manifest = await registry_client.get_manifest(repository, tag)
     digest = manifest.get("digest")
     if not digest:
-        return json.dumps({"deleted": False, "error": f"Tag '{tag}' not found in '{repository}'"})
+        return _dumps({"deleted": False, "error": f"Tag '{tag}' not found in '{repository}'"})
     success = await registry_client.delete_manifest(repository, digest)
-    return json.dumps({"deleted": success, "repository": repository, "tag": tag})
+    return _dumps({"deleted": success, "repository": repository, "tag": tag})
+
+
+@mcp.tool()
+async def sync_definitions_dir(prune: bool = False) -> str:
+    """Sync YAML service definitions from the definitions directory into the catalog.
+
+    Only changed files are re-parsed. Files that were removed are reported as deleted;
+    set prune to also remove their catalog entries.
+    """
+    report = await sync_definitions(prune=prune)
+    return _dumps(report.model_dump())
+
+
+# --- Resources ---
+
+@mcp.resource("swarm://nodes", name="nodes", mime_type="application/json")
+async def nodes_resource() -> str:
+    """Summary of every swarm node. Subscribe to be notified when it changes."""
+    nodes = sorted(await cluster_state.nodes(), key=lambda n: n.hostname)
+    return _dumps([_node_summary(n) for n in nodes])
+
+
+@mcp.resource("swarm://services", name="live-services", mime_type="application/json")
+async def services_resource() -> str:
+    """Services currently running in the swarm. Subscribe to be notified when it changes."""
+    services = sorted(await cluster_state.services(), key=lambda s: s.name)
+    return _dumps(services)
+
+
+@mcp.resource("swarm://stacks", name="stacks", mime_type="application/json")
+async def stacks_resource() -> str:
+    """Swarm stacks grouped by namespace label. Subscribe to be notified when it changes."""
+    return _dumps(await cluster_state.stacks())
+
+
+@mcp.resource("catalog://services", name="catalog", mime_type="application/json")
+async def catalog_resource() -> str:
+    """Catalog services with status. Subscribe to be notified when it changes."""
+    return _dumps([_catalog_summary(s) for s in await catalog.list_services()])
+
+
+@mcp._mcp_server.subscribe_resource()
+async def _subscribe(uri) -> None:
+    session = mcp._mcp_server.request_context.session
+    _subscriptions.setdefault(str(uri), set()).add(session)
+
+
+@mcp._mcp_server.unsubscribe_resource()
+async def _unsubscribe(uri) -> None:
+    session = mcp._mcp_server.request_context.session
+    _subscriptions.get(str(uri), set()).discard(session)
+
+
+async def _current_fingerprint(kind: str) -> str:
+    if kind == "catalog":
+        return await catalog.fingerprint()
+    await cluster_state.refresh(kind)
+    return cluster_state.fingerprint(kind)
+
+
+async def _watch_resources() -> None:
+    """Poll subscribed resources and notify their subscribers when content changes."""
+    notified: dict[str, str] = {}
+    while True:
+        await asyncio.sleep(settings.mcp_watch_interval)
+        for uri, sessions in list(_subscriptions.items()):
+            if not sessions:
+                continue
+            try:
+                fingerprint = await _current_fingerprint(RESOURCES[uri])
+            except Exception as e:
+                logger.warning("Resource watch failed for %s: %s", uri, e)
+                continue
+            if notified.setdefault(uri, fingerprint) == fingerprint:
+                continue
+            notified[uri] = fingerprint
+            for session in list(sessions):
+                try:
+                    await session.send_resource_updated(uri)
+                except Exception:
+                    sessions.discard(session)
 
 
 async def main():
-    await init_db()
-    await mcp.run_stdio_async()
+    # The database schema is created on first use, so no tool call waits on it here
+    from mcp.server.lowlevel import NotificationOptions
+    from mcp.server.stdio import stdio_server
+
+    server = mcp._mcp_server
+    options = server.create_initialization_options(NotificationOptions(resources_changed=True))
+    if options.capabilities.resources:
+        options.capabilities.resources.subscribe = True
+    watcher = asyncio.create_task(_watch_resources())
+    # Jobs queued here are run by whichever runner claims them first: this one or the
+    # leading API process's. This runner doesn't campaign, so it never recovers or prunes jobs.
+    await job_runner.start()
+    try:
+        async with stdio_server() as (read_stream, write_stream):
+            await server.run(read_stream, write_stream, options)
+    finally:
+        watcher.cancel()
+        await job_runner.stop()
 
 
 if __name__ == "__main__":
@@ -13,8 +13,10 @@ def row_to_catalog_service(row: dict) -> CatalogService:
         definition=ServiceDefinition(**json.loads(row["definition"])),
         status=ServiceStatus(row.get("status", "registered")),
         swarm_id=row.get("swarm_id"),
+        image_digest=row.get("image_digest"),
         created_at=row.get("created_at"),
         updated_at=row.get("updated_at"),
+        version=row.get("version", 0),
     )
 
 
@@ -0,0 +1,85 @@
+"""Slotted records for swarm snapshot data.
+
+Nodes, services, stacks and tasks are rebuilt on every scan and only read
+afterwards, so they are plain dataclasses rather than pydantic models. Field
+names match the API models in schemas.py, which stay the response contract;
+routers serialize records directly with orjson instead of re-validating them.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any
+
+from backend.models.schemas import NodeAvailability, NodeStatus
+
+
+@dataclass(slots=True)
+class NodeServiceRecord:
+    name: str
+    image: str
+    replicas_on_node: int = 1
+
+
+@dataclass(slots=True)
+class NodeRecord:
+    id: str
+    hostname: str
+    role: str
+    status: NodeStatus
+    availability: NodeAvailability
+    addr: str
+    platform_os: str = ""
+    platform_arch: str = ""
+    engine_version: str = ""
+    labels: dict[str, str] = field(default_factory=dict)
+    resources: dict[str, Any] = field(default_factory=dict)
+    services: list[NodeServiceRecord] = field(default_factory=list)
+    cluster: str = ""
+
+
+@dataclass(slots=True)
+class ServiceRecord:
+    id: str
+    name: str
+    image: str
+    replicas: int = 0
+    running_replicas: int = 0
+    completed_replicas: int = 0
+    ports: list[str] = field(default_factory=list)
+    nodes: list[str] = field(default_factory=list)
+    created_at: str = ""
+    cluster: str = ""
+
+
+@dataclass(slots=True)
+class TaskRecord:
+    id: str
+    service_id: str
+    service_name: str = ""
+    node_id: str = ""
+    slot: int | None = None
+    state: str = ""
+    desired_state: str = ""
+    message: str = ""
+    error: str = ""
+    exit_code: int | None = None
+    container_id: str = ""
+    image: str = ""
+    timestamp: str = ""
+    reserved_cpus: float = 0
+    reserved_memory_mb: float = 0
+    reserved_gpus: int = 0
+    cluster: str = ""
+
+
+@dataclass(slots=True)
+class StackRecord:
+    name: str
+    status: str
+    services: list[str] = field(default_factory=list)
+    service_count: int = 0
+    running_replicas: int = 0
+    desired_replicas: int = 0
+    ports: list[str] = field(default_factory=list)
+    nodes: list[str] = field(default_factory=list)
+    cluster: str = ""
@@ -2,9 +2,9 @@ from __future__ import annotations
 
 from datetime import datetime
 from enum import StrEnum
-from typing import Any
+from typing import Any, Literal
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 
 
 # --- Enums ---
@@ -32,6 +32,28 @@ class NodeAvailability(StrEnum):
 
 # --- Service ---
 
+class ResourceSpec(BaseModel):
+    cpus: float = Field(default=0, ge=0)
+    memory_mb: float = Field(default=0, ge=0)
+    gpus: int = Field(default=0, ge=0)
+
+
+class ServiceResources(BaseModel):
+    reservations: ResourceSpec = Field(default_factory=ResourceSpec)
+    limits: ResourceSpec = Field(default_factory=ResourceSpec)
+
+
+class AutoscalePolicy(BaseModel):
+    min_replicas: int = Field(default=1, ge=0)
+    max_replicas: int = Field(default=10, ge=1)
+    metric: Literal["cpu", "memory", "custom"] = "cpu"
+    target: float = Field(default=70.0, gt=0)
+    metric_url: str | None = None
+    cooldown: int = Field(default=120, ge=0)
+    step: int = Field(default=1, ge=1)
+    tolerance: float = Field(default=0.1, ge=0)
+
+
 class ServiceDefinition(BaseModel):
     image: str
     replicas: int = 1
@@ -43,6 +65,8 @@ class ServiceDefinition(BaseModel):
     mounts: list[str] = Field(default_factory=list)
     command: str | None = None
     build_context: str | None = None
+    resources: ServiceResources | None = None
+    autoscale: AutoscalePolicy | None = None
 
 
 class CatalogService(BaseModel):
@@ -51,8 +75,10 @@ class CatalogService(BaseModel):
     definition: ServiceDefinition
     status: ServiceStatus = ServiceStatus.REGISTERED
     swarm_id: str | None = None
+    image_digest: str | None = None  # digest the image was pinned to at the last deploy
     created_at: datetime | None = None
     updated_at: datetime | None = None
+    version: int = 0
 
 
 class ServiceCreate(BaseModel):
@@ -66,10 +92,148 @@ class ServiceUpdate(BaseModel):
     definition: ServiceDefinition | None = None
 
 
+class DefinitionVersion(BaseModel):
+    version: int
+    hash: str
+    source: str
+    created_at: datetime
+    current: bool = False
+    definition: ServiceDefinition | None = None
+
+
+class DefinitionChange(BaseModel):
+    path: str
+    old: Any = None
+    new: Any = None
+
+
+class DefinitionDiff(BaseModel):
+    service: str
+    from_version: int
+    to_version: int
+    changes: list[DefinitionChange] = Field(default_factory=list)
+
+
+class RollbackResult(BaseModel):
+    name: str
+    from_version: int
+    to_version: int
+    redeployed: bool = False
+    swarm_id: str | None = None
+    image_digest: str | None = None
+    elapsed_ms: float = 0.0
+
+
+class DefinitionSyncReport(BaseModel):
+    created: list[str] = Field(default_factory=list)
+    updated: list[str] = Field(default_factory=list)
+    unchanged: int = 0
+    deleted: list[str] = Field(default_factory=list)
+    pruned: list[str] = Field(default_factory=list)
+    errors: dict[str, str] = Field(default_factory=dict)
+
+
+class AutoscaleDecision(BaseModel):
+    service: str
+    timestamp: datetime
+    metric: str
+    value: float | None = None
+    target: float
+    current_replicas: int
+    desired_replicas: int
+    action: Literal["scale_up", "scale_down", "hold"]
+    reason: str = ""
+    dry_run: bool = False
+    applied: bool = False
+
+
 class ScaleRequest(BaseModel):
     replicas: int = Field(ge=0, le=100)
 
 
+class BatchScaleRequest(BaseModel):
+    """Either explicit replica counts by service name, or a label selector with a multiplier."""
+    replicas: dict[str, int] = Field(default_factory=dict)
+    selector: dict[str, str] = Field(default_factory=dict)
+    multiplier: float | None = Field(default=None, ge=0)
+
+    @model_validator(mode="after")
+    def _check_target(self) -> BatchScaleRequest:
+        if bool(self.replicas) == bool(self.selector):
+            raise ValueError("give either replicas or selector, not both")
+        if self.selector and self.multiplier is None:
+            raise ValueError("selector requires a multiplier")
+        if any(not 0 <= r <= 100 for r in self.replicas.values()):
+            raise ValueError("replicas must be between 0 and 100")
+        return self
+
+
+class ScaleOutcome(BaseModel):
+    name: str
+    previous_replicas: int | None = None
+    replicas: int | None = None
+    scaled: bool = False
+    attempts: int = 0
+    error: str = ""
+
+
+class BatchScaleResult(BaseModel):
+    scaled: int = 0
+    failed: int = 0
+    results: list[ScaleOutcome] = Field(default_factory=list)
+
+
+class NodeWarmup(BaseModel):
+    node_id: str
+    hostname: str = ""
+    status: Literal["pending", "pulling", "warm", "failed"] = "pending"
+    error: str = ""
+    elapsed_ms: float = 0
+
+
+class ImageWarmup(BaseModel):
+    id: str
+    service: str
+    image: str
+    status: Literal["running", "complete", "failed"] = "running"
+    created_at: datetime
+    finished_at: datetime | None = None
+    warm: int = 0
+    failed: int = 0
+    error: str = ""
+    nodes: list[NodeWarmup] = Field(default_factory=list)
+
+
+class JobStatus(StrEnum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+class Job(BaseModel):
+    id: str
+    type: str
+    params: dict[str, Any] = Field(default_factory=dict)
+    status: JobStatus = JobStatus.QUEUED
+    progress: float = 0.0
+    message: str = ""
+    result: Any = None
+    error: str = ""
+    attempt: int = 0
+    owner: str | None = None
+    created_at: datetime
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
+
+
+class JobLogLine(BaseModel):
+    seq: int
+    ts: datetime
+    line: str
+
+
 class BuildRequest(BaseModel):
     platform: str = "linux/amd64"
 
@@ -95,6 +259,20 @@ class SwarmNode(BaseModel):
     labels: dict[str, str] = Field(default_factory=dict)
     resources: dict[str, Any] = Field(default_factory=dict)
     services: list[NodeService] = Field(default_factory=list)
+    cluster: str = ""
+
+
+# --- Clusters ---
+
+class ClusterInfo(BaseModel):
+    name: str
+    docker_host: str
+    primary: bool = False
+    status: str  # ok, stale, unreachable
+    breaker: str = "closed"  # closed, open, half_open
+    node_count: int = 0
+    service_count: int = 0
+    error: str = ""
 
 
 # --- Health ---
@@ -104,6 +282,22 @@ class HealthStatus(BaseModel):
     version: str = "0.1.0"
 
 
+class ReadinessStatus(BaseModel):
+    ready: bool
+    checks: dict[str, str] = Field(default_factory=dict)
+
+
+class LeaderStatus(BaseModel):
+    name: str
+    holder: str = ""  # process holding the lease, as hostname:pid:suffix
+    term: int = 0  # incremented whenever the lease changes hands
+    acquired_at: datetime | None = None
+    renewed_at: datetime | None = None
+    expires_at: datetime | None = None
+    this_process: str
+    is_leader: bool
+
+
 class ClusterHealth(BaseModel):
     status: str
     swarm_id: str = ""
@@ -136,6 +330,265 @@ class RegistryRepositoryDetail(BaseModel):
     tag_count: int = 0
 
 
+class RetentionPolicy(BaseModel):
+    keep_last: int = Field(default=10, ge=0)
+    keep_days: int = Field(default=14, ge=0)
+    repositories: list[str] | None = None
+    protect_in_use: bool = True
+
+
+class GCCandidate(BaseModel):
+    repository: str
+    digest: str
+    tags: list[str] = Field(default_factory=list)
+    created: str = ""
+    size: int = 0
+
+
+class GCPlan(BaseModel):
+    id: str
+    created_at: datetime
+    policy: RetentionPolicy
+    candidates: list[GCCandidate] = Field(default_factory=list)
+    kept_manifests: int = 0
+    in_use_digests: list[str] = Field(default_factory=list)
+    reclaimable_bytes: int = 0
+    errors: list[str] = Field(default_factory=list)
+
+
+class GCDeleteResult(BaseModel):
+    repository: str
+    digest: str
+    tags: list[str] = Field(default_factory=list)
+    deleted: bool
+    error: str = ""
+
+
+class GCExecution(BaseModel):
+    plan_id: str
+    deleted: int = 0
+    failed: int = 0
+    results: list[GCDeleteResult] = Field(default_factory=list)
+
+
+class RegistryScan(BaseModel):
+    scanned_at: datetime
+    repositories: int = 0
+    tags: int = 0
+    manifests: int = 0
+    manifests_fetched: int = 0
+    manifests_removed: int = 0
+    errors: list[str] = Field(default_factory=list)
+    error_count: int = 0
+    elapsed_ms: float = 0
+
+
+class TagStorage(BaseModel):
+    tag: str
+    digest: str
+    size: int = 0
+    unique_bytes: int = 0
+    shared_bytes: int = 0
+
+
+class RepositoryStorage(BaseModel):
+    name: str
+    tag_count: int = 0
+    manifest_count: int = 0
+    logical_bytes: int = 0
+    stored_bytes: int = 0
+    unique_bytes: int = 0
+    shared_bytes: int = 0
+    tags: list[TagStorage] = Field(default_factory=list)
+
+
+class LayerUsage(BaseModel):
+    digest: str
+    size: int
+    repository: str
+    manifest_digest: str
+    tags: list[str] = Field(default_factory=list)
+
+
+class RegistryStorageReport(BaseModel):
+    tag_count: int = 0
+    manifest_count: int = 0
+    blob_count: int = 0
+    logical_bytes: int = 0
+    stored_bytes: int = 0
+    repositories: list[RepositoryStorage] = Field(default_factory=list)
+    largest_unshared: list[LayerUsage] = Field(default_factory=list)
+    last_scan: RegistryScan | None = None
+
+
+# --- Utilization ---
+
+class Percentiles(BaseModel):
+    p50: float = 0
+    p90: float = 0
+    p99: float = 0
+    max: float = 0
+
+
+class NodeUtilization(BaseModel):
+    id: str
+    hostname: str
+    cpus: float = 0
+    memory_mb: float = 0
+    tasks_sampled: int = 0
+    cpu_cores: float = 0
+    cpu_percent: float = 0
+    memory_used_mb: float = 0
+    memory_percent: float = 0
+    cpu_percent_pct: Percentiles = Field(default_factory=Percentiles)
+    memory_percent_pct: Percentiles = Field(default_factory=Percentiles)
+    samples: int = 0
+
+
+class ServiceUtilization(BaseModel):
+    name: str
+    replicas_sampled: int = 0
+    cpu_cores: float = 0
+    memory_used_mb: float = 0
+    replica_cpu_cores_pct: Percentiles = Field(default_factory=Percentiles)
+    replica_memory_mb_pct: Percentiles = Field(default_factory=Percentiles)
+    reserved_cpus: float = 0
+    reserved_memory_mb: float = 0
+    samples: int = 0
+
+
+# --- Task events ---
+
+class TaskEvent(BaseModel):
+    id: int
+    cluster: str
+    task_id: str
+    service: str
+    slot: int | None = None
+    node_id: str = ""
+    state: str
+    desired_state: str = ""
+    exit_code: int | None = None
+    error: str = ""
+    message: str = ""
+    ts: str
+
+
+class ServiceRestarts(BaseModel):
+    service: str
+    cluster: str
+    restarts: int = 0
+    failures: int = 0
+    last_event_at: str = ""
+    last_exit_code: int | None = None
+    last_error: str = ""
+
+
+class NodeFailures(BaseModel):
+    node_id: str
+    hostname: str = ""
+    cluster: str
+    failures: int = 0
+    services: list[str] = Field(default_factory=list)
+    last_event_at: str = ""
+    last_service: str = ""
+    last_error: str = ""
+
+
+# --- Log archive ---
+
+class LogEntry(BaseModel):
+    ts: str
+    service: str
+    task_id: str = ""
+    node_id: str = ""
+    message: str
+
+
+class LogSearchResult(BaseModel):
+    items: list[LogEntry] = Field(default_factory=list)
+    next_cursor: str | None = None
+
+
+# --- Task logs ---
+
+class TaskLogLine(LogEntry):
+    replica: int | None = None  # the task's slot
+    node: str = ""  # hostname of node_id
+
+
+class TaskLogResult(BaseModel):
+    service: str
+    items: list[TaskLogLine] = Field(default_factory=list)
+    tasks: int = 0  # tasks whose logs were read
+    truncated: bool = False  # more lines matched than the limit
+    errors: dict[str, str] = Field(default_factory=dict)  # task id -> why its logs couldn't be read
+
+
+# --- Placement ---
+
+class PlacementCandidate(BaseModel):
+    name: str
+    definition: ServiceDefinition
+
+
+class PlacementRequest(BaseModel):
+    candidates: list[PlacementCandidate] = Field(default_factory=list)
+    catalog_services: list[str] = Field(default_factory=list)
+
+
+class ServicePlacement(BaseModel):
+    name: str
+    requested: int
+    placed: int
+    fits: bool
+    nodes: dict[str, int] = Field(default_factory=dict)
+    eligible_nodes: int = 0
+    reason: str = ""
+
+
+class NodeHeadroom(BaseModel):
+    id: str
+    hostname: str
+    cpus: float
+    memory_mb: float
+    gpus: int
+    free_cpus: float
+    free_memory_mb: float
+    free_gpus: int
+    tasks: int
+
+
+class PlacementResult(BaseModel):
+    fits: bool
+    services: list[ServicePlacement] = Field(default_factory=list)
+    nodes: list[NodeHeadroom] = Field(default_factory=list)
+    elapsed_ms: float = 0
+
+
+class EvacuationRequest(BaseModel):
+    nodes: list[str]
+    max_parallel: int = Field(default=1, ge=1)
+    rolling: bool = False
+    force: bool = False
+
+
+class EvacuationWave(BaseModel):
+    nodes: list[str] = Field(default_factory=list)
+    node_ids: list[str] = Field(default_factory=list)
+    tasks: int = 0
+
+
+class EvacuationPlan(BaseModel):
+    fits: bool
+    rolling: bool = False
+    waves: list[EvacuationWave] = Field(default_factory=list)
+    services: dict[str, int] = Field(default_factory=dict)
+    unplaceable: dict[str, int] = Field(default_factory=dict)
+    reason: str = ""
+    elapsed_ms: float = 0
+
+
 # --- Projects ---
 
 class ProjectFolder(BaseModel):
@@ -156,6 +609,7 @@ class SwarmService(BaseModel):
     ports: list[str] = Field(default_factory=list)
     nodes: list[str] = Field(default_factory=list)
     created_at: str = ""
+    cluster: str = ""
 
 
 # --- Swarm Stack ---
@@ -169,3 +623,22 @@ class SwarmStack(BaseModel):
     desired_replicas: int = 0
     ports: list[str] = Field(default_factory=list)
     nodes: list[str] = Field(default_factory=list)
+    cluster: str = ""
+
+
+class StackDeployRequest(BaseModel):
+    project: str
+    stack: str | None = None  # defaults to the project name
+    prune: bool = False
+
+
+class StackDeployResult(BaseModel):
+    stack: str
+    networks_created: list[str] = Field(default_factory=list)
+    created: list[str] = Field(default_factory=list)
+    updated: list[str] = Field(default_factory=list)
+    unchanged: list[str] = Field(default_factory=list)
+    removed: list[str] = Field(default_factory=list)
+    failed: dict[str, str] = Field(default_factory=dict)
+    ignored_keys: dict[str, list[str]] = Field(default_factory=dict)
+    writes: int = 0
@@ -0,0 +1,19 @@
+from __future__ import annotations
+
+from typing import Any
+
+import orjson
+from fastapi.responses import Response
+
+
+class RecordResponse(Response):
+    """JSON response for trusted internal data, serialized with orjson.
+
+    Returning it from a route bypasses response_model validation, so routes can
+    hand over dataclass records as-is. Keep response_model on the route for docs.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
@@ -0,0 +1,20 @@
+from fastapi import APIRouter
+
+from backend.config import settings
+from backend.models.schemas import AutoscaleDecision
+from backend.services import autoscaler as autoscaler_service
+from backend.services.autoscaler import autoscaler
+
+router = APIRouter(prefix="/api/autoscaler", tags=["autoscaler"])
+
+
+@router.get("/decisions", response_model=list[AutoscaleDecision])
+async def list_decisions(service: str | None = None, limit: int = 100):
+    """Most recent autoscale decisions, newest first."""
+    return await autoscaler_service.list_decisions(service, limit)
+
+
+@router.post("/evaluate", response_model=list[AutoscaleDecision])
+async def evaluate(dry_run: bool | None = None):
+    """Run one autoscale evaluation now. Defaults to the configured dry-run mode."""
+    return await autoscaler.evaluate(dry_run=settings.autoscale_dry_run if dry_run is None else dry_run)
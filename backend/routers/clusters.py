@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import orjson
+from fastapi import APIRouter, HTTPException
+
+from backend.models.schemas import ClusterInfo
+from backend.responses import RecordResponse
+from backend.services.clusters import Cluster, clusters
+
+router = APIRouter(prefix="/api/clusters", tags=["clusters"])
+
+
+def _header(value: dict) -> str:
+    return orjson.dumps(value).decode().encode("ascii", "replace").decode()
+
+
+async def cluster_listing(kind: str, cluster: str | None) -> RecordResponse:
+    """Fan a snapshot read of `kind` out to the selected clusters and merge the results.
+
+    Clusters that failed are listed in the X-Cluster-Errors header as a JSON
+    object of name -> error; the request only fails if every cluster did.
+    Clusters answered from their last good snapshot because a refresh failed
+    or did not finish within CLUSTER_TIMEOUT are listed in X-Snapshot-Stale as
+    name -> snapshot age in seconds.
+    """
+    try:
+        targets = clusters.select(cluster)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown cluster '{cluster}'")
+    items, errors = await clusters.fan_out(
+        lambda c: c.state.get(kind), targets, fallback=lambda c: c.state.snapshot(kind)
+    )
+    if errors and len(errors) == len(targets):
+        raise HTTPException(status_code=503, detail=f"Cannot reach Docker: {errors}")
+    headers = {}
+    if errors:
+        headers["X-Cluster-Errors"] = _header(errors)
+    stale = {
+        c.name: round(c.state.age(kind) or 0)
+        for c in targets if c.name not in errors and c.state.stale(kind)
+    }
+    if stale:
+        headers["X-Snapshot-Stale"] = _header(stale)
+    return RecordResponse(items, headers=headers or None)
+
+
+@router.get("", response_model=list[ClusterInfo])
+async def list_clusters():
+    """Every configured cluster with its reachability and size."""
+
+    async def probe(c: Cluster) -> list[ClusterInfo]:
+        nodes = await c.state.nodes()
+        services = await c.state.services()
+        stale = c.state.stale("nodes") or c.state.stale("services")
+        return [ClusterInfo(
+            name=c.name, docker_host=c.client.base_url, primary=c.primary,
+            status="stale" if stale else "ok", breaker=c.client.breaker.state,
+            node_count=len(nodes), service_count=len(services),
+        )]
+
+    infos, errors = await clusters.fan_out(probe)
+    by_name = {i.name: i for i in infos}
+    return [
+        by_name.get(c.name) or ClusterInfo(
+            name=c.name, docker_host=c.client.base_url, primary=c.primary,
+            status="unreachable", breaker=c.client.breaker.state, error=errors.get(c.name, ""),
+        )
+        for c in clusters
+    ]
@@ -0,0 +1,12 @@
+from fastapi import APIRouter
+
+from backend.models.schemas import DefinitionSyncReport
+from backend.services.definition_sync import sync_definitions
+
+router = APIRouter(prefix="/api/definitions", tags=["definitions"])
+
+
+@router.post("/sync", response_model=DefinitionSyncReport)
+async def sync(prune: bool = False):
+    """Sync YAML definitions into the catalog. With prune, drop entries whose file was deleted."""
+    return await sync_definitions(prune=prune)
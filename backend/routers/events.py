@@ -0,0 +1,31 @@
+from fastapi import APIRouter
+
+from backend.models.schemas import NodeFailures, ServiceRestarts, TaskEvent
+from backend.services import task_events
+
+router = APIRouter(prefix="/api/events", tags=["events"])
+
+
+@router.get("/tasks", response_model=list[TaskEvent])
+async def list_task_events(
+    service: str | None = None,
+    node: str | None = None,
+    cluster: str | None = None,
+    state: str | None = None,
+    window: int = 3600,
+    limit: int = 200,
+):
+    """Recorded task state changes from the last `window` seconds, newest first."""
+    return await task_events.list_events(service, node, cluster, state, window, min(limit, 1000))
+
+
+@router.get("/restarts", response_model=list[ServiceRestarts])
+async def service_restarts(window: int = 3600, cluster: str | None = None):
+    """Tasks per service that ended and were replaced, most restarts first."""
+    return await task_events.restarts_by_service(window, cluster)
+
+
+@router.get("/failures-by-node", response_model=list[NodeFailures])
+async def node_failures(window: int = 86400, cluster: str | None = None):
+    """Failed and rejected tasks per node, most failures first."""
+    return await task_events.failures_by_node(window, cluster)
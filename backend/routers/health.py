@@ -1,7 +1,13 @@
-from fastapi import APIRouter
+import asyncio
 
-from backend.models.schemas import ClusterHealth, HealthStatus
+from fastapi import APIRouter, Request, Response
+
+from backend.database import get_db
+from backend.models.schemas import ClusterHealth, HealthStatus, LeaderStatus, ReadinessStatus
+from backend.responses import RecordResponse
+from backend.services import singleflight
 from backend.services.docker_client import swarm_client
+from backend.services.leader import leader
 
 router = APIRouter(prefix="/api/health", tags=["health"])
 
@@ -11,6 +17,41 @@ async def health_check():
     return HealthStatus(status="ok")
 
 
+@router.get("/ready", response_model=ReadinessStatus)
+async def readiness(request: Request, response: Response):
+    """Ready once startup has finished and the database and Docker both respond.
+
+    /api/health only says the process is up; this returns 503 until the app can
+    actually serve requests.
+    """
+    checks = {"startup": request.app.state.startup}
+    try:
+        db = await get_db()
+        try:
+            await db.execute("SELECT 1")
+        finally:
+            await db.close()
+        checks["database"] = "ok"
+    except Exception as e:
+        checks["database"] = f"error: {e}"
+    try:
+        await asyncio.wait_for(singleflight.to_thread(swarm_client.ping), timeout=5)
+        checks["docker"] = "ok"
+    except Exception as e:
+        checks["docker"] = f"error: {e}"
+
+    ready = all(v == "ok" for v in checks.values())
+    if not ready:
+        response.status_code = 503
+    return ReadinessStatus(ready=ready, checks=checks)
+
+
+@router.get("/leader", response_model=LeaderStatus)
+async def leader_status():
+    """Which process holds the leader lease, and whether it is this one."""
+    return await leader.status()
+
+
 @router.get("/detailed", response_model=ClusterHealth)
 async def detailed_health():
     errors: list[str] = []
@@ -18,28 +59,32 @@ async def detailed_health():
     service_count = 0
     swarm_id = ""
 
-    try:
-        nodes = swarm_client.list_nodes()
-    except Exception as e:
-        errors.append(f"Failed to list nodes: {e}")
-
-    try:
-        services = swarm_client.list_services()
-        service_count = len(services)
-    except Exception as e:
-        errors.append(f"Failed to list services: {e}")
-
-    try:
-        swarm_id = swarm_client.get_swarm_id()
-    except Exception as e:
-        errors.append(f"Failed to get swarm ID: {e}")
+    # Concurrent requests share each read instead of queueing on the event loop
+    nodes_result, services_result, swarm_id_result = await asyncio.gather(
+        singleflight.to_thread(swarm_client.list_nodes),
+        singleflight.to_thread(swarm_client.list_services),
+        singleflight.to_thread(swarm_client.get_swarm_id),
+        return_exceptions=True,
+    )
+    if isinstance(nodes_result, Exception):
+        errors.append(f"Failed to list nodes: {nodes_result}")
+    else:
+        nodes = nodes_result
+    if isinstance(services_result, Exception):
+        errors.append(f"Failed to list services: {services_result}")
+    else:
+        service_count = len(services_result)
+    if isinstance(swarm_id_result, Exception):
+        errors.append(f"Failed to get swarm ID: {swarm_id_result}")
+    else:
+        swarm_id = swarm_id_result
 
     status = "healthy" if not errors else "degraded"
-    return ClusterHealth(
-        status=status,
-        swarm_id=swarm_id,
-        node_count=len(nodes),
-        service_count=service_count,
-        nodes=nodes,
-        errors=errors,
-    )
+    return RecordResponse({
+        "status": status,
+        "swarm_id": swarm_id,
+        "node_count": len(nodes),
+        "service_count": service_count,
+        "nodes": nodes,
+        "errors": errors,
+    })
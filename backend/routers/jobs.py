@@ -0,0 +1,68 @@
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+
+from backend.config import settings
+from backend.models.schemas import Job, JobLogLine, JobStatus
+from backend.services import jobs
+from backend.services.jobs import job_runner
+
+router = APIRouter(prefix="/api/jobs", tags=["jobs"])
+
+
+@router.get("", response_model=list[Job])
+async def list_jobs(type: str | None = None, status: JobStatus | None = None, limit: int = Query(default=100, ge=1, le=1000)):
+    """Jobs, newest first."""
+    return await jobs.list_jobs(type, status, limit)
+
+
+@router.get("/{job_id}", response_model=Job)
+async def get_job(job_id: str):
+    job = await jobs.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.get("/{job_id}/logs", response_model=list[JobLogLine])
+async def get_job_logs(job_id: str, after: int = 0, limit: int = Query(default=1000, ge=1, le=10000)):
+    """Log lines after sequence number `after`; pass the last seq back to read on."""
+    if not await jobs.get_job(job_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return await jobs.get_logs(job_id, after, limit)
+
+
+@router.get("/{job_id}/events")
+async def stream_job(job_id: str, after: int = 0):
+    """Server-sent events: `job` whenever status or progress changes, `log` per
+    log line. The stream ends once the job has finished."""
+    if not await jobs.get_job(job_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def events():
+        seq, last = after, None
+        while True:
+            # Logs are flushed before the final status is written, so reading
+            # the job first means no line is missed after it finishes
+            job = await jobs.get_job(job_id)
+            for line in await jobs.get_logs(job_id, seq):
+                seq = line.seq
+                yield f"event: log\ndata: {line.model_dump_json()}\n\n"
+            state = (job.status, job.progress, job.message)
+            if state != last:
+                last = state
+                yield f"event: job\ndata: {job.model_dump_json()}\n\n"
+            if jobs.is_finished(job):
+                return
+            await job_runner.wait_for_change(settings.job_poll_interval)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@router.post("/{job_id}/cancel", response_model=Job)
+async def cancel_job(job_id: str):
+    job = await jobs.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if jobs.is_finished(job):
+        raise HTTPException(status_code=409, detail=f"Job already {job.status}")
+    return await job_runner.cancel(job_id)
@@ -0,0 +1,28 @@
+from datetime import datetime
+
+from fastapi import APIRouter, HTTPException
+
+from backend.models.schemas import LogSearchResult
+from backend.services import log_archive
+
+router = APIRouter(prefix="/api/logs", tags=["logs"])
+
+
+@router.get("/search", response_model=LogSearchResult)
+async def search_logs(
+    q: str | None = None,
+    service: str | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    limit: int = 100,
+    cursor: str | None = None,
+):
+    """Search archived service logs with an FTS5 query, newest first.
+
+    `since`/`until` default to the last 24 hours; pass `next_cursor` back as
+    `cursor` for the next page.
+    """
+    try:
+        return await log_archive.search(q, service, since, until, max(1, min(limit, 1000)), cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid search: {e}")
@@ -1,36 +1,74 @@
 from fastapi import APIRouter, HTTPException
 
-from backend.models.schemas import SwarmNode
-from backend.services.docker_client import swarm_client
+from backend.models.schemas import EvacuationPlan, EvacuationRequest, Job, SwarmNode
+from backend.responses import RecordResponse
+from backend.routers.clusters import cluster_listing
+from backend.services import evacuation
+from backend.services.clusters import clusters
+from backend.services.jobs import job_runner
 
 router = APIRouter(prefix="/api/nodes", tags=["nodes"])
 
 
 @router.get("", response_model=list[SwarmNode])
-async def list_nodes():
+async def list_nodes(cluster: str | None = None):
+    """Nodes from every cluster (or just `cluster`), each tagged with its cluster."""
+    return await cluster_listing("nodes", cluster)
+
+
+async def _evacuation_plan(req: EvacuationRequest) -> EvacuationPlan:
     try:
-        return swarm_client.list_nodes()
+        return await evacuation.plan(req.nodes, req.max_parallel, req.rolling)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=503, detail=f"Cannot reach Docker: {e}")
 
 
+@router.post("/evacuate/plan", response_model=EvacuationPlan)
+async def plan_evacuation(req: EvacuationRequest):
+    """Waves an evacuation would drain, and whether the other nodes can take the load."""
+    return await _evacuation_plan(req)
+
+
+@router.post("/evacuate", response_model=Job, status_code=202)
+async def evacuate_nodes(req: EvacuationRequest):
+    """Queue draining `nodes` wave by wave. Refused with 409 and the plan when the
+    remaining capacity cannot absorb the load, unless `force` is set."""
+    plan = await _evacuation_plan(req)
+    if not plan.fits and not req.force:
+        raise HTTPException(status_code=409, detail={
+            "message": f"Not evacuating: {plan.reason}",
+            "plan": plan.model_dump(mode="json"),
+        })
+    waves = [w.model_dump(include={"nodes", "node_ids"}) for w in plan.waves]
+    return await job_runner.submit("evacuate", {"waves": waves, "rolling": req.rolling})
+
+
 @router.get("/{node_id}", response_model=SwarmNode)
-async def get_node(node_id: str):
-    node = swarm_client.get_node(node_id)
+async def get_node(node_id: str, cluster: str | None = None):
+    try:
+        targets = clusters.select(cluster)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown cluster '{cluster}'")
+    nodes, errors = await clusters.fan_out(
+        lambda c: c.state.nodes(), targets, fallback=lambda c: c.state.snapshot("nodes")
+    )
+    node = next((n for n in nodes if n.id == node_id or n.hostname == node_id), None)
     if not node:
+        # The node may be on a cluster that couldn't be reached
+        if errors:
+            raise HTTPException(status_code=503, detail=f"Cannot reach Docker: {errors}")
         raise HTTPException(status_code=404, detail="Node not found")
-    return node
+    return RecordResponse(node)
 
 
-@router.post("/{node_id}/drain")
+@router.post("/{node_id}/drain", response_model=Job, status_code=202)
 async def drain_node(node_id: str):
-    if not swarm_client.drain_node(node_id):
-        raise HTTPException(status_code=500, detail="Failed to drain node")
-    return {"status": "draining", "node_id": node_id}
+    """Queue a drain; the job finishes once no task is running on the node."""
+    return await job_runner.submit("drain", {"node_id": node_id})
 
 
-@router.post("/{node_id}/activate")
+@router.post("/{node_id}/activate", response_model=Job, status_code=202)
 async def activate_node(node_id: str):
-    if not swarm_client.activate_node(node_id):
-        raise HTTPException(status_code=500, detail="Failed to activate node")
-    return {"status": "active", "node_id": node_id}
+    return await job_runner.submit("activate", {"node_id": node_id})
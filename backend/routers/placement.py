@@ -0,0 +1,27 @@
+from fastapi import APIRouter, HTTPException
+
+from backend.models.schemas import PlacementCandidate, PlacementRequest, PlacementResult
+from backend.services import catalog, placement
+from backend.services.cluster_state import cluster_state
+
+router = APIRouter(prefix="/api/placement", tags=["placement"])
+
+
+@router.post("/simulate", response_model=PlacementResult)
+async def simulate(req: PlacementRequest):
+    """Predict where candidate services would land and the headroom each node keeps."""
+    candidates = list(req.candidates)
+    for name in req.catalog_services:
+        svc = await catalog.get_service(name)
+        if not svc:
+            raise HTTPException(status_code=404, detail=f"Service '{name}' not found in catalog")
+        candidates.append(PlacementCandidate(name=name, definition=svc.definition))
+    try:
+        nodes = await cluster_state.nodes()
+        tasks = await cluster_state.tasks()
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Cannot reach Docker: {e}")
+    try:
+        return placement.simulate(nodes, tasks, candidates)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
@@ -1,6 +1,17 @@
 from fastapi import APIRouter, HTTPException
 
-from backend.models.schemas import RegistryRepository, RegistryRepositoryDetail, TagDetail
+from backend.models.schemas import (
+    GCExecution,
+    GCPlan,
+    RegistryRepository,
+    RegistryRepositoryDetail,
+    RegistryScan,
+    RegistryStorageReport,
+    RepositoryStorage,
+    RetentionPolicy,
+    TagDetail,
+)
+from backend.services import registry_gc, registry_storage
 from backend.services.registry_client import registry_client
 
 router = APIRouter(prefix="/api/registry", tags=["registry"])
@@ -49,3 +60,50 @@ async def delete_tag(name: str, tag: str):
     if not success:
         raise HTTPException(status_code=500, detail="Failed to delete manifest. Is REGISTRY_STORAGE_DELETE_ENABLED=true?")
     return {"deleted": True}
+
+
+@router.post("/gc/plan", response_model=GCPlan)
+async def plan_gc(policy: RetentionPolicy = RetentionPolicy()):
+    """Dry run: list manifests the retention policy would delete and the bytes it would free."""
+    return await registry_gc.plan_gc(policy)
+
+
+@router.get("/gc/plans/{plan_id}", response_model=GCPlan)
+async def get_gc_plan(plan_id: str):
+    plan = await registry_gc.get_plan(plan_id)
+    if not plan:
+        raise HTTPException(status_code=404, detail="Plan not found or expired")
+    return plan
+
+
+@router.post("/gc/plans/{plan_id}/execute", response_model=GCExecution)
+async def execute_gc_plan(plan_id: str, concurrency: int | None = None, rate: float | None = None):
+    """Delete every manifest in an approved plan. Run registry garbage-collect afterwards to free blobs."""
+    plan = await registry_gc.get_plan(plan_id)
+    if not plan:
+        raise HTTPException(status_code=404, detail="Plan not found or expired")
+    return await registry_gc.execute_plan(plan, concurrency=concurrency, rate=rate)
+
+
+@router.post("/storage/scan", response_model=RegistryScan)
+async def scan_storage():
+    """Update the layer index: resolve every tag and fetch only manifests not seen before."""
+    try:
+        return await registry_storage.scan()
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Cannot list registry repositories: {e}")
+
+
+@router.get("/storage", response_model=RegistryStorageReport)
+async def storage_report(top: int = 20):
+    """Deduplicated storage per repository and the largest layers used by a single image."""
+    return await registry_storage.report(max(0, min(top, 500)))
+
+
+@router.get("/storage/repositories/{name:path}", response_model=RepositoryStorage)
+async def repository_storage(name: str):
+    """Unique and shared bytes for one repository and each of its tags."""
+    result = await registry_storage.repository_report(name)
+    if not result:
+        raise HTTPException(status_code=404, detail=f"Repository '{name}' is not in the layer index; run a scan first")
+    return result
@@ -1,24 +1,57 @@
-from fastapi import APIRouter, HTTPException
+import asyncio
+import time
+from datetime import datetime
 
-from backend.models.schemas import BuildRequest, CatalogService, ScaleRequest, ServiceCreate, ServiceStatus, ServiceUpdate, SwarmService
-from backend.services import catalog, builder
+from fastapi import APIRouter, HTTPException, Query, Response
+
+from backend.models.schemas import BatchScaleRequest, BatchScaleResult, BuildRequest, CatalogService, DefinitionDiff, DefinitionVersion, ImageWarmup, Job, RollbackResult, ScaleRequest, ServiceCreate, ServiceStatus, ServiceUpdate, SwarmService, TaskLogResult
+from backend.routers.clusters import cluster_listing
+from backend.services import batch_scale, catalog, pinning, prewarm as image_prewarm, singleflight, task_logs
+from backend.services.cluster_state import cluster_state
 from backend.services.docker_client import swarm_client
+from backend.services.jobs import job_runner
 
 router = APIRouter(prefix="/api/services", tags=["services"])
 
 
 @router.get("", response_model=list[CatalogService])
-async def list_services():
-    return await catalog.list_services()
+async def list_services(
+    response: Response,
+    status: ServiceStatus | None = None,
+    name_prefix: str | None = None,
+    image: str | None = None,
+    label: list[str] = Query(default=[]),
+    updated_since: datetime | None = None,
+    limit: int | None = Query(default=None, ge=1, le=1000),
+    cursor: str | None = None,
+):
+    """Catalog services matching every filter, ordered by name.
+
+    `image` is a repository and matches any of its tags or digests; `label` is
+    `key=value` or just `key` and may repeat. With `limit`, the X-Next-Cursor
+    header carries the cursor for the next page.
+    """
+    labels = {k: (v if sep else None) for k, sep, v in (l.partition("=") for l in label)}
+    services, next_cursor = await catalog.query_services(
+        status, name_prefix, image, labels, updated_since, limit, cursor
+    )
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return services
 
 
 @router.get("/live", response_model=list[SwarmService])
-async def list_live_services():
-    """List services currently running in the swarm (not from catalog)."""
+async def list_live_services(cluster: str | None = None):
+    """List services currently running in the swarms (not from catalog), tagged by cluster."""
+    return await cluster_listing("services", cluster)
+
+
+@router.post("/scale", response_model=BatchScaleResult)
+async def scale_services(req: BatchScaleRequest):
+    """Scale many services at once, by name or by label selector and multiplier."""
     try:
-        return swarm_client.list_services()
+        return await batch_scale.batch_scale(req)
     except Exception as e:
-        from fastapi import HTTPException
         raise HTTPException(status_code=503, detail=f"Cannot reach Docker: {e}")
 
 
@@ -53,18 +86,105 @@ async def delete_service(name: str):
     return {"status": "deleted", "name": name}
 
 
-@router.post("/{name}/deploy")
-async def deploy_service(name: str):
+@router.get("/{name}/versions", response_model=list[DefinitionVersion])
+async def list_versions(name: str):
+    """Definition history, newest first."""
+    versions = await catalog.list_versions(name)
+    if versions is None:
+        raise HTTPException(status_code=404, detail="Service not found")
+    return versions
+
+
+@router.get("/{name}/versions/diff", response_model=DefinitionDiff)
+async def diff_versions(name: str, from_version: int, to_version: int | None = None):
+    """Field-level changes between two versions; to_version defaults to the current one."""
+    if to_version is None:
+        svc = await catalog.get_service(name)
+        if not svc:
+            raise HTTPException(status_code=404, detail="Service not found")
+        to_version = svc.version
+    diff = await catalog.diff_versions(name, from_version, to_version)
+    if not diff:
+        raise HTTPException(status_code=404, detail="Version not found")
+    return diff
+
+
+@router.get("/{name}/versions/{version}", response_model=DefinitionVersion)
+async def get_version(name: str, version: int):
+    found = await catalog.get_version(name, version)
+    if not found:
+        raise HTTPException(status_code=404, detail="Version not found")
+    return found
+
+
+@router.post("/{name}/rollback", response_model=RollbackResult)
+async def rollback_service(name: str, version: int | None = None):
+    """Make an earlier definition current again; version defaults to the one before the current.
+
+    A running service is updated in place to the stored spec, so the rollback
+    takes as long as Swarm needs to restart its tasks. Its image is pinned to
+    a digest like any deploy. The catalog only moves once that update was accepted.
+    """
+    started = time.perf_counter()
+    svc = await catalog.get_service(name)
+    if not svc:
+        raise HTTPException(status_code=404, detail="Service not found")
+    if version is None:
+        version = svc.version - 1
+    if version == svc.version:
+        raise HTTPException(status_code=409, detail=f"Version {version} is already current")
+    target = await catalog.get_version(name, version)
+    if not target:
+        raise HTTPException(status_code=404, detail="Version not found")
+
+    swarm_id = None
+    digest = ""
+    redeployed = svc.status == ServiceStatus.RUNNING
+    if redeployed:
+        defn, digest = await pinning.pin_definition(target.definition)
+        try:
+            swarm_id = await asyncio.to_thread(swarm_client.redeploy_service, name, defn)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Rollback failed: {e}")
+        cluster_state.invalidate()
+    await catalog.set_current_version(name, version)
+    if redeployed:
+        await catalog.set_service_status(name, ServiceStatus.RUNNING, swarm_id, digest)
+    return RollbackResult(
+        name=name, from_version=svc.version, to_version=version,
+        redeployed=redeployed, swarm_id=swarm_id, image_digest=digest or None,
+        elapsed_ms=round((time.perf_counter() - started) * 1000, 1),
+    )
+
+
+@router.post("/{name}/prewarm", response_model=ImageWarmup, status_code=202)
+async def prewarm_service(name: str):
+    """Start pulling the service's image on every node it can be scheduled on."""
     svc = await catalog.get_service(name)
     if not svc:
         raise HTTPException(status_code=404, detail="Service not found in catalog")
     try:
-        swarm_id = swarm_client.deploy_service(name, svc.definition)
-        await catalog.set_service_status(name, ServiceStatus.RUNNING, swarm_id)
-        return {"status": "deployed", "name": name, "swarm_id": swarm_id}
+        return await image_prewarm.start_warmup(name, svc.definition)
     except Exception as e:
-        await catalog.set_service_status(name, ServiceStatus.FAILED)
-        raise HTTPException(status_code=500, detail=f"Deploy failed: {e}")
+        raise HTTPException(status_code=503, detail=f"Cannot reach Docker: {e}")
+
+
+@router.get("/{name}/prewarm/{warmup_id}", response_model=ImageWarmup)
+async def get_prewarm(name: str, warmup_id: str):
+    """Per-node progress of a pre-pull."""
+    warmup = await image_prewarm.get_warmup(warmup_id)
+    if not warmup or warmup.service != name:
+        raise HTTPException(status_code=404, detail="Warm-up not found or expired")
+    return warmup
+
+
+@router.post("/{name}/deploy", response_model=Job, status_code=202)
+async def deploy_service(name: str, prewarm: bool = False):
+    """Queue a deploy to the swarm. With prewarm, the image is first pulled on
+    every eligible node and the deploy fails unless all of them succeeded."""
+    if not await catalog.get_service(name):
+        raise HTTPException(status_code=404, detail="Service not found in catalog")
+    return await job_runner.submit("deploy", {"name": name, "prewarm": prewarm})
 
 
 @router.post("/{name}/stop")
@@ -72,34 +192,51 @@ async def stop_service(name: str):
     if not swarm_client.remove_service(name):
         raise HTTPException(status_code=500, detail="Failed to stop service")
     await catalog.set_service_status(name, ServiceStatus.STOPPED, None)
+    cluster_state.invalidate()
     return {"status": "stopped", "name": name}
 
 
-@router.post("/{name}/scale")
+@router.post("/{name}/scale", response_model=Job, status_code=202)
 async def scale_service(name: str, req: ScaleRequest):
-    if not swarm_client.scale_service(name, req.replicas):
-        raise HTTPException(status_code=500, detail="Failed to scale service")
-    return {"status": "scaled", "name": name, "replicas": req.replicas}
+    return await job_runner.submit("scale", {"name": name, "replicas": req.replicas})
 
 
-@router.post("/{name}/build")
+@router.post("/{name}/build", response_model=Job, status_code=202)
 async def build_service(name: str, req: BuildRequest = BuildRequest()):
+    """Queue a build of `build_context` and a push of the image; the job log carries the build output."""
     svc = await catalog.get_service(name)
     if not svc:
         raise HTTPException(status_code=404, detail="Service not found")
     if not svc.definition.build_context:
         raise HTTPException(status_code=422, detail="Service has no build_context defined")
-    success, logs = await builder.build_and_push(
-        svc.definition.build_context,
-        svc.definition.image,
-        req.platform,
-    )
-    if not success:
-        raise HTTPException(status_code=500, detail=f"Build failed:\n{logs}")
-    return {"status": "built", "name": name, "image": svc.definition.image, "logs": logs}
+    return await job_runner.submit("build", {"name": name, "platform": req.platform})
 
 
 @router.get("/{name}/logs")
 async def get_service_logs(name: str, tail: int = 100):
-    logs = swarm_client.get_service_logs(name, tail=tail)
+    logs = await singleflight.to_thread(swarm_client.get_service_logs, name, tail=tail)
     return {"name": name, "logs": logs}
+
+
+@router.get("/{name}/logs/tasks", response_model=TaskLogResult)
+async def get_task_logs(
+    name: str,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    limit: int = 100,
+    task: list[str] | None = Query(None),
+    node: list[str] | None = Query(None),
+    head: bool = False,
+):
+    """Logs of every task merged in time order, each line labelled with its replica and node.
+
+    Returns the newest `limit` lines, or with `head` the first ones from
+    `since`. `task` takes task ID prefixes or replica slots, `node` node IDs
+    or hostnames; both may repeat.
+    """
+    from docker.errors import NotFound
+
+    try:
+        return await task_logs.query(name, since, until, max(1, min(limit, 10000)), task, node, head)
+    except NotFound:
+        raise HTTPException(status_code=404, detail="Service not found")
@@ -1,14 +1,49 @@
+import asyncio
+
 from fastapi import APIRouter, HTTPException
 
-from backend.models.schemas import SwarmStack
-from backend.services.docker_client import swarm_client
+from backend.models.schemas import BatchScaleResult, Job, StackDeployRequest, SwarmStack
+from backend.routers.clusters import cluster_listing
+from backend.services import batch_scale, stack_deploy
+from backend.services.jobs import job_runner
 
 router = APIRouter(prefix="/api/stacks", tags=["stacks"])
 
 
 @router.get("", response_model=list[SwarmStack])
-async def list_stacks():
+async def list_stacks(cluster: str | None = None):
+    """Stacks from every cluster (or just `cluster`), each tagged with its cluster."""
+    return await cluster_listing("stacks", cluster)
+
+
+@router.post("/deploy", response_model=Job, status_code=202)
+async def deploy_stack(req: StackDeployRequest):
+    """Queue a job deploying a project's docker-compose.yml as a stack. The file
+    is checked here and read again when the job runs."""
     try:
-        return swarm_client.list_stacks()
-    except Exception as e:
-        raise HTTPException(status_code=503, detail=f"Cannot reach Docker: {e}")
+        stack = await asyncio.to_thread(stack_deploy.load_stack, req.project, req.stack)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Project '{req.project}' has no {stack_deploy.COMPOSE_FILE}")
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return await job_runner.submit(
+        "stack_deploy", {"project": req.project, "stack": stack.name, "prune": req.prune}
+    )
+
+
+@router.post("/{name}/scale-to-zero", response_model=BatchScaleResult)
+async def scale_stack_to_zero(name: str):
+    """Save the stack's replica counts and scale every service in it to 0."""
+    result = await batch_scale.scale_stack_to_zero(name)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Stack not found")
+    return result
+
+
+@router.post("/{name}/restore", response_model=BatchScaleResult)
+async def restore_stack(name: str):
+    """Scale the stack's services back to the counts saved by scale-to-zero."""
+    result = await batch_scale.restore_stack(name)
+    if result is None:
+        raise HTTPException(status_code=404, detail="No saved replica counts for this stack")
+    return result
@@ -0,0 +1,29 @@
+from fastapi import APIRouter, HTTPException
+
+from backend.models.schemas import NodeUtilization, ServiceUtilization
+from backend.services.stats_collector import stats_collector
+
+router = APIRouter(prefix="/api/stats", tags=["stats"])
+
+
+@router.get("/nodes", response_model=list[NodeUtilization])
+async def node_stats(window: int = 300):
+    """Latest utilization per node and percentiles over the last `window` seconds."""
+    await stats_collector.sync()
+    return await stats_collector.node_utilization(window)
+
+
+@router.get("/services", response_model=list[ServiceUtilization])
+async def service_stats(window: int = 300):
+    """Latest usage per service, per-replica percentiles and reservations for comparison."""
+    await stats_collector.sync()
+    return stats_collector.service_utilization(window)
+
+
+@router.get("/services/{name}", response_model=ServiceUtilization)
+async def service_stats_detail(name: str, window: int = 300):
+    await stats_collector.sync()
+    result = stats_collector.service_utilization(window, name=name)
+    if not result:
+        raise HTTPException(status_code=404, detail="No samples for service")
+    return result[0]
@@ -0,0 +1,277 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+import time
+from datetime import datetime, timezone
+
+from backend.config import settings
+from backend.database import get_db
+from backend.models.records import TaskRecord
+from backend.models.schemas import (
+    AutoscaleDecision,
+    AutoscalePolicy,
+    CatalogService,
+    ServiceStatus,
+)
+from backend.services import catalog
+from backend.services.cluster_state import cluster_state
+from backend.services.docker_client import swarm_client
+from backend.services.leader import leader
+from backend.services.stats_collector import stats_collector
+
+logger = logging.getLogger(__name__)
+
+_MAX_DECISIONS = 500
+
+
+async def _sample_tasks(tasks: list[TaskRecord]) -> list[dict[str, float]]:
+    samples = await asyncio.gather(*(
+        asyncio.to_thread(swarm_client.container_stats, t.container_id)
+        for t in tasks if t.container_id
+    ))
+    return [s for s in samples if s]
+
+
+async def _fetch_custom_metric(url: str) -> float | None:
+    """GET a metric URL returning a bare number or a JSON object with a "value" key."""
+    import httpx
+
+    async with httpx.AsyncClient() as client:
+        resp = await client.get(url, timeout=10)
+        resp.raise_for_status()
+    try:
+        data = resp.json()
+    except ValueError:
+        return float(resp.text.strip())
+    value = data.get("value") if isinstance(data, dict) else data
+    return float(value) if value is not None else None
+
+
+async def measure(svc: CatalogService, tasks: list[TaskRecord]) -> float | None:
+    """Current per-replica value of the service's policy metric, or None if unavailable.
+
+    cpu is a percentage of the CPU limit (of one core when no limit is set);
+    memory is a percentage of the container memory limit; custom is whatever
+    the metric URL reports, interpreted as a per-replica average.
+    """
+    policy = svc.definition.autoscale
+    if policy.metric == "custom":
+        if not policy.metric_url:
+            return None
+        return await _fetch_custom_metric(policy.metric_url)
+
+    # Prefer the collector's recent history; sample directly when it has none
+    window = max(settings.autoscale_interval, 2 * settings.stats_interval)
+    await stats_collector.sync()
+    samples = stats_collector.recent_samples(svc.name, window)
+    if not samples:
+        samples = await _sample_tasks(tasks)
+    if not samples:
+        return None
+    if policy.metric == "cpu":
+        limits = svc.definition.resources.limits if svc.definition.resources else None
+        capacity = limits.cpus if limits and limits.cpus else 1.0
+        return sum(s["cpu_cores"] for s in samples) / len(samples) / capacity * 100
+    return sum(
+        s["memory_bytes"] / s["memory_limit_bytes"] * 100
+        for s in samples if s["memory_limit_bytes"]
+    ) / len(samples)
+
+
+def decide(policy: AutoscalePolicy, current: int, value: float | None) -> tuple[int, str]:
+    """Desired replica count and the reason for it.
+
+    Uses the proportional rule desired = ceil(current * value / target), holds while
+    the ratio stays within the policy's tolerance band, and moves at most `step`
+    replicas per decision, always within [min_replicas, max_replicas].
+    """
+    if current < policy.min_replicas:
+        return min(policy.min_replicas, current + policy.step), "below min_replicas"
+    if current > policy.max_replicas:
+        return max(policy.max_replicas, current - policy.step), "above max_replicas"
+    if value is None:
+        return current, "no metric samples"
+    ratio = value / policy.target
+    if abs(ratio - 1) <= policy.tolerance:
+        return current, f"within tolerance ({ratio:.2f}x target)"
+    if current == 0:
+        return (1 if value > 0 else 0), f"{ratio:.2f}x target"
+    desired = math.ceil(current * ratio)
+    desired = max(current - policy.step, min(current + policy.step, desired))
+    desired = max(policy.min_replicas, min(policy.max_replicas, desired))
+    return desired, f"{ratio:.2f}x target"
+
+
+class Autoscaler:
+    """Periodic autoscale evaluation.
+
+    Decisions and the time each service was last scaled are kept in SQLite,
+    so every API process reports the same history and an evaluation run from
+    any of them honours the cooldown of scalings made by the others.
+    """
+
+    def __init__(self) -> None:
+        self._task: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._poll_loop())
+        logger.info(
+            "Autoscaler started (interval=%ds, dry_run=%s)",
+            settings.autoscale_interval, settings.autoscale_dry_run,
+        )
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            logger.info("Autoscaler stopped")
+
+    async def _poll_loop(self) -> None:
+        while True:
+            await asyncio.sleep(settings.autoscale_interval)
+            try:
+                if leader.leading():
+                    await self.evaluate(dry_run=settings.autoscale_dry_run)
+            except Exception as e:
+                logger.error("Autoscale error: %s", e)
+
+    async def evaluate(self, dry_run: bool = False) -> list[AutoscaleDecision]:
+        """Evaluate every running catalog service that has an autoscale policy."""
+        services = [
+            s for s in await catalog.list_services()
+            if s.definition.autoscale and s.status == ServiceStatus.RUNNING
+        ]
+        if not services:
+            return []
+        live = {s.name: s for s in await cluster_state.services(max_age=0)}
+        tasks: dict[str, list[TaskRecord]] = {}
+        for t in await cluster_state.tasks(max_age=0):
+            if t.state == "running":
+                tasks.setdefault(t.service_name, []).append(t)
+
+        last_scaled = await _last_scaled()
+        results = await asyncio.gather(
+            *(self._evaluate_one(s, live[s.name].replicas, tasks.get(s.name, []), last_scaled, dry_run)
+              for s in services if s.name in live),
+            return_exceptions=True,
+        )
+        decisions = []
+        for result in results:
+            if isinstance(result, BaseException):
+                logger.error("Autoscale evaluation failed: %s", result)
+            else:
+                decisions.append(result)
+        await _record(decisions)
+        return decisions
+
+    async def _evaluate_one(
+        self,
+        svc: CatalogService,
+        current: int,
+        tasks: list[TaskRecord],
+        last_scaled: dict[str, float],
+        dry_run: bool,
+    ) -> AutoscaleDecision:
+        policy = svc.definition.autoscale
+        value = await measure(svc, tasks)
+        desired, reason = decide(policy, current, value)
+
+        since = time.time() - last_scaled.get(svc.name, -math.inf)
+        if desired != current and since < policy.cooldown:
+            reason = f"cooldown ({policy.cooldown - since:.0f}s left); {reason}"
+            desired = current
+
+        action = "hold" if desired == current else ("scale_up" if desired > current else "scale_down")
+        applied = False
+        if action != "hold" and not dry_run:
+            applied = await asyncio.to_thread(swarm_client.scale_service, svc.name, desired)
+            if applied:
+                await _mark_scaled(svc.name)
+                cluster_state.invalidate()
+
+        decision = AutoscaleDecision(
+            service=svc.name,
+            timestamp=datetime.now(timezone.utc),
+            metric=policy.metric,
+            value=round(value, 3) if value is not None else None,
+            target=policy.target,
+            current_replicas=current,
+            desired_replicas=desired,
+            action=action,
+            reason=reason,
+            dry_run=dry_run,
+            applied=applied,
+        )
+        log = logger.info if action != "hold" else logger.debug
+        log(
+            "Autoscale %s: %s %d -> %d (%s=%s, target=%s; %s)%s",
+            svc.name, action, current, desired, policy.metric, decision.value,
+            policy.target, reason, " [dry run]" if dry_run else "",
+        )
+        return decision
+
+
+async def _last_scaled() -> dict[str, float]:
+    db = await get_db()
+    try:
+        rows = await db.execute_fetchall("SELECT service, scaled_at FROM autoscale_scaled")
+    finally:
+        await db.close()
+    return {r["service"]: r["scaled_at"] for r in rows}
+
+
+async def _mark_scaled(service: str) -> None:
+    db = await get_db()
+    try:
+        await db.execute(
+            "INSERT OR REPLACE INTO autoscale_scaled (service, scaled_at) VALUES (?, ?)", (service, time.time())
+        )
+        await db.commit()
+    finally:
+        await db.close()
+
+
+async def _record(decisions: list[AutoscaleDecision]) -> None:
+    """Store decisions, keeping the newest _MAX_DECISIONS."""
+    if not decisions:
+        return
+    db = await get_db()
+    try:
+        await db.executemany(
+            "INSERT INTO autoscale_decisions (service, decision) VALUES (?, ?)",
+            [(d.service, d.model_dump_json()) for d in decisions],
+        )
+        await db.execute(
+            "DELETE FROM autoscale_decisions WHERE id <= (SELECT MAX(id) FROM autoscale_decisions) - ?",
+            (_MAX_DECISIONS,),
+        )
+        await db.commit()
+    finally:
+        await db.close()
+
+
+async def list_decisions(service: str | None = None, limit: int = 100) -> list[AutoscaleDecision]:
+    """Most recent autoscale decisions, newest first."""
+    db = await get_db()
+    try:
+        if service:
+            rows = await db.execute_fetchall(
+                "SELECT decision FROM autoscale_decisions WHERE service = ? ORDER BY id DESC LIMIT ?",
+                (service, limit),
+            )
+        else:
+            rows = await db.execute_fetchall(
+                "SELECT decision FROM autoscale_decisions ORDER BY id DESC LIMIT ?", (limit,)
+            )
+    finally:
+        await db.close()
+    return [AutoscaleDecision.model_validate_json(r["decision"]) for r in rows]
+
+
+autoscaler = Autoscaler()
@@ -0,0 +1,159 @@
+"""Scaling many services in one request, and saving/restoring stack replica counts."""
+from __future__ import annotations
+
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Any
+
+from backend.config import settings
+from backend.database import get_db
+from backend.models.schemas import BatchScaleRequest, BatchScaleResult, ScaleOutcome
+from backend.services.cluster_state import cluster_state
+from backend.services.docker_client import swarm_client
+
+logger = logging.getLogger(__name__)
+
+_STACK_LABEL = "com.docker.stack.namespace"
+_MAX_REPLICAS = 100
+
+
+def _current_replicas(attrs: dict[str, Any]) -> int | None:
+    replicated = attrs["Spec"].get("Mode", {}).get("Replicated")
+    return replicated.get("Replicas", 0) if replicated is not None else None
+
+
+async def _service_attrs() -> dict[str, dict[str, Any]]:
+    return {a["Spec"]["Name"]: a for a in await asyncio.to_thread(swarm_client.list_service_attrs)}
+
+
+async def _apply(targets: dict[str, int], services: dict[str, dict[str, Any]]) -> BatchScaleResult:
+    """Scale every target concurrently from the attrs of one list call."""
+    sem = asyncio.Semaphore(settings.scale_concurrency)
+
+    async def scale(name: str, replicas: int) -> ScaleOutcome:
+        attrs = services.get(name)
+        if attrs is None:
+            return ScaleOutcome(name=name, replicas=replicas, error="service not found")
+        outcome = ScaleOutcome(name=name, previous_replicas=_current_replicas(attrs), replicas=replicas)
+        if outcome.previous_replicas == replicas:
+            outcome.scaled = True
+            return outcome
+        async with sem:
+            try:
+                outcome.attempts = await asyncio.to_thread(
+                    swarm_client.scale_from_attrs, attrs, replicas, settings.scale_conflict_retries
+                )
+                outcome.scaled = True
+            except Exception as e:
+                outcome.error = str(e)
+        return outcome
+
+    results = await asyncio.gather(*(scale(n, r) for n, r in sorted(targets.items())))
+    if any(r.attempts for r in results if r.scaled):
+        cluster_state.invalidate()
+    scaled = sum(1 for r in results if r.scaled)
+    logger.info("Batch scale: %d scaled, %d failed", scaled, len(results) - scaled)
+    return BatchScaleResult(scaled=scaled, failed=len(results) - scaled, results=list(results))
+
+
+async def batch_scale(req: BatchScaleRequest) -> BatchScaleResult:
+    """Scale explicitly named services, or every service matching a label selector.
+
+    With a selector, each matched replicated service is scaled to
+    round(current * multiplier). Growth is capped at 100 replicas; a service
+    already at or above the cap that would grow is reported as failed rather
+    than scaled down.
+    """
+    services = await _service_attrs()
+    if req.replicas:
+        return await _apply(req.replicas, services)
+
+    targets = {}
+    over: list[ScaleOutcome] = []
+    for name, attrs in services.items():
+        labels = attrs["Spec"].get("Labels") or {}
+        current = _current_replicas(attrs)
+        if current is None or any(labels.get(k) != v for k, v in req.selector.items()):
+            continue
+        replicas = round(current * req.multiplier)
+        if replicas > max(current, _MAX_REPLICAS):
+            # Only growth is capped, and capping must not turn it into a scale-down
+            if current >= _MAX_REPLICAS:
+                over.append(ScaleOutcome(
+                    name=name, previous_replicas=current, replicas=replicas,
+                    error=f"above the {_MAX_REPLICAS}-replica limit",
+                ))
+                continue
+            replicas = _MAX_REPLICAS
+        targets[name] = replicas
+    result = await _apply(targets, services)
+    if over:
+        result.results = sorted(result.results + over, key=lambda r: r.name)
+        result.failed += len(over)
+    return result
+
+
+def _stack_services(services: dict[str, dict[str, Any]], stack: str) -> dict[str, dict[str, Any]]:
+    return {
+        name: attrs for name, attrs in services.items()
+        if (attrs["Spec"].get("Labels") or {}).get(_STACK_LABEL) == stack
+    }
+
+
+async def scale_stack_to_zero(stack: str) -> BatchScaleResult | None:
+    """Save the stack's non-zero replica counts, then scale all its services to 0.
+
+    Returns None if no service belongs to the stack. Counts already saved for a
+    service that is now at 0 are kept, so repeating the call is harmless.
+    """
+    services = _stack_services(await _service_attrs(), stack)
+    if not services:
+        return None
+    scope = f"stack:{stack}"
+    now = datetime.now(timezone.utc).isoformat()
+    rows = [
+        (scope, name, current, now) for name, attrs in services.items()
+        if (current := _current_replicas(attrs))
+    ]
+    db = await get_db()
+    try:
+        await db.executemany(
+            """INSERT INTO saved_replicas (scope, service, replicas, saved_at) VALUES (?, ?, ?, ?)
+               ON CONFLICT(scope, service) DO UPDATE SET
+                   replicas=excluded.replicas, saved_at=excluded.saved_at""",
+            rows,
+        )
+        await db.commit()
+    finally:
+        await db.close()
+    targets = {name: 0 for name, attrs in services.items() if _current_replicas(attrs) is not None}
+    return await _apply(targets, services)
+
+
+async def restore_stack(stack: str) -> BatchScaleResult | None:
+    """Scale a stack's services back to their saved counts. Returns None if nothing is saved.
+
+    Saved counts are dropped only for services that were restored successfully.
+    """
+    scope = f"stack:{stack}"
+    db = await get_db()
+    try:
+        cursor = await db.execute("SELECT service, replicas FROM saved_replicas WHERE scope = ?", (scope,))
+        targets = {r["service"]: r["replicas"] for r in await cursor.fetchall()}
+    finally:
+        await db.close()
+    if not targets:
+        return None
+
+    result = await _apply(targets, await _service_attrs())
+    db = await get_db()
+    try:
+        await db.executemany(
+            "DELETE FROM saved_replicas WHERE scope = ? AND service = ?",
+            [(scope, r.name) for r in result.results if r.scaled],
+        )
+        await db.commit()
+    finally:
+        await db.close()
+    return result
@@ -3,9 +3,11 @@ from __future__ import annotations
 import asyncio
 import logging
 from pathlib import Path
+from typing import Callable
 
 from backend.config import settings
 from backend.services.docker_client import swarm_client
+from backend.services.registry_client import registry_client, split_image_ref
 
 logger = logging.getLogger(__name__)
 
@@ -33,13 +35,23 @@ def _parse_image(image: str) -> tuple[str, str]:
     return repository, tag
 
 
-def _run_build(build_context: str, image: str, platform: str) -> tuple[bool, str]:
-    """Synchronous build + push. Intended to be called via asyncio.to_thread."""
+def _run_build(
+    build_context: str, image: str, platform: str, on_line: Callable[[str], None] | None = None
+) -> tuple[bool, str]:
+    """Synchronous build + push. Intended to be called via asyncio.to_thread.
+
+    on_line, if given, is called from this thread with each log line as it is produced.
+    """
     logs: list[str] = []
 
+    def emit(line: str) -> None:
+        logs.append(line)
+        if on_line:
+            on_line(line)
+
     try:
         logger.info("Building %s from %s (platform=%s)", image, build_context, platform)
-        for chunk in swarm_client.client.api.build(
+        for chunk in swarm_client.streamer.api.build(
             path=build_context,
             tag=image,
             platform=platform,
@@ -49,45 +61,53 @@ def _run_build(build_context: str, image: str, platform: str) -> tuple[bool, str
             if "stream" in chunk:
                 line = chunk["stream"].rstrip()
                 if line:
-                    logs.append(line)
+                    emit(line)
                     logger.debug("[build] %s", line)
             elif "error" in chunk:
-                logs.append(f"ERROR: {chunk['error'].strip()}")
+                emit(f"ERROR: {chunk['error'].strip()}")
                 logger.error("[build] %s", chunk["error"])
                 return False, "\n".join(logs)
 
         repository, tag = _parse_image(image)
-        logs.append(f"Pushing {image}...")
+        emit(f"Pushing {image}...")
         logger.info("Pushing %s", image)
 
         seen: set[str] = set()
-        for chunk in swarm_client.client.api.push(repository, tag=tag, stream=True, decode=True):
+        for chunk in swarm_client.streamer.api.push(repository, tag=tag, stream=True, decode=True):
             if "error" in chunk:
-                logs.append(f"ERROR: {chunk['error'].strip()}")
+                emit(f"ERROR: {chunk['error'].strip()}")
                 logger.error("[push] %s", chunk["error"])
                 return False, "\n".join(logs)
             # Log digest lines and status transitions; skip repeated progress spam
             status = chunk.get("status", "")
             digest = chunk.get("aux", {}).get("Digest", "")
             if digest:
-                logs.append(f"Digest: {digest}")
+                emit(f"Digest: {digest}")
             elif status and status not in seen:
                 seen.add(status)
-                logs.append(status)
+                emit(status)
 
-        logs.append("Done.")
+        emit("Done.")
         return True, "\n".join(logs)
 
     except Exception as e:
-        logs.append(f"Exception: {e}")
+        emit(f"Exception: {e}")
         logger.exception("Build/push failed for %s", image)
         return False, "\n".join(logs)
 
 
-async def build_and_push(build_context: str, image: str, platform: str) -> tuple[bool, str]:
+async def build_and_push(
+    build_context: str, image: str, platform: str, on_line: Callable[[str], None] | None = None
+) -> tuple[bool, str]:
     """Build a Docker image from build_context and push it to the registry.
 
     build_context may be an absolute path or a name relative to settings.projects_dir.
+    on_line receives each log line as it is produced, from a worker thread.
     """
     resolved = _resolve_context(build_context)
-    return await asyncio.to_thread(_run_build, resolved, image, platform)
+    success, logs = await asyncio.to_thread(_run_build, resolved, image, platform, on_line)
+    if success:
+        # The tag moved; a deploy right after must not pin the digest cached before the push
+        _, repository, tag, _ = split_image_ref(image)
+        registry_client.forget_digest(repository, tag or "latest")
+    return success, logs
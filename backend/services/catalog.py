@@ -1,21 +1,29 @@
 from __future__ import annotations
 
+import functools
+import hashlib
 import json
 import logging
+from datetime import datetime, timezone
 from pathlib import Path
+from typing import TYPE_CHECKING, Any
 
-import yaml
-
-from backend.database import get_db
+from backend.database import definition_digest, get_db
 from backend.models.db_models import catalog_service_to_row, row_to_catalog_service
 from backend.models.schemas import (
     CatalogService,
+    DefinitionChange,
+    DefinitionDiff,
+    DefinitionVersion,
     ServiceCreate,
     ServiceDefinition,
     ServiceStatus,
     ServiceUpdate,
 )
 
+if TYPE_CHECKING:
+    import aiosqlite
+
 logger = logging.getLogger(__name__)
 
 
@@ -29,6 +37,76 @@ async def list_services() -> list[CatalogService]:
         await db.close()
 
 
+# Must match idx_catalog_image in database.py character for character
+_IMAGE = "json_extract(definition, '$.image')"
+
+
+async def query_services(
+    status: ServiceStatus | None = None,
+    name_prefix: str | None = None,
+    image: str | None = None,
+    labels: dict[str, str | None] | None = None,
+    updated_since: datetime | None = None,
+    limit: int | None = None,
+    cursor: str | None = None,
+) -> tuple[list[CatalogService], str | None]:
+    """Catalog services matching every given filter, ordered by name.
+
+    image is a repository: it matches the bare reference and any tag or digest
+    of it. labels maps key to value, or to None to require only the key.
+    Returns (page, next_cursor); pass next_cursor back as cursor to continue.
+    next_cursor is None on the last page or when no limit is given.
+    """
+    where: list[str] = []
+    params: list[Any] = []
+    if status is not None:
+        where.append("status = ?")
+        params.append(ServiceStatus(status).value)
+    if name_prefix:
+        where.append("name >= ? AND name < ?")
+        params += [name_prefix, name_prefix + "\U0010ffff"]
+    if image:
+        # Range scans on idx_catalog_image for repo, repo:<tag> and repo@<digest>
+        where.append(
+            f"({_IMAGE} = ? OR ({_IMAGE} > ? AND {_IMAGE} < ?) OR ({_IMAGE} > ? AND {_IMAGE} < ?))"
+        )
+        params += [image, image + ":", image + ";", image + "@", image + "A"]
+    for key, value in (labels or {}).items():
+        if value is None:
+            where.append("name IN (SELECT name FROM catalog_labels WHERE key = ?)")
+            params.append(key)
+        else:
+            where.append("name IN (SELECT name FROM catalog_labels WHERE key = ? AND value = ?)")
+            params += [key, value]
+    if updated_since is not None:
+        where.append("updated_at >= ?")
+        if updated_since.tzinfo is None:
+            updated_since = updated_since.replace(tzinfo=timezone.utc)
+        params.append(updated_since.astimezone(timezone.utc).isoformat())
+    if cursor:
+        where.append("name > ?")
+        params.append(cursor)
+
+    sql = "SELECT * FROM catalog_services"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY name"
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(limit + 1)
+
+    db = await get_db()
+    try:
+        rows = await db.execute_fetchall(sql, params)
+    finally:
+        await db.close()
+    services = [row_to_catalog_service(dict(r)) for r in rows]
+    if limit is not None and len(services) > limit:
+        services = services[:limit]
+        return services, services[-1].name
+    return services, None
+
+
 async def get_service(name: str) -> CatalogService | None:
     db = await get_db()
     try:
@@ -49,6 +127,7 @@ async def create_service(data: ServiceCreate) -> CatalogService:
                VALUES (:name, :description, :definition, :status, :swarm_id, :created_at, :updated_at)""",
             row,
         )
+        svc.version = await record_version(db, svc.name, svc.definition, "api")
         await db.commit()
     finally:
         await db.close()
@@ -72,6 +151,8 @@ async def update_service(name: str, data: ServiceUpdate) -> CatalogService | Non
                WHERE name=:name""",
             row,
         )
+        if data.definition is not None:
+            existing.version = await record_version(db, name, existing.definition, "api")
         await db.commit()
     finally:
         await db.close()
@@ -88,26 +169,184 @@ async def delete_service(name: str) -> bool:
         await db.close()
 
 
-async def set_service_status(name: str, status: ServiceStatus, swarm_id: str | None = None) -> None:
+async def set_service_status(
+    name: str, status: ServiceStatus, swarm_id: str | None = None, image_digest: str | None = None
+) -> None:
+    """Set the status; swarm_id and image_digest are only changed when given. "" clears image_digest."""
+    fields: dict[str, Any] = {"status": status.value}
+    if swarm_id is not None:
+        fields["swarm_id"] = swarm_id
+    if image_digest is not None:
+        fields["image_digest"] = image_digest or None
+    assignments = ", ".join(f"{k}=?" for k in fields)
     db = await get_db()
     try:
-        if swarm_id is not None:
-            await db.execute(
-                "UPDATE catalog_services SET status=?, swarm_id=? WHERE name=?",
-                (status.value, swarm_id, name),
-            )
-        else:
-            await db.execute(
-                "UPDATE catalog_services SET status=? WHERE name=?",
-                (status.value, name),
-            )
+        await db.execute(f"UPDATE catalog_services SET {assignments} WHERE name=?", (*fields.values(), name))
+        await db.commit()
+    finally:
+        await db.close()
+
+
+async def record_version(
+    db: aiosqlite.Connection, name: str, definition: ServiceDefinition, source: str
+) -> int:
+    """Make `definition` the current version of a catalog row, inside the caller's transaction.
+
+    A definition identical to the current one is not a new version. One seen
+    before (for this or any service) reuses its stored blob. Returns the
+    current version number.
+    """
+    canonical, digest = definition_digest(definition.model_dump_json())
+    cursor = await db.execute(
+        """SELECT s.version, v.hash FROM catalog_services s
+           LEFT JOIN service_versions v ON v.name = s.name AND v.version = s.version
+           WHERE s.name = ?""",
+        (name,),
+    )
+    current = await cursor.fetchone()
+    if current and current["hash"] == digest:
+        return current["version"]
+    await db.execute("INSERT OR IGNORE INTO definition_blobs (hash, definition) VALUES (?, ?)", (digest, canonical))
+    cursor = await db.execute("SELECT COALESCE(MAX(version), 0) + 1 FROM service_versions WHERE name = ?", (name,))
+    version = (await cursor.fetchone())[0]
+    await db.execute(
+        "INSERT INTO service_versions (name, version, hash, source, created_at) VALUES (?, ?, ?, ?, ?)",
+        (name, version, digest, source, datetime.now(timezone.utc).isoformat()),
+    )
+    await db.execute("UPDATE catalog_services SET version = ? WHERE name = ?", (version, name))
+    return version
+
+
+async def list_versions(name: str) -> list[DefinitionVersion] | None:
+    """Version history of a service, newest first, without definitions. None if not in the catalog."""
+    db = await get_db()
+    try:
+        cursor = await db.execute("SELECT version FROM catalog_services WHERE name = ?", (name,))
+        row = await cursor.fetchone()
+        if not row:
+            return None
+        cursor = await db.execute(
+            "SELECT * FROM service_versions WHERE name = ? ORDER BY version DESC", (name,)
+        )
+        rows = await cursor.fetchall()
+    finally:
+        await db.close()
+    return [
+        DefinitionVersion(
+            version=r["version"], hash=r["hash"], source=r["source"],
+            created_at=r["created_at"], current=r["version"] == row["version"],
+        )
+        for r in rows
+    ]
+
+
+async def get_version(name: str, version: int) -> DefinitionVersion | None:
+    db = await get_db()
+    try:
+        cursor = await db.execute(
+            """SELECT v.*, b.definition, s.version AS current_version
+               FROM service_versions v
+               JOIN definition_blobs b ON b.hash = v.hash
+               JOIN catalog_services s ON s.name = v.name
+               WHERE v.name = ? AND v.version = ?""",
+            (name, version),
+        )
+        r = await cursor.fetchone()
+    finally:
+        await db.close()
+    if not r:
+        return None
+    return DefinitionVersion(
+        version=r["version"], hash=r["hash"], source=r["source"], created_at=r["created_at"],
+        current=r["version"] == r["current_version"],
+        definition=ServiceDefinition(**json.loads(r["definition"])),
+    )
+
+
+def _flatten(value: Any, prefix: str = "") -> dict[str, Any]:
+    """Dotted paths to leaf values; lists are compared as a whole."""
+    if isinstance(value, dict) and value:
+        flat: dict[str, Any] = {}
+        for key, item in value.items():
+            flat.update(_flatten(item, f"{prefix}.{key}" if prefix else key))
+        return flat
+    return {prefix: value}
+
+
+def diff_definitions(old: ServiceDefinition, new: ServiceDefinition) -> list[DefinitionChange]:
+    a, b = _flatten(old.model_dump(mode="json")), _flatten(new.model_dump(mode="json"))
+    return [
+        DefinitionChange(path=path, old=a.get(path), new=b.get(path))
+        for path in sorted(a.keys() | b.keys())
+        if a.get(path) != b.get(path)
+    ]
+
+
+async def diff_versions(name: str, from_version: int, to_version: int) -> DefinitionDiff | None:
+    """Field-level changes between two versions of a service. None if either is unknown."""
+    old, new = await get_version(name, from_version), await get_version(name, to_version)
+    if not old or not new:
+        return None
+    return DefinitionDiff(
+        service=name, from_version=from_version, to_version=to_version,
+        changes=diff_definitions(old.definition, new.definition),
+    )
+
+
+async def set_current_version(name: str, version: int) -> CatalogService | None:
+    """Point the catalog row back at an earlier version. No new version is recorded."""
+    target = await get_version(name, version)
+    if not target:
+        return None
+    db = await get_db()
+    try:
+        await db.execute(
+            "UPDATE catalog_services SET definition = ?, version = ?, updated_at = ? WHERE name = ?",
+            (target.definition.model_dump_json(), version, datetime.now(timezone.utc).isoformat(), name),
+        )
         await db.commit()
     finally:
         await db.close()
+    return await get_service(name)
+
+
+@functools.cache
+def _yaml_loader() -> type:
+    import yaml
+
+    # libyaml-backed loader when available; several times faster on large definition trees
+    return getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+def load_yaml(stream: Any) -> Any:
+    import yaml
+
+    return yaml.load(stream, Loader=_yaml_loader())
+
+
+def parse_definition(data: dict, default_name: str) -> tuple[str, str, ServiceDefinition]:
+    """Split a definition document into (name, description, definition)."""
+    data = dict(data)
+    name = data.pop("name", default_name)
+    description = data.pop("description", "")
+    return name, description, ServiceDefinition(**data)
 
 
 def load_yaml_definition(path: Path) -> tuple[str, ServiceDefinition]:
     with open(path) as f:
-        data = yaml.safe_load(f)
-    name = data.pop("name", path.stem)
-    return name, ServiceDefinition(**data)
+        data = load_yaml(f)
+    name, _, defn = parse_definition(data, path.stem)
+    return name, defn
+
+
+async def fingerprint() -> str:
+    """Hash of every row's name, status and timestamps; changes whenever the catalog does."""
+    db = await get_db()
+    try:
+        cursor = await db.execute(
+            "SELECT name, status, swarm_id, updated_at FROM catalog_services ORDER BY name"
+        )
+        rows = await cursor.fetchall()
+    finally:
+        await db.close()
+    return hashlib.sha256(json.dumps([tuple(r) for r in rows]).encode()).hexdigest()
@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import asyncio
+import functools
+import hashlib
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+import orjson
+
+from backend.config import settings
+from backend.models.records import NodeRecord, ServiceRecord, StackRecord, TaskRecord
+from backend.services.docker_client import SwarmClient, swarm_client
+from backend.services.singleflight import AsyncSingleFlight
+
+logger = logging.getLogger(__name__)
+
+KINDS = ("nodes", "services", "stacks", "tasks")
+
+
+@dataclass
+class _Entry:
+    value: list[Any] = field(default_factory=list)
+    fetched_at: float = 0.0
+    fingerprint: str = ""
+    expired: bool = False
+    error: str = ""
+
+
+class ClusterState:
+    """Shared, TTL-cached view of the swarm's nodes, services, stacks and tasks.
+
+    Concurrent readers of the same kind share one refresh, including reads
+    that force one with max_age=0. Each kind carries a content fingerprint so
+    watchers can tell whether a refresh changed anything.
+
+    Reads that accept the default TTL never queue behind a refresh that is already
+    running, and if a refresh fails they get the last good snapshot instead of an
+    error; stale() then reports True until a refresh succeeds. Reads that ask for
+    an explicit max_age always wait for, and fail with, the refresh.
+    """
+
+    def __init__(self, client: SwarmClient, ttl: float | None = None) -> None:
+        self._client = client
+        self._ttl = settings.cluster_state_ttl if ttl is None else ttl
+        self._entries: dict[str, _Entry] = {kind: _Entry() for kind in KINDS}
+        self._flights = AsyncSingleFlight()
+        self._fetchers: dict[str, Callable[[], list[Any]]] = {
+            "nodes": client.list_nodes,
+            "services": client.list_services,
+            "stacks": client.list_stacks,
+            "tasks": client.list_tasks,
+        }
+
+    async def nodes(self, max_age: float | None = None) -> list[NodeRecord]:
+        return await self._get("nodes", max_age)
+
+    async def services(self, max_age: float | None = None) -> list[ServiceRecord]:
+        return await self._get("services", max_age)
+
+    async def stacks(self, max_age: float | None = None) -> list[StackRecord]:
+        return await self._get("stacks", max_age)
+
+    async def tasks(self, max_age: float | None = None) -> list[TaskRecord]:
+        """Tasks whose desired state is running."""
+        return await self._get("tasks", max_age)
+
+    def age(self, kind: str) -> float | None:
+        """Seconds since `kind` was last fetched, or None if never fetched."""
+        entry = self._entries[kind]
+        return time.monotonic() - entry.fetched_at if entry.fetched_at else None
+
+    def fingerprint(self, kind: str) -> str:
+        return self._entries[kind].fingerprint
+
+    def stale(self, kind: str) -> bool:
+        """True while `kind` is being served from a snapshot whose refresh failed."""
+        return bool(self._entries[kind].error)
+
+    def snapshot(self, kind: str) -> list[Any] | None:
+        """The last good snapshot of `kind`, for a reader that gave up waiting on its refresh.
+
+        None if `kind` was never fetched. stale() reports True from here until
+        a refresh succeeds.
+        """
+        entry = self._entries[kind]
+        if not entry.fetched_at:
+            return None
+        entry.error = entry.error or "refresh timed out"
+        return entry.value
+
+    def invalidate(self, kind: str | None = None) -> None:
+        for k in (kind,) if kind else KINDS:
+            self._entries[k].expired = True
+
+    async def get(self, kind: str, max_age: float | None = None) -> list[Any]:
+        return await self._get(kind, max_age)
+
+    async def refresh(self, kind: str) -> list[Any]:
+        entry = self._entries[kind]
+        try:
+            value = await asyncio.to_thread(self._fetchers[kind])
+        except Exception as e:
+            entry.error = str(e)
+            raise
+        entry.value = value
+        entry.fetched_at = time.monotonic()
+        entry.expired = False
+        entry.error = ""
+        entry.fingerprint = _fingerprint(value)
+        return value
+
+    def _fresh(self, entry: _Entry, limit: float) -> bool:
+        return bool(entry.fetched_at) and not entry.expired and time.monotonic() - entry.fetched_at <= limit
+
+    async def _get(self, kind: str, max_age: float | None) -> list[Any]:
+        entry = self._entries[kind]
+        limit = self._ttl if max_age is None else max_age
+        if self._fresh(entry, limit):
+            return entry.value
+        if max_age is None and entry.fetched_at and self._flights.in_flight(kind):
+            return entry.value  # a refresh is already running; don't wait for it
+        try:
+            return await self._flights.do(kind, functools.partial(self.refresh, kind))
+        except Exception as e:
+            if max_age is not None or not entry.fetched_at:
+                raise
+            logger.warning("Serving stale %s snapshot: %s", kind, e)
+            return entry.value
+
+
+def _fingerprint(items: list[Any]) -> str:
+    return hashlib.sha256(orjson.dumps(items, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+
+cluster_state = ClusterState(swarm_client)
@@ -0,0 +1,106 @@
+"""Registry of the swarms this orchestrator can see, and concurrent fan-out across them."""
+from __future__ import annotations
+
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Awaitable, Callable, TypeVar
+
+from backend.config import settings
+from backend.services.cluster_state import ClusterState, cluster_state
+from backend.services.docker_client import SwarmClient, swarm_client
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+@dataclass(slots=True)
+class Cluster:
+    name: str
+    client: SwarmClient
+    state: ClusterState
+    primary: bool = False
+
+
+class ClusterRegistry:
+    """Named Docker endpoints, each with its own client and cached snapshot.
+
+    The primary cluster is settings.docker_host under settings.cluster_name and
+    shares the process-wide swarm_client and cluster_state; settings.clusters
+    adds further swarms by name. Writes (deploy, scale, drain) still go to the
+    primary cluster only.
+    """
+
+    def __init__(self) -> None:
+        self._clusters: dict[str, Cluster] = {
+            settings.cluster_name: Cluster(settings.cluster_name, swarm_client, cluster_state, primary=True)
+        }
+        for name, host in settings.clusters.items():
+            if name in self._clusters:
+                logger.warning("Ignoring cluster %r: name is used by the primary cluster", name)
+                continue
+            client = SwarmClient(host, cluster=name)
+            self._clusters[name] = Cluster(name, client, ClusterState(client))
+
+    def __iter__(self):
+        return iter(self._clusters.values())
+
+    def get(self, name: str) -> Cluster | None:
+        return self._clusters.get(name)
+
+    def select(self, name: str | None) -> list[Cluster]:
+        """Every cluster, or just `name`. Raises KeyError for an unknown name."""
+        if name is None:
+            return list(self._clusters.values())
+        if name not in self._clusters:
+            raise KeyError(name)
+        return [self._clusters[name]]
+
+    async def fan_out(
+        self,
+        fn: Callable[[Cluster], Awaitable[list[T]]],
+        clusters: list[Cluster] | None = None,
+        timeout: float | None = None,
+        fallback: Callable[[Cluster], list[T] | None] | None = None,
+    ) -> tuple[list[T], dict[str, str]]:
+        """Run fn against each cluster concurrently and concatenate the results.
+
+        Each cluster gets its own timeout; a cluster that fails or times out only
+        drops its own items and is reported in the returned {name: error} map.
+        When a cluster times out, fallback (if given) may supply its items
+        instead, e.g. its last snapshot; it returns None when it has none.
+        """
+        clusters = list(self) if clusters is None else clusters
+        limit = settings.cluster_timeout if timeout is None else timeout
+
+        async def run(cluster: Cluster) -> list[T]:
+            try:
+                return await asyncio.wait_for(fn(cluster), timeout=limit)
+            except TimeoutError:
+                items = fallback(cluster) if fallback else None
+                if items is None:
+                    raise
+                logger.warning("Cluster %s timed out after %gs; serving its last snapshot", cluster.name, limit)
+                return items
+
+        results = await asyncio.gather(*(run(c) for c in clusters), return_exceptions=True)
+        merged: list[T] = []
+        errors: dict[str, str] = {}
+        for cluster, result in zip(clusters, results):
+            if isinstance(result, BaseException):
+                errors[cluster.name] = (
+                    f"timed out after {limit:g}s" if isinstance(result, TimeoutError) else str(result)
+                )
+                logger.warning("Cluster %s unavailable: %s", cluster.name, errors[cluster.name])
+            else:
+                merged.extend(result)
+        return merged, errors
+
+    def close(self) -> None:
+        for cluster in self:
+            if not cluster.primary:
+                cluster.client.close()
+
+
+clusters = ClusterRegistry()
@@ -0,0 +1,219 @@
+"""Incremental bulk sync of YAML definitions in settings.definitions_dir into the catalog."""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path, PurePosixPath
+
+from backend.config import settings
+from backend.database import get_db
+from backend.models.schemas import DefinitionSyncReport, ServiceDefinition
+from backend.services import catalog
+
+logger = logging.getLogger(__name__)
+
+_sync_lock = asyncio.Lock()
+
+
+@dataclass(slots=True)
+class _FileState:
+    rel_path: str
+    mtime_ns: int
+    size: int
+    sha256: str = ""
+    content: bytes = b""
+
+
+@dataclass(slots=True)
+class _Parsed:
+    rel_path: str
+    name: str
+    description: str
+    definition: ServiceDefinition
+
+
+def _excluded(rel: str) -> bool:
+    """Whether rel, or a directory it is in, matches one of settings.definitions_exclude.
+
+    Patterns are anchored at the definitions root: "examples" and "examples/*"
+    match the top-level examples directory only, not a nested one.
+    """
+    path = PurePosixPath("/", rel)
+    candidates = [path, *path.parents[:-1]]
+    return any(
+        c.match("/" + pattern.strip("/")) for pattern in settings.definitions_exclude for c in candidates
+    )
+
+
+def _scan(root: Path) -> list[_FileState]:
+    files = []
+    for path in sorted(root.rglob("*")):
+        if path.suffix not in (".yaml", ".yml") or not path.is_file():
+            continue
+        rel = path.relative_to(root).as_posix()
+        if _excluded(rel):
+            continue
+        st = path.stat()
+        files.append(_FileState(rel_path=rel, mtime_ns=st.st_mtime_ns, size=st.st_size))
+    return files
+
+
+def _parse(files: list[_FileState]) -> tuple[list[_Parsed], dict[str, str]]:
+    parsed: list[_Parsed] = []
+    errors: dict[str, str] = {}
+    for f in files:
+        try:
+            data = catalog.load_yaml(f.content)
+            if not isinstance(data, dict):
+                raise ValueError("definition must be a mapping")
+            name, description, defn = catalog.parse_definition(data, Path(f.rel_path).stem)
+            parsed.append(_Parsed(f.rel_path, name, description, defn))
+        except Exception as e:
+            errors[f.rel_path] = str(e)
+    return parsed, errors
+
+
+def _hash_files(root: Path, files: list[_FileState]) -> dict[str, str]:
+    errors: dict[str, str] = {}
+    for f in files:
+        try:
+            f.content = (root / f.rel_path).read_bytes()
+            f.sha256 = hashlib.sha256(f.content).hexdigest()
+        except OSError as e:
+            errors[f.rel_path] = str(e)
+    return errors
+
+
+async def sync_definitions(prune: bool = False) -> DefinitionSyncReport:
+    """Bring the catalog in line with the definitions tree.
+
+    Only files whose mtime or size changed are read, and only those whose content
+    hash changed are parsed. All catalog and side-table writes are applied in a
+    single transaction. Files that disappeared are reported as deleted; their
+    catalog entries are removed only when prune is set.
+    """
+    async with _sync_lock:
+        return await _sync(prune)
+
+
+async def _sync(prune: bool) -> DefinitionSyncReport:
+    root = settings.defs_path
+    report = DefinitionSyncReport()
+    files = await asyncio.to_thread(_scan, root) if root.is_dir() else []
+
+    db = await get_db()
+    try:
+        cursor = await db.execute("SELECT path, service_name, mtime_ns, size, sha256, missing FROM definition_files")
+        known = {r["path"]: dict(r) for r in await cursor.fetchall()}
+
+        stat_changed = [
+            f for f in files
+            if (row := known.get(f.rel_path)) is None
+            or (row["mtime_ns"], row["size"]) != (f.mtime_ns, f.size)
+        ]
+        report.unchanged = len(files) - len(stat_changed)
+        report.errors.update(await asyncio.to_thread(_hash_files, root, stat_changed))
+        hashed = [f for f in stat_changed if f.sha256]
+
+        # Same content under a new mtime only needs its side-table row refreshed
+        touched = [f for f in hashed if (row := known.get(f.rel_path)) and row["sha256"] == f.sha256]
+        touched_paths = {f.rel_path for f in touched}
+        content_changed = [f for f in hashed if f.rel_path not in touched_paths]
+        report.unchanged += len(touched)
+
+        parsed, parse_errors = await asyncio.to_thread(_parse, content_changed)
+        report.errors.update(parse_errors)
+
+        cursor = await db.execute("SELECT name FROM catalog_services")
+        existing_names = {r["name"] for r in await cursor.fetchall()}
+
+        # A service name may only be claimed by one file, and never one created through the API
+        owners = {row["service_name"]: path for path, row in known.items()}
+        seen_paths = {f.rel_path for f in files}
+        accepted: list[_Parsed] = []
+        for p in parsed:
+            owner = owners.get(p.name)
+            if owner and owner != p.rel_path and owner in seen_paths:
+                report.errors[p.rel_path] = f"service '{p.name}' is already defined in {owner}"
+                continue
+            if not owner and p.name in existing_names:
+                report.errors[p.rel_path] = (
+                    f"service '{p.name}' already exists in the catalog and was not synced from a file"
+                )
+                continue
+            owners[p.name] = p.rel_path
+            accepted.append(p)
+
+        gone_paths = [path for path in known if path not in seen_paths]
+        accepted_names = {p.rel_path: p.name for p in accepted}
+        claimed = {
+            accepted_names.get(path) or known[path]["service_name"]
+            for path in seen_paths if path in accepted_names or path in known
+        }
+        candidates = [known[path]["service_name"] for path in gone_paths]
+        candidates += [known[path]["service_name"] for path in accepted_names if path in known]
+        deleted = sorted({name for name in candidates if name not in claimed})
+        names = {f.rel_path: known[f.rel_path]["service_name"] for f in touched}
+        names.update(accepted_names)
+        by_path = {f.rel_path: f for f in hashed}
+        now = datetime.now(timezone.utc).isoformat()
+
+        await db.execute("BEGIN")
+        for p in accepted:
+            await db.execute(
+                """INSERT INTO catalog_services (name, description, definition, status, created_at, updated_at)
+                   VALUES (?, ?, ?, 'registered', ?, ?)
+                   ON CONFLICT(name) DO UPDATE SET
+                       description=excluded.description,
+                       definition=excluded.definition,
+                       updated_at=excluded.updated_at""",
+                (p.name, p.description, p.definition.model_dump_json(), now, now),
+            )
+            await catalog.record_version(db, p.name, p.definition, "sync")
+            (report.updated if p.name in existing_names else report.created).append(p.name)
+        for path, service_name in names.items():
+            f = by_path[path]
+            await db.execute(
+                """INSERT INTO definition_files (path, service_name, mtime_ns, size, sha256, synced_at)
+                   VALUES (?, ?, ?, ?, ?, ?)
+                   ON CONFLICT(path) DO UPDATE SET
+                       service_name=excluded.service_name, mtime_ns=excluded.mtime_ns,
+                       size=excluded.size, sha256=excluded.sha256, synced_at=excluded.synced_at,
+                       missing=0""",
+                (path, service_name, f.mtime_ns, f.size, f.sha256, now),
+            )
+        returned = [path for path in seen_paths if path in known and known[path]["missing"]]
+        await db.executemany("UPDATE definition_files SET missing = 0 WHERE path = ?", [(p,) for p in returned])
+        report.deleted = deleted
+        if prune:
+            for name in deleted:
+                cursor = await db.execute("DELETE FROM catalog_services WHERE name = ?", (name,))
+                if cursor.rowcount:
+                    report.pruned.append(name)
+        # A vanished file's row is kept, marked missing, while its catalog entry
+        # stays: it still owns the name if the file comes back, and a later
+        # prune can remove the entry. Rows whose name was pruned or moved to
+        # another file are dropped.
+        for path in gone_paths:
+            name = known[path]["service_name"]
+            if name in claimed or (prune and name in deleted):
+                await db.execute("DELETE FROM definition_files WHERE path = ?", (path,))
+            else:
+                await db.execute("UPDATE definition_files SET missing = 1 WHERE path = ?", (path,))
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+    finally:
+        await db.close()
+
+    if report.created or report.updated or report.deleted or report.errors:
+        logger.info(
+            "Definitions sync: %d created, %d updated, %d unchanged, %d deleted, %d errors",
+            len(report.created), len(report.updated), report.unchanged,
+            len(report.deleted), len(report.errors),
+        )
+    return report
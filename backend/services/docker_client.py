@@ -1,45 +1,155 @@
 from __future__ import annotations
 
+import functools
 import logging
-from typing import Any
-
-import docker
-from docker.errors import APIError, NotFound
-from docker.types import EndpointSpec, Mount, RestartPolicy, ServiceMode
+import re
+import threading
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Any, Callable, Iterator, TypeVar
 
 from backend.config import settings
+from backend.models.records import (
+    NodeRecord,
+    NodeServiceRecord,
+    ServiceRecord,
+    StackRecord,
+    TaskRecord,
+)
 from backend.models.schemas import (
     NodeAvailability,
-    NodeService,
     NodeStatus,
     ServiceDefinition,
-    SwarmNode,
-    SwarmService,
-    SwarmStack,
+    ServiceResources,
 )
+from backend.services.resilience import CircuitBreaker, retry
+from backend.services.singleflight import SingleFlight, call_key
+
+# docker (and requests beneath it) is imported on first use to keep startup fast
+if TYPE_CHECKING:
+    import docker
+    from docker.types import Resources
 
 logger = logging.getLogger(__name__)
 
+F = TypeVar("F", bound=Callable[..., Any])
+
+# Set while a guarded call runs, so calls it makes internally are not counted twice
+_guard_state = threading.local()
+_DOCKER_TIME = re.compile(r"(\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d)(\.\d+)?")
+
+
+def _is_transient(exc: Exception) -> bool:
+    """True for failures that say the daemon is unhealthy rather than the request wrong."""
+    from docker.errors import APIError, DockerException
+    from requests import RequestException
+
+    if isinstance(exc, APIError):
+        return exc.is_server_error() and "out of sequence" not in str(exc)
+    return isinstance(exc, (RequestException, DockerException, OSError))
+
+
+def _guarded(idempotent: bool) -> Callable[[F], F]:
+    """Run a SwarmClient method through its circuit breaker; retry it if idempotent.
+
+    Idempotent calls are also coalesced: concurrent calls with the same
+    arguments share one request to the daemon.
+    """
+
+    def decorator(method: F) -> F:
+        @functools.wraps(method)
+        def wrapper(self: SwarmClient, *args: Any, **kwargs: Any) -> Any:
+            if getattr(_guard_state, "active", False):
+                return method(self, *args, **kwargs)
+            if idempotent:
+                key = call_key(method.__name__, args, kwargs)
+                return self._flights.do(key, functools.partial(run, self, *args, **kwargs))
+            return run(self, *args, **kwargs)
+
+        def run(self: SwarmClient, *args: Any, **kwargs: Any) -> Any:
+            self.breaker.before_call()
+            _guard_state.active = True
+            try:
+                call = functools.partial(method, self, *args, **kwargs)
+                if idempotent:
+                    result = retry(
+                        call, settings.docker_read_retries + 1, settings.docker_retry_backoff,
+                        _is_transient,
+                    )
+                else:
+                    result = call()
+            except Exception as e:
+                if _is_transient(e):
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_success()
+                raise
+            finally:
+                _guard_state.active = False
+            self.breaker.record_success()
+            return result
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorator
+
+
+_read = _guarded(idempotent=True)
+_write = _guarded(idempotent=False)
+
 
 class SwarmClient:
-    def __init__(self) -> None:
-        self._client: docker.DockerClient | None = None
+    def __init__(self, base_url: str | None = None, cluster: str = "") -> None:
+        self.base_url = base_url or settings.docker_host
+        self.cluster = cluster
+        self.breaker = CircuitBreaker(
+            f"docker {cluster or self.base_url}",
+            settings.breaker_failure_threshold,
+            settings.breaker_reset_timeout,
+        )
+        self._clients: dict[str, docker.DockerClient] = {}
+        self._clients_lock = threading.Lock()
+        self._flights = SingleFlight()
+
+    def _docker(self, kind: str) -> docker.DockerClient:
+        """docker-py client whose socket timeout suits `kind` of operation."""
+        if kind not in self._clients:
+            import docker
+
+            timeout = {
+                "read": settings.docker_read_timeout,
+                "write": settings.docker_write_timeout,
+                "stream": settings.docker_stream_timeout,
+            }[kind]
+            with self._clients_lock:
+                if kind not in self._clients:
+                    self._clients[kind] = docker.DockerClient(base_url=self.base_url, timeout=timeout)
+        return self._clients[kind]
 
     @property
     def client(self) -> docker.DockerClient:
-        if self._client is None:
-            self._client = docker.DockerClient(base_url=settings.docker_host)
-        return self._client
+        """Client for reads (listings, inspects, stats), with the shortest timeout."""
+        return self._docker("read")
+
+    @property
+    def writer(self) -> docker.DockerClient:
+        """Client for changes to the swarm (create, update, remove)."""
+        return self._docker("write")
+
+    @property
+    def streamer(self) -> docker.DockerClient:
+        """Client for long-running output: builds, pushes and logs."""
+        return self._docker("stream")
 
     def close(self) -> None:
-        if self._client:
-            self._client.close()
-            self._client = None
+        with self._clients_lock:
+            for client in self._clients.values():
+                client.close()
+            self._clients.clear()
 
     # --- Nodes ---
 
-    def _services_by_node(self) -> dict[str, list[NodeService]]:
-        """Return a mapping of node_id -> list of NodeService for running tasks."""
+    def _services_by_node(self) -> dict[str, list[NodeServiceRecord]]:
+        """Return a mapping of node_id -> list of NodeServiceRecord for running tasks."""
         # Build service_id -> (name, image) lookup
         svc_info: dict[str, tuple[str, str]] = {}
         try:
@@ -69,15 +179,16 @@ class SwarmClient:
         except Exception:
             return {}
 
-        result: dict[str, list[NodeService]] = {}
+        result: dict[str, list[NodeServiceRecord]] = {}
         for node_id, svcs in by_node.items():
             result[node_id] = [
-                NodeService(name=v["name"], image=v["image"], replicas_on_node=v["count"])
+                NodeServiceRecord(name=v["name"], image=v["image"], replicas_on_node=v["count"])
                 for v in svcs.values()
             ]
         return result
 
-    def list_nodes(self) -> list[SwarmNode]:
+    @_read
+    def list_nodes(self) -> list[NodeRecord]:
         services_by_node = self._services_by_node()
         nodes = []
         for n in self.client.nodes.list():
@@ -93,7 +204,7 @@ class SwarmClient:
             mem_bytes = resources.get("MemoryBytes", 0)
             node_id = attrs.get("ID", n.id)
 
-            nodes.append(SwarmNode(
+            nodes.append(NodeRecord(
                 id=node_id,
                 hostname=desc.get("Hostname", ""),
                 role=spec.get("Role", "worker"),
@@ -110,10 +221,11 @@ class SwarmClient:
                     "gpus": _count_gpus(resources),
                 },
                 services=services_by_node.get(node_id, []),
+                cluster=self.cluster,
             ))
         return nodes
 
-    def get_node(self, node_id: str) -> SwarmNode | None:
+    def get_node(self, node_id: str) -> NodeRecord | None:
         for node in self.list_nodes():
             if node.id == node_id or node.hostname == node_id:
                 return node
@@ -125,9 +237,12 @@ class SwarmClient:
     def activate_node(self, node_id: str) -> bool:
         return self._set_availability(node_id, "active")
 
+    @_write
     def _set_availability(self, node_id: str, availability: str) -> bool:
+        from docker.errors import APIError, NotFound
+
         try:
-            node = self.client.nodes.get(node_id)
+            node = self.writer.nodes.get(node_id)
             spec = node.attrs["Spec"]
             spec["Availability"] = availability
             node.update(spec)
@@ -138,7 +253,8 @@ class SwarmClient:
 
     # --- Services ---
 
-    def list_services(self) -> list[SwarmService]:
+    @_read
+    def list_services(self) -> list[ServiceRecord]:
         node_hostnames: dict[str, str] = {}
         try:
             for n in self.client.nodes.list():
@@ -187,7 +303,7 @@ class SwarmClient:
 
             nodes = sorted(node_hostnames.get(nid, nid) for nid in node_ids)
 
-            services.append(SwarmService(
+            services.append(ServiceRecord(
                 id=attrs.get("ID", svc.id),
                 name=spec.get("Name", svc.name),
                 image=container_spec.get("Image", ""),
@@ -197,10 +313,58 @@ class SwarmClient:
                 ports=ports,
                 nodes=nodes,
                 created_at=attrs.get("CreatedAt", ""),
+                cluster=self.cluster,
             ))
         return services
 
-    def list_stacks(self) -> list[SwarmStack]:
+    @_read
+    def list_tasks(self, filters: dict[str, Any] | None = None) -> list[TaskRecord]:
+        """List tasks matching Docker task filters (default: desired-state running)."""
+        svc_names: dict[str, str] = {}
+        try:
+            for svc in self.client.services.list():
+                attrs = svc.attrs or {}
+                svc_names[attrs.get("ID", svc.id)] = attrs.get("Spec", {}).get("Name", svc.name)
+        except Exception:
+            pass
+
+        return [
+            self._task_record(t, svc_names.get(t.get("ServiceID", ""), ""))
+            for t in self.client.api.tasks(filters=filters or {"desired-state": "running"})
+        ]
+
+    @_read
+    def service_tasks(self, service_id: str) -> list[TaskRecord]:
+        """Every task of one service, in any state, without resolving service names."""
+        return [self._task_record(t) for t in self.client.api.tasks(filters={"service": service_id})]
+
+    def _task_record(self, t: dict[str, Any], service_name: str = "") -> TaskRecord:
+        status = t.get("Status", {})
+        container = status.get("ContainerStatus", {})
+        spec = t.get("Spec", {})
+        reservations = spec.get("Resources", {}).get("Reservations", {})
+        return TaskRecord(
+            id=t.get("ID", ""),
+            service_id=t.get("ServiceID", ""),
+            service_name=service_name,
+            node_id=t.get("NodeID", ""),
+            slot=t.get("Slot"),
+            state=status.get("State", ""),
+            desired_state=t.get("DesiredState", ""),
+            message=status.get("Message", ""),
+            error=status.get("Err", ""),
+            exit_code=container.get("ExitCode"),
+            container_id=container.get("ContainerID", ""),
+            image=spec.get("ContainerSpec", {}).get("Image", ""),
+            timestamp=status.get("Timestamp", ""),
+            reserved_cpus=reservations.get("NanoCPUs", 0) / 1e9,
+            reserved_memory_mb=reservations.get("MemoryBytes", 0) / (1024 * 1024),
+            reserved_gpus=_count_gpus(reservations),
+            cluster=self.cluster,
+        )
+
+    @_read
+    def list_stacks(self) -> list[StackRecord]:
         """Group services by com.docker.stack.namespace label into stacks."""
         node_hostnames: dict[str, str] = {}
         try:
@@ -265,7 +429,7 @@ class SwarmClient:
                 status = "running"
 
             nodes = sorted(node_hostnames.get(nid, nid) for nid in data["node_ids"])
-            result.append(SwarmStack(
+            result.append(StackRecord(
                 name=name,
                 status=status,
                 services=sorted(data["services"]),
@@ -274,74 +438,144 @@ class SwarmClient:
                 desired_replicas=desired,
                 ports=sorted(data["ports"], key=int),
                 nodes=nodes,
+                cluster=self.cluster,
             ))
         return sorted(result, key=lambda s: s.name)
 
+    @_write
     def deploy_service(self, name: str, defn: ServiceDefinition) -> str:
-        kwargs: dict[str, Any] = {
-            "image": defn.image,
-            "name": name,
-            "mode": ServiceMode("replicated", replicas=defn.replicas),
-            "restart_policy": RestartPolicy(condition="on-failure"),
-        }
-
-        if defn.ports:
-            port_configs: dict[int, int] = {}
-            for p in defn.ports:
-                parts = p.split(":")
-                if len(parts) == 2:
-                    port_configs[int(parts[0])] = int(parts[1])
-            if port_configs:
-                kwargs["endpoint_spec"] = EndpointSpec(ports=port_configs)
-
-        if defn.env:
-            kwargs["env"] = [f"{k}={v}" for k, v in defn.env.items()]
-
-        if defn.constraints:
-            kwargs["constraints"] = defn.constraints
-
-        if defn.labels:
-            kwargs["labels"] = defn.labels
-
-        if defn.mounts:
-            mounts = []
-            for m in defn.mounts:
-                parts = m.split(":")
-                if len(parts) >= 2:
-                    mounts.append(Mount(target=parts[1], source=parts[0], type="bind"))
-            if mounts:
-                kwargs["mounts"] = mounts
-
-        if defn.networks:
-            kwargs["networks"] = defn.networks
-
-        if defn.command:
-            kwargs["command"] = defn.command
+        svc = self.writer.services.create(**_service_kwargs(name, defn))
+        return svc.id
 
-        svc = self.client.services.create(**kwargs)
+    @_write
+    def redeploy_service(self, name: str, defn: ServiceDefinition, retries: int = 3) -> str:
+        """Replace a deployed service's whole spec with `defn`, like `docker service update`.
+
+        The service keeps its ID and Swarm rolls its tasks over to the new spec;
+        nothing is built. Version conflicts are retried against a fresh inspect.
+        Returns the service ID.
+        """
+        from docker.errors import APIError
+
+        svc = self.writer.services.get(name)
+        kwargs = _service_kwargs(name, defn)
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                svc.update(**kwargs)
+                return svc.id
+            except APIError as e:
+                if "out of sequence" not in str(e) or attempt > retries:
+                    raise
+                svc.reload()
+
+    @_write
+    def create_pull_job(self, name: str, image: str, node_id: str, labels: dict[str, str]) -> str:
+        """Start a one-shot job on one node whose only effect is pulling `image` there.
+
+        The entrypoint is replaced with `true`; whether that exists in the image
+        doesn't matter, since the container can only be created once the pull
+        has succeeded. Returns the job's service ID.
+        """
+        from docker.types import RestartPolicy, ServiceMode
+
+        svc = self.writer.services.create(
+            image=image,
+            name=name,
+            command=["true"],
+            mode=ServiceMode("replicated-job", concurrency=1, replicas=1),
+            constraints=[f"node.id=={node_id}"],
+            restart_policy=RestartPolicy(condition="none"),
+            labels=labels,
+        )
         return svc.id
 
+    @_write
     def remove_service(self, name: str) -> bool:
+        from docker.errors import APIError, NotFound
+
         try:
-            svc = self.client.services.get(name)
+            svc = self.writer.services.get(name)
             svc.remove()
             return True
         except (NotFound, APIError) as e:
             logger.error("Failed to remove service %s: %s", name, e)
             return False
 
+    @_write
     def scale_service(self, name: str, replicas: int) -> bool:
+        from docker.errors import APIError, NotFound
+
         try:
-            svc = self.client.services.get(name)
-            svc.scale(replicas)
+            svc = self.writer.services.get(name)
+            self.scale_from_attrs(svc.attrs, replicas)
             return True
-        except (NotFound, APIError) as e:
+        except (NotFound, APIError, ValueError) as e:
             logger.error("Failed to scale service %s: %s", name, e)
             return False
 
+    @_read
+    def network_names(self) -> set[str]:
+        return {n.get("Name", "") for n in self.client.api.networks()}
+
+    @_write
+    def create_network(self, name: str, driver: str, labels: dict[str, str], attachable: bool = False) -> str:
+        """Create a swarm-scoped network. Returns its ID."""
+        return self.writer.api.create_network(
+            name, driver=driver, scope="swarm", labels=labels, attachable=attachable
+        )["Id"]
+
+    @_read
+    def list_service_attrs(self) -> list[dict[str, Any]]:
+        """Raw service objects (ID, Version, Spec, ...) from a single list call."""
+        return self.client.api.services()
+
+    @_write
+    def update_spec(self, service_id: str, version: int, spec: dict[str, Any]) -> None:
+        """Write a complete service spec, as fetched earlier, at the given version."""
+        self.writer.api.update_service(
+            service_id,
+            version,
+            task_template=spec.get("TaskTemplate"),
+            name=spec.get("Name"),
+            labels=spec.get("Labels"),
+            mode=spec.get("Mode"),
+            update_config=spec.get("UpdateConfig"),
+            endpoint_spec=spec.get("EndpointSpec"),
+            rollback_config=spec.get("RollbackConfig"),
+        )
+
+    @_write
+    def scale_from_attrs(self, attrs: dict[str, Any], replicas: int, retries: int = 3) -> int:
+        """Scale using already-fetched service attrs, without inspecting the service first.
+
+        On a version conflict (the service changed since attrs were read) the service
+        is re-inspected and the update retried. Returns the number of attempts made.
+        """
+        from docker.errors import APIError
+
+        attempt = 0
+        while True:
+            attempt += 1
+            spec = attrs["Spec"]
+            if "Replicated" not in spec.get("Mode", {}):
+                raise ValueError("only replicated services can be scaled")
+            spec = {**spec, "Mode": {"Replicated": {"Replicas": replicas}}}
+            try:
+                self.update_spec(attrs["ID"], attrs["Version"]["Index"], spec)
+                return attempt
+            except APIError as e:
+                if "out of sequence" not in str(e) or attempt > retries:
+                    raise
+                attrs = self.writer.api.inspect_service(attrs["ID"])
+
+    @_read
     def get_service_logs(self, name: str, tail: int = 100) -> str:
+        from docker.errors import APIError, NotFound
+
         try:
-            svc = self.client.services.get(name)
+            svc = self.streamer.services.get(name)
             logs = svc.logs(stdout=True, stderr=True, tail=tail)
             if isinstance(logs, bytes):
                 return logs.decode("utf-8", errors="replace")
@@ -352,6 +586,73 @@ class SwarmClient:
         except (NotFound, APIError) as e:
             return f"Error fetching logs: {e}"
 
+    def follow_service_logs(self, name: str, since: int) -> Iterator[bytes]:
+        """Stream a service's log output from `since` (unix seconds) as raw chunks.
+
+        Lines carry an RFC 3339 timestamp and the task/node details, and may be
+        split across chunks. The stream ends when the streaming client's socket
+        timeout passes without output, so callers reconnect.
+        """
+        svc = self.streamer.services.get(name)
+        return svc.logs(
+            details=True, follow=True, stdout=True, stderr=True, timestamps=True, since=since
+        )
+
+    @_read
+    def log_tasks(self, name: str) -> tuple[list[TaskRecord], bool]:
+        """Every task of a service, in any state, and whether it runs with a TTY (raw, unframed logs)."""
+        attrs = self.client.api.inspect_service(name)
+        spec = attrs.get("Spec", {})
+        tty = bool(spec.get("TaskTemplate", {}).get("ContainerSpec", {}).get("TTY"))
+        tasks = self.client.api.tasks(filters={"service": attrs["ID"]})
+        return [self._task_record(t, spec.get("Name", name)) for t in tasks], tty
+
+    def task_logs(self, task_id: str, since: int = 0, tail: int | None = None, tty: bool = False) -> Iterator[bytes]:
+        """One task's log lines, oldest first, each starting with its RFC 3339 timestamp.
+
+        docker-py has no call for the task logs endpoint, so this uses the
+        request helpers its service_logs is built on. Closing the iterator
+        closes the connection, so callers can stop reading part way through.
+        """
+        api = self.streamer.api
+        params = {
+            "stdout": 1, "stderr": 1, "timestamps": 1, "since": since, "tail": "all" if tail is None else tail,
+        }
+        res = api._get(api._url("/tasks/{0}/logs", task_id), params=params, stream=True)
+        if tty:
+            chunks = api._stream_raw_result(res, chunk_size=65536, decode=False)
+        else:
+            chunks = api._get_result_tty(True, res, False)
+        return _split_lines(chunks, res)
+
+    @_read
+    def container_stats(self, container_id: str, one_shot: bool = False) -> dict[str, float] | None:
+        """One stats sample for a container on this daemon. See parse_container_stats.
+
+        one_shot returns immediately instead of waiting for a second CPU reading, so
+        cpu_cores is 0 and callers derive it from the raw counters of consecutive samples.
+        Returns None when the container is not visible to this daemon (e.g. it runs on
+        another node) or has already exited.
+        """
+        from docker.errors import APIError, NotFound
+
+        try:
+            stats = self.client.api.stats(container_id, stream=False, one_shot=one_shot or None)
+        except (NotFound, APIError):
+            return None
+        return parse_container_stats(stats)
+
+    @_read
+    def ping(self) -> bool:
+        return self.client.ping()
+
+    def get_node_id(self) -> str:
+        """Swarm node ID of the daemon this client is connected to."""
+        try:
+            return self.client.info().get("Swarm", {}).get("NodeID", "")
+        except Exception:
+            return ""
+
     def get_swarm_id(self) -> str:
         try:
             info = self.client.info()
@@ -360,6 +661,122 @@ class SwarmClient:
             return ""
 
 
+def parse_container_stats(stats: dict) -> dict[str, float] | None:
+    """Reduce a Docker stats payload to cpu cores in use, memory usage and limit, and raw CPU counters."""
+    cpu = stats.get("cpu_stats", {})
+    precpu = stats.get("precpu_stats", {})
+    mem = stats.get("memory_stats", {})
+    if not cpu or not mem:
+        return None
+    cpu_delta = cpu.get("cpu_usage", {}).get("total_usage", 0) - precpu.get("cpu_usage", {}).get("total_usage", 0)
+    system_delta = cpu.get("system_cpu_usage", 0) - precpu.get("system_cpu_usage", 0)
+    online = cpu.get("online_cpus") or len(cpu.get("cpu_usage", {}).get("percpu_usage") or []) or 1
+    cores = cpu_delta / system_delta * online if system_delta > 0 and cpu_delta > 0 else 0.0
+    # Match `docker stats`: page cache is not counted as used memory
+    mem_stats = mem.get("stats", {})
+    cache = mem_stats.get("inactive_file", mem_stats.get("cache", 0))
+    return {
+        "cpu_cores": cores,
+        "memory_bytes": float(max(mem.get("usage", 0) - cache, 0)),
+        "memory_limit_bytes": float(mem.get("limit", 0)),
+        "cpu_total_usage": float(cpu.get("cpu_usage", {}).get("total_usage", 0)),
+        "system_cpu_usage": float(cpu.get("system_cpu_usage", 0)),
+        "online_cpus": float(online),
+    }
+
+
+def _split_lines(chunks: Iterator[bytes], response: Any) -> Iterator[bytes]:
+    """Lines of a chunked log stream, which may split a line across chunks. Closes `response` when done."""
+    try:
+        pending = b""
+        for chunk in chunks:
+            *lines, pending = (pending + chunk).split(b"\n")
+            yield from lines
+        if pending:
+            yield pending
+    finally:
+        response.close()
+
+
+def parse_docker_time(ts: str) -> str:
+    """Docker's nanosecond RFC 3339 timestamp as a sortable UTC isoformat string.
+
+    Docker trims trailing zeros from the fraction, so raw timestamps don't sort
+    as strings. Unparseable values map to the current time.
+    """
+    m = _DOCKER_TIME.match(ts or "")
+    if not m:
+        return datetime.now(timezone.utc).isoformat(timespec="microseconds")
+    dt = datetime.fromisoformat(m[1] + (m[2] or "")[:7]).replace(tzinfo=timezone.utc)
+    return dt.isoformat(timespec="microseconds")
+
+
+def _service_kwargs(name: str, defn: ServiceDefinition) -> dict[str, Any]:
+    """Arguments for services.create / Service.update describing `defn` completely."""
+    from docker.types import EndpointSpec, Mount, RestartPolicy, ServiceMode
+
+    kwargs: dict[str, Any] = {
+        "image": defn.image,
+        "name": name,
+        "mode": ServiceMode("replicated", replicas=defn.replicas),
+        "restart_policy": RestartPolicy(condition="on-failure"),
+    }
+
+    if defn.ports:
+        port_configs: dict[int, int] = {}
+        for p in defn.ports:
+            parts = p.split(":")
+            if len(parts) == 2:
+                port_configs[int(parts[0])] = int(parts[1])
+        if port_configs:
+            kwargs["endpoint_spec"] = EndpointSpec(ports=port_configs)
+
+    if defn.env:
+        kwargs["env"] = [f"{k}={v}" for k, v in defn.env.items()]
+
+    if defn.constraints:
+        kwargs["constraints"] = defn.constraints
+
+    if defn.labels:
+        kwargs["labels"] = defn.labels
+
+    if defn.mounts:
+        mounts = []
+        for m in defn.mounts:
+            parts = m.split(":")
+            if len(parts) >= 2:
+                # Absolute sources are host paths; anything else names a volume
+                kind = "bind" if parts[0].startswith("/") else "volume"
+                mounts.append(Mount(target=parts[1], source=parts[0], type=kind, read_only=parts[2:3] == ["ro"]))
+        if mounts:
+            kwargs["mounts"] = mounts
+
+    if defn.networks:
+        kwargs["networks"] = defn.networks
+
+    if defn.command:
+        kwargs["command"] = defn.command
+
+    if defn.resources:
+        kwargs["resources"] = _build_resources(defn.resources)
+
+    return kwargs
+
+
+def _build_resources(res: ServiceResources) -> Resources:
+    from docker.types import Resources
+
+    mb = 1024 * 1024
+    limits, reservations = res.limits, res.reservations
+    return Resources(
+        cpu_limit=int(limits.cpus * 1e9) if limits.cpus else None,
+        mem_limit=int(limits.memory_mb * mb) if limits.memory_mb else None,
+        cpu_reservation=int(reservations.cpus * 1e9) if reservations.cpus else None,
+        mem_reservation=int(reservations.memory_mb * mb) if reservations.memory_mb else None,
+        generic_resources={"GPU": reservations.gpus} if reservations.gpus else None,
+    )
+
+
 def _count_gpus(resources: dict) -> int:
     for gr in resources.get("GenericResources", []):
         spec = gr.get("DiscreteResourceSpec", {})
@@ -368,4 +785,4 @@ def _count_gpus(resources: dict) -> int:
     return 0
 
 
-swarm_client = SwarmClient()
+swarm_client = SwarmClient(cluster=settings.cluster_name)
@@ -0,0 +1,256 @@
+"""Draining nodes in waves, with a capacity check first and task tracking after.
+
+Only replicated services are rescheduled when a node drains; global services
+and jobs just stop there. A plan groups the nodes into waves of at most
+max_parallel. Without rolling, every node stays drained, so their replicated
+tasks must fit on the other nodes all together, or the evacuation is refused.
+With rolling, each wave is activated again after its maintenance before the
+next one drains. A wave then only has to fit on the nodes outside it, and
+nodes are added to it while that still holds.
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import defaultdict
+from typing import Any
+
+from backend.config import settings
+from backend.models.records import NodeRecord, TaskRecord
+from backend.models.schemas import (
+    EvacuationPlan,
+    EvacuationWave,
+    NodeAvailability,
+    NodeStatus,
+    PlacementCandidate,
+    ResourceSpec,
+    ServiceDefinition,
+    ServiceResources,
+)
+from backend.services import singleflight
+from backend.services.cluster_state import cluster_state
+from backend.services.docker_client import swarm_client
+from backend.services.jobs import JobContext
+from backend.services.placement import CapacityModel
+
+_POLL_INTERVAL = 2.0
+
+
+def _replicated_services(attrs: list[dict[str, Any]]) -> dict[str, list[str]]:
+    """Constraints of each replicated service, by name, from raw service objects."""
+    services = {}
+    for a in attrs:
+        spec = a.get("Spec", {})
+        if "Replicated" in spec.get("Mode", {}):
+            placement = spec.get("TaskTemplate", {}).get("Placement", {})
+            services[spec.get("Name", "")] = placement.get("Constraints") or []
+    return services
+
+
+def _load(tasks: list[TaskRecord], node_ids: set[str], services: dict[str, list[str]]) -> dict[str, list[TaskRecord]]:
+    """Tasks that would be rescheduled if node_ids drained, by service."""
+    load: dict[str, list[TaskRecord]] = defaultdict(list)
+    for t in tasks:
+        if t.node_id in node_ids and t.service_name in services:
+            load[t.service_name].append(t)
+    return load
+
+
+def _unplaceable(
+    nodes: list[NodeRecord], tasks: list[TaskRecord], node_ids: set[str], services: dict[str, list[str]]
+) -> dict[str, int]:
+    """Replicas per service that would find no room if node_ids drained together."""
+    model = CapacityModel([n for n in nodes if n.id not in node_ids], tasks)
+    missing = {}
+    for name, moved in sorted(_load(tasks, node_ids, services).items()):
+        t = moved[0]
+        reservations = ResourceSpec(cpus=t.reserved_cpus, memory_mb=t.reserved_memory_mb, gpus=t.reserved_gpus)
+        defn = ServiceDefinition(
+            image=t.image or name, replicas=len(moved), constraints=services[name],
+            resources=ServiceResources(reservations=reservations),
+        )
+        placed = model.place(PlacementCandidate(name=name, definition=defn))
+        if not placed.fits:
+            missing[name] = placed.requested - placed.placed
+    return missing
+
+
+def resolve_nodes(nodes: list[NodeRecord], refs: list[str]) -> list[NodeRecord]:
+    """Nodes by ID or hostname, in the order given. Raises ValueError for unknown ones."""
+    by_ref = {n.id: n for n in nodes} | {n.hostname: n for n in nodes}
+    unknown = [r for r in refs if r not in by_ref]
+    if unknown:
+        raise ValueError(f"Unknown node(s): {', '.join(unknown)}")
+    return list({by_ref[r].id: by_ref[r] for r in refs}.values())
+
+
+def plan_evacuation(
+    nodes: list[NodeRecord],
+    tasks: list[TaskRecord],
+    services: dict[str, list[str]],
+    targets: list[NodeRecord],
+    max_parallel: int = 1,
+    rolling: bool = False,
+) -> EvacuationPlan:
+    """Group targets into waves and check that the other nodes can take their load."""
+    start = time.perf_counter()
+    unplaceable: dict[str, int] = {}
+    reason = ""
+    if not rolling:
+        unplaceable = _unplaceable(nodes, tasks, {n.id for n in targets}, services)
+        if unplaceable:
+            reason = "the remaining nodes cannot absorb the tasks of all drained nodes"
+        groups = [targets[i:i + max_parallel] for i in range(0, len(targets), max_parallel)]
+    else:
+        groups, current = [], []
+        for node in targets:
+            trial = current + [node]
+            if len(trial) <= max_parallel and not _unplaceable(nodes, tasks, {n.id for n in trial}, services):
+                current = trial
+                continue
+            if current:
+                groups.append(current)
+            current = [node]
+            missing = _unplaceable(nodes, tasks, {node.id}, services)
+            if missing:
+                for name, count in missing.items():
+                    unplaceable[name] = max(unplaceable.get(name, 0), count)
+                reason = reason or f"the other nodes cannot absorb the tasks of {node.hostname} alone"
+        if current:
+            groups.append(current)
+
+    waves = []
+    for group in groups:
+        ids = {n.id for n in group}
+        waves.append(EvacuationWave(
+            nodes=[n.hostname for n in group], node_ids=[n.id for n in group],
+            tasks=sum(len(v) for v in _load(tasks, ids, services).values()),
+        ))
+    return EvacuationPlan(
+        fits=not unplaceable,
+        rolling=rolling,
+        waves=waves,
+        services={k: len(v) for k, v in sorted(_load(tasks, {n.id for n in targets}, services).items())},
+        unplaceable=unplaceable,
+        reason=reason,
+        elapsed_ms=round((time.perf_counter() - start) * 1000, 3),
+    )
+
+
+async def plan(refs: list[str], max_parallel: int = 1, rolling: bool = False) -> EvacuationPlan:
+    """Plan an evacuation of the DOCKER_HOST cluster from fresh node, task and service lists."""
+    nodes, tasks, attrs = await asyncio.gather(
+        cluster_state.nodes(max_age=0),
+        cluster_state.tasks(max_age=0),
+        singleflight.to_thread(swarm_client.list_service_attrs),
+    )
+    targets = resolve_nodes(nodes, refs)
+    return plan_evacuation(nodes, tasks, _replicated_services(attrs), targets, max_parallel, rolling)
+
+
+def _service_progress(tasks: list[TaskRecord], drained: set[str], names: set[str]) -> dict[str, dict]:
+    """Per service: replicas running off the drained nodes, still starting, and left on them."""
+    progress = {n: {"running": 0, "starting": 0, "on_drained": 0} for n in sorted(names)}
+    for t in tasks:
+        entry = progress.get(t.service_name)
+        if entry is None:
+            continue
+        if t.node_id in drained:
+            entry["on_drained"] += 1
+        elif t.state == "running":
+            entry["running"] += 1
+        else:
+            entry["starting"] += 1
+    for entry in progress.values():
+        entry["settled"] = not entry["starting"] and not entry["on_drained"]
+    return progress
+
+
+async def _wait_for_activation(ctx: JobContext, wave: dict, fraction: float, detail: dict) -> None:
+    while True:
+        nodes = {n.id: n for n in await asyncio.to_thread(swarm_client.list_nodes)}
+        waiting = [
+            hostname for hostname, node_id in zip(wave["nodes"], wave["node_ids"])
+            if (n := nodes.get(node_id)) is None
+            or n.availability != NodeAvailability.ACTIVE or n.status != NodeStatus.READY
+        ]
+        if not waiting:
+            return
+        detail["waiting_for"] = waiting
+        await ctx.progress(fraction, f"waiting for {', '.join(waiting)} to be activated", detail)
+        await asyncio.sleep(_POLL_INTERVAL)
+
+
+async def evacuate(ctx: JobContext) -> dict:
+    """Job body. params: waves (from a plan), rolling.
+
+    Drains each wave's nodes at once and waits until every replicated service
+    that had tasks there is running all its replicas elsewhere. With rolling,
+    it then waits for the wave's nodes to be activated again. Progress detail
+    records the finished waves and the current phase, so a resumed job picks
+    up where the last attempt stopped.
+    """
+    waves, rolling = ctx.params["waves"], ctx.params.get("rolling", False)
+    previous = ctx.detail or {}
+    done = previous.get("completed_waves", 0)
+    drained: set[str] = set()
+    if not rolling:
+        for wave in waves[:done]:
+            drained.update(wave["node_ids"])
+
+    for i, wave in enumerate(waves[done:], start=done):
+        label = f"wave {i + 1}/{len(waves)}"
+        detail: dict[str, Any] = {
+            "waves": len(waves), "completed_waves": i, "wave": wave["nodes"], "phase": "draining",
+        }
+        if not (i == done and previous.get("phase") == "waiting"):
+            await _drain_wave(ctx, i, wave, label, drained, detail)
+        if rolling:
+            detail["phase"] = "waiting"
+            ctx.log(f"{label}: waiting for {', '.join(wave['nodes'])} to be activated after maintenance")
+            await _wait_for_activation(ctx, wave, (i + 1) / len(waves), detail)
+            drained.difference_update(wave["node_ids"])
+            detail.pop("waiting_for", None)
+        detail.update(completed_waves=i + 1, phase="done")
+        await ctx.progress((i + 1) / len(waves), f"{label} done", detail)
+
+    return {"waves": len(waves), "nodes": [h for w in waves for h in w["nodes"]], "rolling": rolling}
+
+
+async def _drain_wave(
+    ctx: JobContext, i: int, wave: dict, label: str, drained: set[str], detail: dict[str, Any]
+) -> None:
+    waves = detail["waves"]
+    attrs, tasks = await asyncio.gather(
+        asyncio.to_thread(swarm_client.list_service_attrs), asyncio.to_thread(swarm_client.list_tasks)
+    )
+    affected = set(_load(tasks, set(wave["node_ids"]), _replicated_services(attrs)))
+    ctx.log(f"{label}: draining {', '.join(wave['nodes'])} ({len(affected)} service(s) to move)")
+
+    results = await asyncio.gather(
+        *(asyncio.to_thread(swarm_client.drain_node, node_id) for node_id in wave["node_ids"])
+    )
+    if not all(results):
+        failed = [h for h, ok in zip(wave["nodes"], results) if not ok]
+        raise RuntimeError(f"failed to drain {', '.join(failed)}")
+    cluster_state.invalidate()
+    drained.update(wave["node_ids"])
+
+    started = time.monotonic()
+    while True:
+        tasks = await asyncio.to_thread(swarm_client.list_tasks)
+        progress = _service_progress(tasks, drained, affected)
+        settled = sum(1 for p in progress.values() if p["settled"])
+        detail["services"] = progress
+        fraction = (i + (settled / len(progress) if progress else 1)) / waves
+        await ctx.progress(fraction, f"{label}: {settled}/{len(progress)} service(s) rescheduled", detail)
+        if settled == len(progress):
+            break
+        if time.monotonic() - started > settings.evacuation_timeout:
+            pending = [name for name, p in progress.items() if not p["settled"]]
+            raise TimeoutError(
+                f"{label}: not rescheduled after {settings.evacuation_timeout:g}s: {', '.join(pending)}"
+            )
+        await asyncio.sleep(_POLL_INTERVAL)
+    ctx.log(f"{label}: evacuated in {time.monotonic() - started:.0f}s")
+    cluster_state.invalidate()
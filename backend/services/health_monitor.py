@@ -7,6 +7,7 @@ from backend.config import settings
 from backend.models.schemas import ServiceStatus
 from backend.services import catalog
 from backend.services.docker_client import swarm_client
+from backend.services.leader import leader
 
 logger = logging.getLogger(__name__)
 
@@ -32,7 +33,8 @@ class HealthMonitor:
     async def _poll_loop(self) -> None:
         while True:
             try:
-                await self._sync_statuses()
+                if leader.leading():
+                    await self._sync_statuses()
             except Exception as e:
                 logger.error("Health poll error: %s", e)
             await asyncio.sleep(settings.health_check_interval)
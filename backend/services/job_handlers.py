@@ -0,0 +1,141 @@
+"""Job types for the mutating operations of the API and MCP server.
+
+Importing this module registers them with services.jobs.
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+
+from backend.config import settings
+from backend.models.schemas import ServiceStatus
+from backend.services import builder, catalog, evacuation, pinning, prewarm, stack_deploy
+from backend.services.cluster_state import cluster_state
+from backend.services.docker_client import swarm_client
+from backend.services.jobs import JobContext, handler
+
+_DRAIN_POLL_INTERVAL = 2.0
+
+
+async def _catalog_service(ctx: JobContext):
+    svc = await catalog.get_service(ctx.params["name"])
+    if not svc:
+        raise LookupError(f"service '{ctx.params['name']}' is not in the catalog")
+    return svc
+
+
+@handler("deploy", concurrency=4, resumable=True)
+async def deploy(ctx: JobContext) -> dict:
+    """params: name, prewarm. With prewarm the image is pulled on every eligible node first."""
+    from docker.errors import NotFound
+
+    name = ctx.params["name"]
+    svc = await _catalog_service(ctx)
+    # Pinned first, so a warm-up pulls exactly the image that is deployed even if the tag moves meanwhile
+    defn, digest = await pinning.pin_definition(svc.definition)
+    if digest:
+        ctx.log(f"Pinned {svc.definition.image} to {digest}")
+    if ctx.params.get("prewarm"):
+        await ctx.progress(0.0, "pulling image on eligible nodes")
+        warmup = await prewarm.wait(await prewarm.start_warmup(name, defn))
+        ctx.log(f"Pre-pull of {warmup.image}: {warmup.warm} node(s) warm, {warmup.failed} failed")
+        for node in warmup.nodes:
+            if node.status != "warm":
+                ctx.log(f"  {node.hostname}: {node.error}")
+        if warmup.status != "complete":
+            raise RuntimeError(warmup.error or "image pre-pull did not complete; not deploying")
+
+    await ctx.progress(0.9, "deploying")
+    try:
+        swarm_id = None
+        if ctx.resumed:
+            # An interrupted attempt may already have created the service
+            try:
+                swarm_id = await asyncio.to_thread(swarm_client.redeploy_service, name, defn)
+                ctx.log(f"Service {name} already existed; updated it in place")
+            except NotFound:
+                pass
+        if swarm_id is None:
+            swarm_id = await asyncio.to_thread(swarm_client.deploy_service, name, defn)
+    except Exception:
+        await catalog.set_service_status(name, ServiceStatus.FAILED)
+        raise
+    await catalog.set_service_status(name, ServiceStatus.RUNNING, swarm_id, digest)
+    cluster_state.invalidate()
+    ctx.log(f"Deployed {name} as {swarm_id}")
+    return {"name": name, "swarm_id": swarm_id, "image_digest": digest or None}
+
+
+@handler("build", concurrency=1, resumable=True)
+async def build(ctx: JobContext) -> dict:
+    """params: name, platform. Builds the service's build_context and pushes the image."""
+    svc = await _catalog_service(ctx)
+    if not svc.definition.build_context:
+        raise ValueError("service has no build_context defined")
+    await ctx.progress(0.0, f"building {svc.definition.image}")
+    success, _ = await builder.build_and_push(
+        svc.definition.build_context, svc.definition.image, ctx.params.get("platform", "linux/amd64"), ctx.log
+    )
+    if not success:
+        raise RuntimeError("build failed; see the job log")
+    return {"name": svc.name, "image": svc.definition.image}
+
+
+@handler("scale", concurrency=8, resumable=True)
+async def scale(ctx: JobContext) -> dict:
+    """params: name, replicas."""
+    name, replicas = ctx.params["name"], ctx.params["replicas"]
+    if not await asyncio.to_thread(swarm_client.scale_service, name, replicas):
+        raise RuntimeError(f"failed to scale {name}")
+    cluster_state.invalidate()
+    ctx.log(f"Scaled {name} to {replicas} replica(s)")
+    return {"name": name, "replicas": replicas}
+
+
+@handler("drain", concurrency=2, resumable=True)
+async def drain(ctx: JobContext) -> dict:
+    """params: node_id. Finishes once no task is running on the node any more."""
+    node_id = ctx.params["node_id"]
+    if not await asyncio.to_thread(swarm_client.drain_node, node_id):
+        raise RuntimeError(f"failed to drain node {node_id}")
+    cluster_state.invalidate()
+    ctx.log(f"Node {node_id} set to drain")
+
+    started = time.monotonic()
+    initial = None
+    while True:
+        tasks = await asyncio.to_thread(swarm_client.list_tasks, {"node": node_id})
+        running = sum(1 for t in tasks if t.state == "running")
+        if initial is None:
+            initial = running
+            ctx.log(f"{running} task(s) to move")
+        if not running:
+            break
+        await ctx.progress(1 - running / initial, f"{running} task(s) still running")
+        if time.monotonic() - started > settings.drain_timeout:
+            raise TimeoutError(f"{running} task(s) still running after {settings.drain_timeout:g}s")
+        await asyncio.sleep(_DRAIN_POLL_INTERVAL)
+    cluster_state.invalidate()
+    return {"node_id": node_id, "tasks_moved": initial}
+
+
+@handler("activate", concurrency=2, resumable=True)
+async def activate(ctx: JobContext) -> dict:
+    """params: node_id."""
+    node_id = ctx.params["node_id"]
+    if not await asyncio.to_thread(swarm_client.activate_node, node_id):
+        raise RuntimeError(f"failed to activate node {node_id}")
+    cluster_state.invalidate()
+    return {"node_id": node_id}
+
+
+@handler("evacuate", concurrency=1, resumable=True)
+async def evacuate(ctx: JobContext) -> dict:
+    """params: waves, rolling. See services.evacuation."""
+    return await evacuation.evacuate(ctx)
+
+
+@handler("stack_deploy", concurrency=2, resumable=True)
+async def deploy_stack(ctx: JobContext) -> dict:
+    """params: project, stack, prune. See services.stack_deploy."""
+    return await stack_deploy.deploy_stack(ctx)
@@ -0,0 +1,440 @@
+"""Background jobs for operations that outlive an HTTP request.
+
+A job is a row in the jobs table: a type, JSON params, status and progress.
+Its log lines go to job_logs. Handlers are registered per type with @handler
+and run as asyncio tasks. Any process running a JobRunner (the API server, the
+MCP server) claims queued jobs from the table. A type runs at most
+`concurrency` jobs at once across all of them.
+
+A runner holds a lease on the jobs it runs by refreshing heartbeat_at. When a
+lease expires because its process died or restarted, resumable jobs are queued
+again and the others are marked failed.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import socket
+import time
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable
+
+from backend.config import settings
+from backend.database import get_db
+from backend.models.schemas import Job, JobLogLine, JobStatus
+from backend.services.leader import leader
+
+logger = logging.getLogger(__name__)
+
+_CLAIM_BATCH = 50
+_PRUNE_INTERVAL = 3600
+_FINISHED = (JobStatus.SUCCEEDED, JobStatus.FAILED, JobStatus.CANCELLED)
+
+
+@dataclass(slots=True)
+class JobType:
+    run: Callable[[JobContext], Awaitable[Any]]
+    concurrency: int
+    resumable: bool
+
+
+_types: dict[str, JobType] = {}
+
+
+def handler(type_: str, *, concurrency: int = 1, resumable: bool = False):
+    """Register `fn(ctx) -> result` as the handler for jobs of `type_`.
+
+    Only mark a handler resumable if running it again after an interruption
+    is safe. concurrency can be overridden per type with JOB_CONCURRENCY.
+    """
+    def register(fn: Callable[[JobContext], Awaitable[Any]]):
+        _types[type_] = JobType(fn, concurrency, resumable)
+        return fn
+    return register
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _limit(type_: str) -> int:
+    return settings.job_concurrency.get(type_, _types[type_].concurrency)
+
+
+def _row_to_job(row: Any) -> Job:
+    data = dict(row)
+    data["params"] = json.loads(data["params"])
+    data["result"] = json.loads(data["result"]) if data["result"] is not None else None
+    return Job(**data)
+
+
+class JobContext:
+    """What a handler gets: its params, and ways to report progress and log lines."""
+
+    def __init__(
+        self, runner: JobRunner, job_id: str, params: dict[str, Any], attempt: int, detail: Any = None
+    ) -> None:
+        self._runner = runner
+        self.job_id = job_id
+        self.params = params
+        self.attempt = attempt
+        # Last progress detail saved by this or an earlier attempt, for resuming
+        self.detail = detail
+
+    @property
+    def resumed(self) -> bool:
+        """True when an earlier attempt was cut off, so some work may already be done."""
+        return self.attempt > 1
+
+    def log(self, line: str) -> None:
+        """Append a log line. Safe to call from worker threads."""
+        self._runner._loop.call_soon_threadsafe(self._runner._append_log, self.job_id, line)
+
+    async def progress(self, fraction: float, message: str = "", detail: Any = None) -> None:
+        """Report progress. detail, if given, is shown as the job's result until it finishes."""
+        fields: dict[str, Any] = {"progress": max(0.0, min(fraction, 1.0)), "message": message}
+        if detail is not None:
+            self.detail = detail
+            fields["result"] = json.dumps(detail, default=str)
+        await self._runner._update(self.job_id, **fields)
+
+
+class JobRunner:
+    def __init__(self) -> None:
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._task: asyncio.Task | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._wake = asyncio.Event()
+        self._changed = asyncio.Condition()
+        self._running: dict[str, asyncio.Task] = {}
+        self._logs: dict[str, list[tuple[int, str, str]]] = defaultdict(list)
+        self._seq: dict[str, int] = {}
+        self._stopping = False
+        self._pruned_at = 0.0
+
+    async def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._stopping = False
+        self._task = asyncio.create_task(self._poll_loop())
+        logger.info("Job runner %s started", self.owner)
+
+    async def stop(self) -> None:
+        """Stop without finishing jobs: they stay running until their lease expires."""
+        self._stopping = True
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        running = list(self._running.values())
+        for task in running:
+            task.cancel()
+        await asyncio.gather(*running, return_exceptions=True)
+        await self._flush_logs()
+        logger.info("Job runner stopped")
+
+    async def submit(self, type_: str, params: dict[str, Any]) -> Job:
+        """Queue a job and return it at once. Raises KeyError for an unknown type."""
+        if type_ not in _types:
+            raise KeyError(type_)
+        job = Job(
+            id=uuid.uuid4().hex[:12], type=type_, params=params,
+            status=JobStatus.QUEUED, created_at=datetime.now(timezone.utc),
+        )
+        db = await get_db()
+        try:
+            await db.execute(
+                "INSERT INTO jobs (id, type, params, status, created_at) VALUES (?, ?, ?, ?, ?)",
+                (job.id, type_, json.dumps(params), job.status.value, job.created_at.isoformat()),
+            )
+            await db.commit()
+        finally:
+            await db.close()
+        self._wake.set()
+        return job
+
+    async def cancel(self, job_id: str) -> Job | None:
+        """Cancel a queued or running job. None if there is no such job.
+
+        A running job stops at its handler's next await; a Docker call already
+        in progress is not interrupted. A job owned by another process is
+        cancelled by that process on its next poll.
+        """
+        task = self._running.get(job_id)
+        if task:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        db = await get_db()
+        try:
+            await db.execute(
+                "UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE id = ? AND status = 'queued'",
+                (_now(), job_id),
+            )
+            await db.execute(
+                "UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = 'running'", (job_id,)
+            )
+            await db.commit()
+        finally:
+            await db.close()
+        await self._notify()
+        return await get_job(job_id)
+
+    async def _poll_loop(self) -> None:
+        while True:
+            try:
+                # Jobs already running hold leases of their own and finish either way
+                await self._heartbeat()
+                await self._flush_logs()
+                # Any runner may claim, since per-type limits are enforced in SQL;
+                # recovering and pruning jobs is left to the leader
+                if leader.leading():
+                    await self._reap()
+                    if time.monotonic() - self._pruned_at >= _PRUNE_INTERVAL:
+                        await self.prune()
+                await self._claim()
+            except Exception as e:
+                logger.error("Job runner poll error: %s", e)
+            try:
+                await asyncio.wait_for(self._wake.wait(), settings.job_poll_interval)
+            except TimeoutError:
+                pass
+            self._wake.clear()
+
+    async def _heartbeat(self) -> None:
+        """Renew the lease on our jobs and act on cancellations requested elsewhere."""
+        if not self._running:
+            return
+        db = await get_db()
+        try:
+            await db.execute(
+                "UPDATE jobs SET heartbeat_at = ? WHERE owner = ? AND status = 'running'", (_now(), self.owner)
+            )
+            cursor = await db.execute(
+                "SELECT id FROM jobs WHERE owner = ? AND status = 'running' AND cancel_requested = 1", (self.owner,)
+            )
+            cancelled = [r["id"] for r in await cursor.fetchall()]
+            await db.commit()
+        finally:
+            await db.close()
+        for job_id in cancelled:
+            if task := self._running.get(job_id):
+                task.cancel()
+
+    async def _reap(self) -> None:
+        """Requeue or fail jobs whose runner stopped renewing their lease."""
+        expired = (datetime.now(timezone.utc) - timedelta(seconds=settings.job_lease_timeout)).isoformat()
+        db = await get_db()
+        try:
+            cursor = await db.execute(
+                "SELECT id, type, attempt FROM jobs WHERE status = 'running' AND heartbeat_at < ?", (expired,)
+            )
+            rows = await cursor.fetchall()
+            for r in rows:
+                job_type = _types.get(r["type"])
+                if job_type and job_type.resumable and r["attempt"] < settings.job_max_attempts:
+                    await db.execute(
+                        """UPDATE jobs SET status = 'queued', owner = NULL,
+                               message = 'resuming after its runner stopped'
+                           WHERE id = ? AND status = 'running' AND heartbeat_at < ?""",
+                        (r["id"], expired),
+                    )
+                else:
+                    await db.execute(
+                        """UPDATE jobs SET status = 'failed', finished_at = ?,
+                               error = 'interrupted: its runner stopped before it finished'
+                           WHERE id = ? AND status = 'running' AND heartbeat_at < ?""",
+                        (_now(), r["id"], expired),
+                    )
+            await db.commit()
+        finally:
+            await db.close()
+        if rows:
+            logger.warning("Recovered %d job(s) from a stopped runner", len(rows))
+            self._wake.set()
+
+    async def _claim(self) -> None:
+        db = await get_db()
+        try:
+            cursor = await db.execute(
+                "SELECT id, type FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT ?", (_CLAIM_BATCH,)
+            )
+            queued = [(r["id"], r["type"]) for r in await cursor.fetchall() if r["type"] in _types]
+            claimed = []
+            for job_id, type_ in queued:
+                now = _now()
+                # The running count is checked in the same statement, so two
+                # runners can't both take the last free slot of a type
+                cursor = await db.execute(
+                    """UPDATE jobs SET status = 'running', owner = ?, heartbeat_at = ?,
+                           attempt = attempt + 1, started_at = COALESCE(started_at, ?)
+                       WHERE id = ? AND status = 'queued'
+                         AND (SELECT COUNT(*) FROM jobs WHERE type = ? AND status = 'running') < ?""",
+                    (self.owner, now, now, job_id, type_, _limit(type_)),
+                )
+                await db.commit()
+                if cursor.rowcount:
+                    claimed.append(job_id)
+            for job_id in claimed:
+                cursor = await db.execute("SELECT COALESCE(MAX(seq), 0) FROM job_logs WHERE job_id = ?", (job_id,))
+                self._seq[job_id] = (await cursor.fetchone())[0]
+        finally:
+            await db.close()
+        for job_id in claimed:
+            self._running[job_id] = asyncio.create_task(self._run(job_id))
+
+    async def _run(self, job_id: str) -> None:
+        job = await get_job(job_id)
+        ctx = JobContext(self, job_id, job.params, job.attempt, job.result)
+        if ctx.resumed:
+            ctx.log(f"Attempt {job.attempt}: resuming after an interrupted run")
+        try:
+            result = await _types[job.type].run(ctx)
+        except asyncio.CancelledError:
+            if self._stopping:
+                return  # left running for another runner to recover
+            ctx.log("Cancelled")
+            await self._finish(job_id, JobStatus.CANCELLED)
+        except Exception as e:
+            logger.warning("Job %s (%s) failed: %s", job_id, job.type, e)
+            ctx.log(f"ERROR: {e}")
+            await self._finish(job_id, JobStatus.FAILED, error=str(e))
+        else:
+            await self._finish(job_id, JobStatus.SUCCEEDED, result=result)
+        finally:
+            self._running.pop(job_id, None)
+            self._seq.pop(job_id, None)
+            self._wake.set()
+
+    async def _finish(self, job_id: str, status: JobStatus, result: Any = None, error: str = "") -> None:
+        # Let lines logged from threads just before the end reach the buffer first
+        await asyncio.sleep(0)
+        await self._flush_logs()
+        fields: dict[str, Any] = {"status": status.value, "error": error, "finished_at": _now()}
+        if status == JobStatus.SUCCEEDED:
+            fields["progress"] = 1.0
+        if result is not None:
+            fields["result"] = json.dumps(result, default=str)
+        await self._update(job_id, **fields)
+
+    async def _update(self, job_id: str, **fields: Any) -> None:
+        assignments = ", ".join(f"{k} = ?" for k in fields)
+        db = await get_db()
+        try:
+            await db.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+            await db.commit()
+        finally:
+            await db.close()
+        await self._notify()
+
+    def _append_log(self, job_id: str, line: str) -> None:
+        seq = self._seq.get(job_id, 0) + 1
+        self._seq[job_id] = seq
+        self._logs[job_id].append((seq, _now(), line))
+
+    async def _flush_logs(self) -> None:
+        if not self._logs:
+            return
+        pending, self._logs = self._logs, defaultdict(list)
+        db = await get_db()
+        try:
+            await db.executemany(
+                "INSERT OR IGNORE INTO job_logs (job_id, seq, ts, line) VALUES (?, ?, ?, ?)",
+                [(job_id, *entry) for job_id, entries in pending.items() for entry in entries],
+            )
+            await db.commit()
+        finally:
+            await db.close()
+        await self._notify()
+
+    async def _notify(self) -> None:
+        async with self._changed:
+            self._changed.notify_all()
+
+    async def wait_for_change(self, timeout: float) -> None:
+        """Return when a job's status, progress or logs may have changed, or after timeout."""
+        async with self._changed:
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout)
+            except TimeoutError:
+                pass
+
+    async def prune(self) -> int:
+        """Delete finished jobs, and their logs, older than the retention period."""
+        cutoff = (datetime.now(timezone.utc) - timedelta(days=settings.job_retention_days)).isoformat()
+        db = await get_db()
+        try:
+            await db.execute(
+                """DELETE FROM job_logs WHERE job_id IN (
+                       SELECT id FROM jobs WHERE status IN ('succeeded', 'failed', 'cancelled') AND finished_at < ?)""",
+                (cutoff,),
+            )
+            cursor = await db.execute(
+                "DELETE FROM jobs WHERE status IN ('succeeded', 'failed', 'cancelled') AND finished_at < ?",
+                (cutoff,),
+            )
+            await db.commit()
+        finally:
+            await db.close()
+        self._pruned_at = time.monotonic()
+        return cursor.rowcount
+
+
+async def get_job(job_id: str) -> Job | None:
+    db = await get_db()
+    try:
+        cursor = await db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,))
+        row = await cursor.fetchone()
+    finally:
+        await db.close()
+    return _row_to_job(row) if row else None
+
+
+async def list_jobs(
+    type_: str | None = None, status: JobStatus | None = None, limit: int = 100
+) -> list[Job]:
+    """Jobs, newest first."""
+    where, params = [], []
+    if type_:
+        where.append("type = ?")
+        params.append(type_)
+    if status:
+        where.append("status = ?")
+        params.append(JobStatus(status).value)
+    sql = "SELECT * FROM jobs"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    db = await get_db()
+    try:
+        cursor = await db.execute(sql + " ORDER BY created_at DESC LIMIT ?", (*params, limit))
+        rows = await cursor.fetchall()
+    finally:
+        await db.close()
+    return [_row_to_job(r) for r in rows]
+
+
+async def get_logs(job_id: str, after: int = 0, limit: int = 1000) -> list[JobLogLine]:
+    """Log lines with seq greater than `after`, oldest first."""
+    db = await get_db()
+    try:
+        cursor = await db.execute(
+            "SELECT seq, ts, line FROM job_logs WHERE job_id = ? AND seq > ? ORDER BY seq LIMIT ?",
+            (job_id, after, limit),
+        )
+        rows = await cursor.fetchall()
+    finally:
+        await db.close()
+    return [JobLogLine(**dict(r)) for r in rows]
+
+
+def is_finished(job: Job) -> bool:
+    return job.status in _FINISHED
+
+
+job_runner = JobRunner()
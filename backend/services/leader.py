@@ -0,0 +1,193 @@
+"""Lease-based leader election through the shared database.
+
+Any number of API processes (uvicorn workers or replicas) can serve requests
+from one database. The loops that poll Docker and write to it, however, must
+run in one process only. Every LEADER_RENEW_INTERVAL each process tries to
+take the lease row. The holder renews it, and any process may take it once it
+has gone LEADER_LEASE_TTL without renewal. A leader that fails to renew steps
+down before its lease can have expired.
+
+Starting and stopping the leader work runs in tasks of its own, so renewal
+keeps its schedule however long they take. The loops check leading() before
+they write, which is false once the lease may have lapsed, so a process that
+is slow to notice it lost the lease does not act as a second leader.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable
+
+from backend.config import settings
+from backend.database import get_db
+from backend.models.schemas import LeaderStatus
+
+logger = logging.getLogger(__name__)
+
+_RELEASED = datetime.min.replace(tzinfo=timezone.utc).isoformat()
+
+
+class LeaderElector:
+    def __init__(self, name: str = "orchestrator") -> None:
+        self.name = name
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.is_leader = False
+        self._valid_until = 0.0  # monotonic time our lease is certain to last until
+        self._task: asyncio.Task | None = None
+        self._on_elected: Callable[[], Awaitable[None]] | None = None
+        self._on_demoted: Callable[[], Awaitable[None]] | None = None
+        # The latest elect/demote callback; each one waits for the one before
+        self._transition: asyncio.Task | None = None
+
+    async def start(
+        self, on_elected: Callable[[], Awaitable[None]], on_demoted: Callable[[], Awaitable[None]]
+    ) -> None:
+        """Campaign for the lease; on_elected/on_demoted run as leadership is won and lost."""
+        self._on_elected, self._on_demoted = on_elected, on_demoted
+        # First attempt at once, so a lone process doesn't wait an interval to start its loops
+        await self._tick()
+        self._task = asyncio.create_task(self._poll_loop())
+
+    async def stop(self) -> None:
+        """Step down and release the lease so another process takes over without waiting for it to expire."""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        was_leader = self.is_leader
+        if was_leader:
+            self._demote("shutting down")
+        if self._transition:
+            await self._transition
+        if was_leader:
+            try:
+                await self._release()
+            except Exception as e:
+                logger.error("Failed to release leader lease: %s", e)
+
+    def leading(self) -> bool:
+        """True if this process may do leader work now: election is off, or our lease is certain to be valid."""
+        return not settings.leader_election or (self.is_leader and time.monotonic() < self._valid_until)
+
+    async def status(self) -> LeaderStatus:
+        db = await get_db()
+        try:
+            cursor = await db.execute("SELECT * FROM leases WHERE name = ?", (self.name,))
+            row = await cursor.fetchone()
+        finally:
+            await db.close()
+        lease = dict(row) if row else {"name": self.name}
+        if lease.get("expires_at") == _RELEASED:
+            lease["expires_at"] = None
+        return LeaderStatus(**lease, this_process=self.holder, is_leader=self.is_leader)
+
+    async def _poll_loop(self) -> None:
+        while True:
+            await asyncio.sleep(settings.leader_renew_interval)
+            await self._tick()
+
+    async def _tick(self) -> None:
+        started = time.monotonic()
+        try:
+            held = await self._acquire()
+        except Exception as e:
+            logger.error("Leader lease renewal failed: %s", e)
+            # Keep leading only while the lease is sure to outlast the next attempt
+            held = self.is_leader and started + settings.leader_renew_interval < self._valid_until
+        else:
+            if held:
+                self._valid_until = started + settings.leader_lease_ttl
+        if held and not self.is_leader:
+            self._elect()
+        elif not held and self.is_leader:
+            self._demote("lease lost")
+
+    def _schedule(self, transition: Callable[[], Awaitable[None]]) -> None:
+        """Run transition after the pending ones, without holding up lease renewal."""
+        previous = self._transition
+
+        async def run() -> None:
+            if previous:
+                await previous
+            await transition()
+
+        self._transition = asyncio.create_task(run())
+
+    def _elect(self) -> None:
+        self.is_leader = True
+        logger.info("Elected leader as %s", self.holder)
+
+        async def start_work() -> None:
+            if not self.is_leader:
+                return  # lost the lease again before the work started
+            try:
+                await self._on_elected()
+            except Exception as e:
+                logger.error("Failed to start leader work: %s", e)
+                if self.is_leader:
+                    self._demote("startup failed")
+                    try:
+                        await self._release()
+                    except Exception as e:
+                        logger.error("Failed to release leader lease: %s", e)
+
+        self._schedule(start_work)
+
+    def _demote(self, reason: str) -> None:
+        self.is_leader = False
+        logger.warning("No longer leader (%s)", reason)
+
+        async def stop_work() -> None:
+            try:
+                await self._on_demoted()
+            except Exception as e:
+                logger.error("Failed to stop leader work: %s", e)
+
+        self._schedule(stop_work)
+
+    async def _acquire(self) -> bool:
+        """Renew our lease, or take it over if it expired. True if we hold it afterwards."""
+        now = datetime.now(timezone.utc)
+        expires = (now + timedelta(seconds=settings.leader_lease_ttl)).isoformat()
+        db = await get_db()
+        try:
+            # One statement, so two processes can't both take an expired lease
+            await db.execute(
+                """INSERT INTO leases (name, holder, term, acquired_at, renewed_at, expires_at)
+                   VALUES (?, ?, 1, ?, ?, ?)
+                   ON CONFLICT (name) DO UPDATE SET
+                       term = CASE WHEN holder = excluded.holder THEN term ELSE term + 1 END,
+                       acquired_at = CASE WHEN holder = excluded.holder THEN acquired_at ELSE excluded.acquired_at END,
+                       holder = excluded.holder,
+                       renewed_at = excluded.renewed_at,
+                       expires_at = excluded.expires_at
+                   WHERE holder = excluded.holder OR expires_at < excluded.renewed_at""",
+                (self.name, self.holder, now.isoformat(), now.isoformat(), expires),
+            )
+            cursor = await db.execute("SELECT holder FROM leases WHERE name = ?", (self.name,))
+            row = await cursor.fetchone()
+            await db.commit()
+        finally:
+            await db.close()
+        return row is not None and row["holder"] == self.holder
+
+    async def _release(self) -> None:
+        db = await get_db()
+        try:
+            await db.execute(
+                "UPDATE leases SET expires_at = ? WHERE name = ? AND holder = ?", (_RELEASED, self.name, self.holder)
+            )
+            await db.commit()
+        finally:
+            await db.close()
+
+
+leader = LeaderElector()
@@ -0,0 +1,320 @@
+"""Searchable archive of service logs in day-partitioned SQLite FTS5 tables.
+
+Follower threads stream the logs of the services in LOG_ARCHIVE_SERVICES and
+hand parsed lines to a writer task, which inserts them in batches. Each UTC
+day gets its own FTS5 table (logs_YYYYMMDD) in a separate database file, so
+retention drops whole tables instead of deleting rows from one large index.
+"""
+from __future__ import annotations
+
+import asyncio
+import fnmatch
+import logging
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import TYPE_CHECKING
+from urllib.parse import unquote
+
+from backend.config import settings
+from backend.models.schemas import LogEntry, LogSearchResult
+from backend.services.docker_client import parse_docker_time, swarm_client
+from backend.services.leader import leader
+
+if TYPE_CHECKING:
+    import aiosqlite
+
+logger = logging.getLogger(__name__)
+
+_PARTITION_GLOB = "logs_" + "[0-9]" * 8
+_PRUNE_INTERVAL = 3600
+_RECONNECT_DELAY = 5.0
+
+
+class LogQueryError(ValueError):
+    """The search query is not valid FTS5 syntax."""
+
+
+def _partition(day: str) -> str:
+    """Table name for a YYYY-MM-DD day."""
+    return "logs_" + day.replace("-", "")
+
+
+def _day(table: str) -> str:
+    d = table.removeprefix("logs_")
+    return f"{d[:4]}-{d[4:6]}-{d[6:]}"
+
+
+def parse_log_line(service: str, line: bytes) -> LogEntry | None:
+    """Parse one `timestamps=True, details=True` service log line."""
+    text = line.decode("utf-8", errors="replace").rstrip("\r")
+    parts = text.split(" ", 2)
+    if len(parts) < 2 or not parts[0][:1].isdigit():
+        return None
+    details: dict[str, str] = {}
+    if "=" in parts[1] and "com.docker." in parts[1]:
+        for pair in parts[1].split(","):
+            key, _, value = pair.partition("=")
+            details[key] = unquote(value)
+        message = parts[2] if len(parts) > 2 else ""
+    else:
+        message = " ".join(parts[1:])
+    return LogEntry(
+        ts=parse_docker_time(parts[0]),
+        service=service,
+        task_id=details.get("com.docker.swarm.task.id", ""),
+        node_id=details.get("com.docker.swarm.node.id", ""),
+        message=message,
+    )
+
+
+async def _connect() -> aiosqlite.Connection:
+    import aiosqlite
+
+    db = await aiosqlite.connect(str(settings.log_archive_db_path))
+    db.row_factory = aiosqlite.Row
+    # auto_vacuum only takes effect on a new file; it lets dropped partitions
+    # give their pages back to the filesystem via incremental_vacuum.
+    await db.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    await db.execute("PRAGMA journal_mode = WAL")
+    return db
+
+
+async def _partitions(db: aiosqlite.Connection) -> list[str]:
+    cursor = await db.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name GLOB ? ORDER BY name",
+        (_PARTITION_GLOB,),
+    )
+    return [r["name"] for r in await cursor.fetchall()]
+
+
+class LogArchive:
+    def __init__(self) -> None:
+        self._task: asyncio.Task | None = None
+        self._queue: asyncio.Queue[LogEntry] | None = None
+        self._stop = threading.Event()
+        self._threads: list[threading.Thread] = []
+        self._known: set[str] = set()
+        self._pruned_at = 0.0
+        self.dropped = 0
+
+    async def start(self) -> None:
+        if not settings.log_archive_services:
+            return
+        loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(maxsize=settings.log_archive_batch_size * 20)
+        # A fresh event per start: followers of an earlier run that are still
+        # blocked on a stream must stop once it returns, not resume
+        self._stop = threading.Event()
+        for name in settings.log_archive_services:
+            # Daemon threads: a follow stream blocks until output arrives and
+            # can't be interrupted, so shutdown must not wait for it.
+            thread = threading.Thread(
+                target=self._follow, args=(name, loop, self._stop), name=f"log-follow-{name}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+        self._task = asyncio.create_task(self._write_loop())
+        logger.info("Log archive started for %s", ", ".join(settings.log_archive_services))
+
+    async def stop(self) -> None:
+        self._stop.set()
+        self._threads.clear()
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            # Keep what was already read
+            batch = []
+            while not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            if batch:
+                await self._insert(batch)
+            logger.info("Log archive stopped")
+
+    def _enqueue(self, entry: LogEntry) -> None:
+        try:
+            self._queue.put_nowait(entry)
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    def _follow(self, service: str, loop: asyncio.AbstractEventLoop, stop: threading.Event) -> None:
+        """Stream one service's logs until stopped, reconnecting after errors or idle timeouts."""
+        since = int(time.time())
+        # Lines from different replicas interleave, but each task's lines are in
+        # order. Per task: the newest archived timestamp and how many lines had it,
+        # since distinct lines can share a timestamp.
+        archived: dict[str, tuple[str, int]] = {}
+        while not stop.is_set():
+            # Per task, for this connection: the current timestamp and lines seen at it
+            seen: dict[str, tuple[str, int]] = {}
+            try:
+                pending = b""
+                for chunk in swarm_client.follow_service_logs(service, since):
+                    if stop.is_set():
+                        return
+                    *lines, pending = (pending + chunk).split(b"\n")
+                    for line in lines:
+                        entry = parse_log_line(service, line)
+                        if entry is None:
+                            continue
+                        last_ts, count = archived.get(entry.task_id, ("", 0))
+                        if entry.ts < last_ts:
+                            continue
+                        ts, n = seen.get(entry.task_id, ("", 0))
+                        n = n + 1 if ts == entry.ts else 1
+                        seen[entry.task_id] = (entry.ts, n)
+                        # A reconnect replays from `since`; skip lines already archived
+                        if entry.ts == last_ts and n <= count:
+                            continue
+                        archived[entry.task_id] = (entry.ts, n)
+                        loop.call_soon_threadsafe(self._enqueue, entry)
+            except Exception as e:
+                logger.warning("Log stream for %s interrupted: %s", service, e)
+            if archived:
+                newest = max(ts for ts, _ in archived.values())
+                since = int(datetime.fromisoformat(newest).timestamp()) - 1
+            stop.wait(_RECONNECT_DELAY)
+
+    async def _write_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + settings.log_archive_flush_interval
+            while len(batch) < settings.log_archive_batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except TimeoutError:
+                    break
+            if not leader.leading():
+                logger.warning("Not leader; dropping %d archived log line(s)", len(batch))
+                continue
+            try:
+                await self._insert(batch)
+                if time.monotonic() - self._pruned_at >= _PRUNE_INTERVAL:
+                    await self.prune()
+            except Exception as e:
+                logger.error("Log archive write error (%d line(s) lost): %s", len(batch), e)
+
+    async def _insert(self, entries: list[LogEntry]) -> None:
+        by_day: dict[str, list[tuple]] = defaultdict(list)
+        # In ts order, so a partition's rowids follow time and search can order by rowid
+        for e in sorted(entries, key=lambda e: e.ts):
+            by_day[e.ts[:10]].append((e.message, e.service, e.task_id, e.node_id, e.ts))
+        db = await _connect()
+        try:
+            for day, rows in by_day.items():
+                table = _partition(day)
+                if table not in self._known:
+                    await db.execute(
+                        f"""CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5(
+                                message, service UNINDEXED, task_id UNINDEXED,
+                                node_id UNINDEXED, ts UNINDEXED)"""
+                    )
+                    self._known.add(table)
+                await db.executemany(
+                    f"INSERT INTO {table} (message, service, task_id, node_id, ts) VALUES (?, ?, ?, ?, ?)",
+                    rows,
+                )
+            await db.commit()
+        finally:
+            await db.close()
+
+    async def prune(self) -> list[str]:
+        """Drop partitions older than the retention period. Returns the dropped days."""
+        oldest = datetime.now(timezone.utc) - timedelta(days=settings.log_archive_retention_days)
+        cutoff = _partition(oldest.date().isoformat())
+        db = await _connect()
+        try:
+            dropped = [t for t in await _partitions(db) if t < cutoff]
+            for table in dropped:
+                await db.execute(f"DROP TABLE {table}")
+                self._known.discard(table)
+            await db.commit()
+            if dropped:
+                await db.execute("PRAGMA incremental_vacuum")
+        finally:
+            await db.close()
+        self._pruned_at = time.monotonic()
+        if dropped:
+            logger.info("Dropped log partitions: %s", ", ".join(dropped))
+        return [_day(t) for t in dropped]
+
+
+async def search(
+    query: str | None = None,
+    service: str | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    limit: int = 100,
+    cursor: str | None = None,
+) -> LogSearchResult:
+    """Archived lines matching an FTS5 query, newest first, one page at a time.
+
+    The range defaults to the last 24 hours. Only the day partitions the range
+    overlaps are read. Pass next_cursor back as cursor for the following page.
+
+    Lines are ordered by rowid, which follows ts because each batch is
+    inserted in ts order, so pages are read off the index without a sort.
+    Lines that arrive late, after a reconnect, sort as of when they were archived.
+    """
+    until = (until or datetime.now(timezone.utc)).astimezone(timezone.utc)
+    since = (since or until - timedelta(days=1)).astimezone(timezone.utc)
+    lo, hi = since.isoformat(timespec="microseconds"), until.isoformat(timespec="microseconds")
+    first, last = _partition(lo[:10]), _partition(hi[:10])
+    cursor_table, cursor_rowid = "", 0
+    if cursor:
+        cursor_table, sep, rowid = cursor.partition("|")
+        if not sep or not rowid.isdigit() or not fnmatch.fnmatchcase(cursor_table, _PARTITION_GLOB):
+            raise ValueError("malformed cursor")
+        cursor_rowid = int(rowid)
+        last = min(last, cursor_table)
+
+    items: list[LogEntry] = []
+    next_cursor = None
+    db = await _connect()
+    try:
+        tables = [t for t in reversed(await _partitions(db)) if first <= t <= last]
+        for table in tables:
+            where, params = ["ts >= ?", "ts < ?"], [lo, hi]
+            if table == cursor_table:
+                where.append("rowid < ?")
+                params.append(cursor_rowid)
+            if query:
+                where.append(f"{table} MATCH ?")
+                params.append(query)
+            if service:
+                where.append("service = ?")
+                params.append(service)
+            try:
+                rows = await db.execute_fetchall(
+                    f"""SELECT rowid, ts, service, task_id, node_id, message FROM {table}
+                        WHERE {' AND '.join(where)} ORDER BY rowid DESC LIMIT ?""",
+                    (*params, limit + 1 - len(items)),
+                )
+            except sqlite3.OperationalError as e:
+                if query:
+                    raise LogQueryError(str(e)) from e
+                raise
+            for r in rows:
+                if len(items) == limit:
+                    next_cursor = f"{last_table}|{last_rowid}"
+                    break
+                items.append(LogEntry(**{k: r[k] for k in ("ts", "service", "task_id", "node_id", "message")}))
+                last_table, last_rowid = table, r["rowid"]
+            if next_cursor:
+                break
+    finally:
+        await db.close()
+    return LogSearchResult(items=items, next_cursor=next_cursor)
+
+
+log_archive = LogArchive()
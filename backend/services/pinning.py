@@ -0,0 +1,34 @@
+"""Pinning service images to registry digests at deploy time.
+
+A service created from `repo:tag` runs whatever the tag points at when each
+node pulls it, so replicas can end up on different builds after a push. With
+PIN_IMAGE_DIGESTS the tag is resolved once, through the cached resolver in
+RegistryClient, and the service is created from `repo:tag@digest` instead.
+Only images in our registry (REGISTRY_URL or one of REGISTRY_ALIASES) are
+pinned; others, and those whose tag can't be resolved, deploy unpinned.
+"""
+from __future__ import annotations
+
+import logging
+
+from backend.config import settings
+from backend.models.schemas import ServiceDefinition
+from backend.services.registry_client import RegistryClient, registry_client, split_image_ref
+
+logger = logging.getLogger(__name__)
+
+
+async def pin_definition(
+    defn: ServiceDefinition, client: RegistryClient = registry_client
+) -> tuple[ServiceDefinition, str]:
+    """The definition to deploy and the digest its image is pinned to ("" when unpinned)."""
+    host, repository, tag, digest = split_image_ref(defn.image)
+    if digest:
+        return defn, digest
+    if not settings.pin_image_digests or not host or (host != client.host and host not in settings.registry_aliases):
+        return defn, ""
+    digest = await client.resolve_digest(repository, tag or "latest")
+    if not digest:
+        logger.warning("Could not resolve %s to a digest; deploying it unpinned", defn.image)
+        return defn, ""
+    return defn.model_copy(update={"image": f"{defn.image}@{digest}"}), digest
@@ -0,0 +1,220 @@
+"""Constraint matching and resource-aware placement simulation.
+
+The simulator mirrors the Swarm scheduler's spread strategy: each replica goes to
+the eligible node running the fewest tasks of that service, then the fewest tasks
+overall, provided the node still has room for the replica's reservations.
+"""
+from __future__ import annotations
+
+import heapq
+import time
+from collections import defaultdict
+
+from backend.models.records import NodeRecord, TaskRecord
+from backend.models.schemas import (
+    NodeAvailability,
+    NodeHeadroom,
+    NodeStatus,
+    PlacementCandidate,
+    PlacementResult,
+    ServicePlacement,
+)
+
+_EPS = 1e-9
+
+
+def _node_attr(node: NodeRecord, key: str) -> tuple[str | None, bool]:
+    """Return (value, case_sensitive) for a constraint key, or (None, _) if unknown."""
+    if key.startswith("node.labels."):
+        return node.labels.get(key.removeprefix("node.labels.")), True
+    values = {
+        "node.id": node.id,
+        "node.hostname": node.hostname,
+        "node.role": node.role,
+        "node.platform.os": node.platform_os,
+        "node.platform.arch": node.platform_arch,
+    }
+    return values.get(key), False
+
+
+def parse_constraint(constraint: str) -> tuple[str, str, str]:
+    """Split 'key==value' / 'key!=value' into (key, op, value)."""
+    for op in ("==", "!="):
+        if op in constraint:
+            key, value = (part.strip() for part in constraint.split(op, 1))
+            return key, op, value
+    raise ValueError(f"Invalid constraint: {constraint!r}")
+
+
+def _matches(node: NodeRecord, key: str, op: str, expected: str) -> bool:
+    actual, case_sensitive = _node_attr(node, key)
+    if actual is None:
+        equal = False
+    elif case_sensitive:
+        equal = actual == expected
+    else:
+        equal = actual.lower() == expected.lower()
+    return equal if op == "==" else not equal
+
+
+def match_constraint(node: NodeRecord, constraint: str) -> bool:
+    """Evaluate a single Swarm placement constraint ('key==value' or 'key!=value')."""
+    return _matches(node, *parse_constraint(constraint))
+
+
+def match_constraints(node: NodeRecord, constraints: list[str]) -> bool:
+    return all(_matches(node, *parse_constraint(c)) for c in constraints)
+
+
+def is_schedulable(node: NodeRecord) -> bool:
+    return node.status == NodeStatus.READY and node.availability == NodeAvailability.ACTIVE
+
+
+# Scheduling rank packed into one int: (tasks of the service, tasks overall, node index)
+_IDX_BITS = 20
+_IDX_MASK = (1 << _IDX_BITS) - 1
+_SVC_SHIFT = 2 * _IDX_BITS
+
+
+class CapacityModel:
+    """Column-oriented view of schedulable nodes, their capacity and current reservations.
+
+    Per-node values live in parallel lists indexed by node position, and each
+    node's scheduling rank is packed into a single int, so a placement is a heap
+    of ints over precomputed eligibility masks rather than a scan over models.
+    Masks are cached per constraint set, since candidates commonly share them.
+    """
+
+    def __init__(self, nodes: list[NodeRecord], tasks: list[TaskRecord]) -> None:
+        self.nodes = [n for n in nodes if is_schedulable(n)]
+        index = {n.id: i for i, n in enumerate(self.nodes)}
+        self.cpus = [float(n.resources.get("cpus", 0)) for n in self.nodes]
+        self.memory_mb = [float(n.resources.get("memory_mb", 0)) for n in self.nodes]
+        self.gpus = [int(n.resources.get("gpus", 0)) for n in self.nodes]
+        self.free_cpus = list(self.cpus)
+        self.free_memory_mb = list(self.memory_mb)
+        self.free_gpus = list(self.gpus)
+        self.task_count = [0] * len(self.nodes)
+        self.service_counts: dict[str, dict[int, int]] = defaultdict(dict)
+        self._service_tasks: dict[str, list[tuple[int, TaskRecord]]] = defaultdict(list)
+        self._masks: dict[tuple[str, ...], list[int]] = {}
+
+        free_cpus, free_mem, free_gpus, task_count = (
+            self.free_cpus, self.free_memory_mb, self.free_gpus, self.task_count
+        )
+        for t in tasks:
+            i = index.get(t.node_id)
+            if i is None:
+                continue
+            free_cpus[i] -= t.reserved_cpus
+            free_mem[i] -= t.reserved_memory_mb
+            free_gpus[i] -= t.reserved_gpus
+            task_count[i] += 1
+            counts = self.service_counts[t.service_name]
+            counts[i] = counts.get(i, 0) + 1
+            self._service_tasks[t.service_name].append((i, t))
+        self._rank = [(c << _IDX_BITS) | i for i, c in enumerate(task_count)]
+
+    def release_service(self, name: str) -> None:
+        """Return a service's current reservations, as an in-place redeploy would."""
+        for i, t in self._service_tasks.pop(name, []):
+            self.free_cpus[i] += t.reserved_cpus
+            self.free_memory_mb[i] += t.reserved_memory_mb
+            self.free_gpus[i] += t.reserved_gpus
+            self.task_count[i] -= 1
+            self._rank[i] -= 1 << _IDX_BITS
+        self.service_counts.pop(name, None)
+
+    def eligible(self, constraints: list[str]) -> list[int]:
+        key = tuple(sorted(constraints))
+        if key not in self._masks:
+            parsed = [parse_constraint(c) for c in key]
+            self._masks[key] = [
+                i for i, n in enumerate(self.nodes) if all(_matches(n, *c) for c in parsed)
+            ]
+        return self._masks[key]
+
+    def place(self, candidate: PlacementCandidate) -> ServicePlacement:
+        defn = candidate.definition
+        res = defn.resources.reservations if defn.resources else None
+        cpus, memory_mb, gpus = (res.cpus, res.memory_mb, res.gpus) if res else (0.0, 0.0, 0)
+        idxs = self.eligible(defn.constraints)
+        counts = self.service_counts[candidate.name]
+        rank = self._rank
+
+        heap = [rank[i] for i in idxs]
+        if counts:
+            heap = [r + (counts.get(r & _IDX_MASK, 0) << _SVC_SHIFT) for r in heap]
+        heapq.heapify(heap)
+
+        free_cpus, free_mem, free_gpus = self.free_cpus, self.free_memory_mb, self.free_gpus
+        placed: dict[int, int] = {}
+        remaining = defn.replicas
+        step = (1 << _SVC_SHIFT) + (1 << _IDX_BITS)
+        while remaining and heap:
+            r = heapq.heappop(heap)
+            i = r & _IDX_MASK
+            if free_cpus[i] + _EPS < cpus or free_mem[i] + _EPS < memory_mb or free_gpus[i] < gpus:
+                # Free capacity only shrinks during a simulation, so the node is done
+                continue
+            free_cpus[i] -= cpus
+            free_mem[i] -= memory_mb
+            free_gpus[i] -= gpus
+            self.task_count[i] += 1
+            rank[i] += 1 << _IDX_BITS
+            counts[i] = counts.get(i, 0) + 1
+            placed[i] = placed.get(i, 0) + 1
+            remaining -= 1
+            heapq.heappush(heap, r + step)
+
+        reason = ""
+        if not idxs:
+            reason = "no schedulable node satisfies the constraints"
+        elif remaining:
+            reason = f"insufficient resources for {remaining} replica(s)"
+        return ServicePlacement(
+            name=candidate.name,
+            requested=defn.replicas,
+            placed=defn.replicas - remaining,
+            fits=not remaining,
+            nodes={self.nodes[i].hostname: n for i, n in sorted(placed.items())},
+            eligible_nodes=len(idxs),
+            reason=reason,
+        )
+
+    def headroom(self) -> list[NodeHeadroom]:
+        return [
+            NodeHeadroom(
+                id=n.id,
+                hostname=n.hostname,
+                cpus=self.cpus[i],
+                memory_mb=self.memory_mb[i],
+                gpus=self.gpus[i],
+                free_cpus=round(self.free_cpus[i], 3),
+                free_memory_mb=round(self.free_memory_mb[i], 1),
+                free_gpus=self.free_gpus[i],
+                tasks=self.task_count[i],
+            )
+            for i, n in enumerate(self.nodes)
+        ]
+
+
+def simulate(
+    nodes: list[NodeRecord], tasks: list[TaskRecord], candidates: list[PlacementCandidate]
+) -> PlacementResult:
+    """Place candidates in order on top of current reservations.
+
+    Candidates that share a name with a running service replace it, so their
+    existing tasks' reservations are released first.
+    """
+    start = time.perf_counter()
+    model = CapacityModel(nodes, tasks)
+    for c in candidates:
+        model.release_service(c.name)
+    placements = [model.place(c) for c in candidates]
+    return PlacementResult(
+        fits=all(p.fits for p in placements),
+        services=placements,
+        nodes=model.headroom(),
+        elapsed_ms=round((time.perf_counter() - start) * 1000, 3),
+    )
@@ -0,0 +1,174 @@
+"""Pulling a service's image onto every node it may run on, ahead of a deploy.
+
+Each eligible node gets a short-lived replicated job pinned to it, at most
+PREWARM_CONCURRENCY at a time. A node counts as warm once its job task has a
+container, which Docker only creates after the image is present locally.
+
+A warm-up runs in the process that started it and is saved to the database
+as nodes finish, so any API process can report on it.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+import uuid
+from datetime import datetime, timezone
+
+from backend.config import settings
+from backend.database import get_db
+from backend.models.records import TaskRecord
+from backend.models.schemas import ImageWarmup, NodeWarmup, ServiceDefinition
+from backend.services.cluster_state import cluster_state
+from backend.services.docker_client import swarm_client
+from backend.services.placement import is_schedulable, match_constraints
+
+logger = logging.getLogger(__name__)
+
+PREWARM_LABEL = "swarm-orchestrator.prewarm"
+_MAX_WARMUPS = 20
+_POLL_INTERVAL = 2.0
+_WARM_STATES = ("ready", "starting", "running", "complete")
+_PENDING_STATES = ("new", "pending", "assigned", "accepted", "preparing")
+
+# Warm-ups running in this process
+_active: dict[str, ImageWarmup] = {}
+_runs: dict[str, asyncio.Task] = {}
+
+
+async def _save(warmup: ImageWarmup) -> None:
+    try:
+        db = await get_db()
+        try:
+            await db.execute(
+                "INSERT OR REPLACE INTO image_warmups (id, created_at, updated_at, warmup) VALUES (?, ?, ?, ?)",
+                (warmup.id, warmup.created_at.isoformat(), time.time(), warmup.model_dump_json()),
+            )
+            await db.execute(
+                """DELETE FROM image_warmups
+                   WHERE id NOT IN (SELECT id FROM image_warmups ORDER BY created_at DESC LIMIT ?)""",
+                (_MAX_WARMUPS,),
+            )
+            await db.commit()
+        finally:
+            await db.close()
+    except Exception as e:
+        logger.error("Failed to save warm-up %s: %s", warmup.id, e)
+
+
+def _pull_outcome(task: TaskRecord) -> tuple[bool, str] | None:
+    """(warm, error) once the job task shows whether the image is on the node, else None."""
+    if task.state in _WARM_STATES or task.container_id:
+        return True, ""
+    if task.state in _PENDING_STATES:
+        return None
+    return False, task.error or task.message or f"job task {task.state}"
+
+
+async def _warm_node(warmup: ImageWarmup, node: NodeWarmup, sem: asyncio.Semaphore) -> None:
+    async with sem:
+        node.status = "pulling"
+        started = time.monotonic()
+        job_id = ""
+        try:
+            job_id = await asyncio.to_thread(
+                swarm_client.create_pull_job,
+                f"prewarm-{warmup.id}-{node.node_id[:12]}",
+                warmup.image,
+                node.node_id,
+                {PREWARM_LABEL: warmup.id},
+            )
+            while True:
+                await asyncio.sleep(_POLL_INTERVAL)
+                tasks = await asyncio.to_thread(swarm_client.service_tasks, job_id)
+                outcome = _pull_outcome(tasks[0]) if tasks else None
+                if outcome is not None:
+                    warm, error = outcome
+                    node.status, node.error = ("warm" if warm else "failed"), error
+                    break
+                if time.monotonic() - started > settings.prewarm_timeout:
+                    node.status, node.error = "failed", f"timed out after {settings.prewarm_timeout:g}s"
+                    break
+        except Exception as e:
+            node.status, node.error = "failed", str(e)
+        finally:
+            node.elapsed_ms = round((time.monotonic() - started) * 1000, 1)
+            if job_id:
+                await asyncio.to_thread(swarm_client.remove_service, job_id)
+            await _save(warmup)
+
+
+async def _run(warmup: ImageWarmup) -> None:
+    sem = asyncio.Semaphore(settings.prewarm_concurrency)
+    try:
+        await asyncio.gather(*(_warm_node(warmup, n, sem) for n in warmup.nodes))
+    finally:
+        warmup.warm = sum(1 for n in warmup.nodes if n.status == "warm")
+        warmup.failed = len(warmup.nodes) - warmup.warm
+        warmup.status = "complete" if warmup.nodes and not warmup.failed else "failed"
+        warmup.finished_at = datetime.now(timezone.utc)
+        await _save(warmup)
+        _active.pop(warmup.id, None)
+        _runs.pop(warmup.id, None)
+        logger.info(
+            "Pre-pull of %s: %d node(s) warm, %d failed", warmup.image, warmup.warm, warmup.failed
+        )
+
+
+async def start_warmup(service: str, defn: ServiceDefinition) -> ImageWarmup:
+    """Start pulling the definition's image on every schedulable node matching its constraints.
+
+    A warm-up of this service already running for the same image and the
+    same eligible nodes is returned instead of starting another one.
+    """
+    nodes = [
+        n for n in await cluster_state.nodes()
+        if is_schedulable(n) and match_constraints(n, defn.constraints)
+    ]
+    node_ids = {n.id for n in nodes}
+    for w in _active.values():
+        if w.service == service and w.image == defn.image and {n.node_id for n in w.nodes} == node_ids:
+            return w
+    warmup = ImageWarmup(
+        id=uuid.uuid4().hex[:12],
+        service=service,
+        image=defn.image,
+        created_at=datetime.now(timezone.utc),
+        nodes=[NodeWarmup(node_id=n.id, hostname=n.hostname) for n in sorted(nodes, key=lambda n: n.hostname)],
+    )
+    if not nodes:
+        warmup.status = "failed"
+        warmup.error = "no schedulable node satisfies the service's constraints"
+        warmup.finished_at = warmup.created_at
+    else:
+        _active[warmup.id] = warmup
+    await _save(warmup)
+    if warmup.status == "running":
+        _runs[warmup.id] = asyncio.create_task(_run(warmup))
+    return warmup
+
+
+async def wait(warmup: ImageWarmup) -> ImageWarmup:
+    """Wait until a warm-up has finished, successfully or not."""
+    run = _runs.get(warmup.id)
+    if run:
+        await asyncio.shield(run)
+    return warmup
+
+
+async def get_warmup(warmup_id: str) -> ImageWarmup | None:
+    if warmup_id in _active:
+        return _active[warmup_id]
+    db = await get_db()
+    try:
+        cursor = await db.execute("SELECT updated_at, warmup FROM image_warmups WHERE id = ?", (warmup_id,))
+        row = await cursor.fetchone()
+    finally:
+        await db.close()
+    if not row:
+        return None
+    warmup = ImageWarmup.model_validate_json(row["warmup"])
+    # Each node saves within PREWARM_TIMEOUT; a running warm-up silent for longer lost its process
+    if warmup.status == "running" and time.time() - row["updated_at"] > 2 * settings.prewarm_timeout + _POLL_INTERVAL:
+        warmup.status, warmup.error = "failed", "abandoned: the process running it stopped"
+    return warmup
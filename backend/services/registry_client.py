@@ -1,11 +1,17 @@
 from __future__ import annotations
 
 import logging
-from typing import Any
-
-import httpx
+import functools
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import TYPE_CHECKING, Any, AsyncIterator, Awaitable, Callable, TypeVar
 
 from backend.config import settings
+from backend.services.singleflight import AsyncSingleFlight, call_key
+
+if TYPE_CHECKING:
+    import httpx
 
 logger = logging.getLogger(__name__)
 
@@ -13,36 +19,169 @@ MANIFEST_ACCEPT = ", ".join([
     "application/vnd.docker.distribution.manifest.v2+json",
     "application/vnd.oci.image.manifest.v1+json",
 ])
+# Also accepts multi-platform indexes, so a pinned digest still lets each node pull its own platform
+RESOLVE_ACCEPT = ", ".join([
+    "application/vnd.docker.distribution.manifest.list.v2+json",
+    "application/vnd.oci.image.index.v1+json",
+    MANIFEST_ACCEPT,
+])
+
+
+def split_image_ref(image: str) -> tuple[str, str, str, str]:
+    """Split 'host:port/repo/name:tag@sha256:...' into (host, repository, tag, digest).
+
+    host is empty when the first path component is not a registry address.
+    tag is empty when the reference carries neither a tag nor a digest default.
+    """
+    name, _, digest = image.partition("@")
+    host = ""
+    first, sep, rest = name.partition("/")
+    if sep and ("." in first or ":" in first or first == "localhost"):
+        host, name = first, rest
+    tag = ""
+    if ":" in name.rsplit("/", 1)[-1]:
+        name, tag = name.rsplit(":", 1)
+    return host, name, tag, digest
+
+
+F = TypeVar("F", bound=Callable[..., Awaitable[Any]])
+
+
+def _coalesced(method: F) -> F:
+    """Share one request between concurrent identical lookups on a RegistryClient.
+
+    Calls only share with others in the same session, so a request never runs
+    on a session's connection pool after that session has closed it.
+    """
+
+    @functools.wraps(method)
+    async def wrapper(self: RegistryClient, *args: Any, **kwargs: Any) -> Any:
+        key = (self._shared.get(), call_key(method.__name__, args, kwargs))
+        return await self._flights.do(key, functools.partial(method, self, *args, **kwargs))
+
+    return wrapper  # type: ignore[return-value]
+
+
+def _http_client() -> httpx.AsyncClient:
+    import httpx
+
+    return httpx.AsyncClient()
 
 
 class RegistryClient:
     def __init__(self, base_url: str | None = None) -> None:
         self.base_url = (base_url or settings.registry_url).rstrip("/")
-
-    async def list_repositories(self) -> list[str]:
-        try:
-            async with httpx.AsyncClient() as client:
-                resp = await client.get(f"{self.base_url}/v2/_catalog", timeout=10)
+        self.host = self.base_url.split("://", 1)[-1]
+        # The session's client is only seen by the task that opened it and tasks it starts
+        self._shared: ContextVar[httpx.AsyncClient | None] = ContextVar(f"registry_session_{id(self)}", default=None)
+        self._flights = AsyncSingleFlight()
+        # (repository, tag) -> (digest, monotonic expiry)
+        self._digests: dict[tuple[str, str], tuple[str, float]] = {}
+
+    @asynccontextmanager
+    async def session(self) -> AsyncIterator[None]:
+        """Reuse one connection pool for every request made inside the block.
+
+        Outside a session each call opens its own client, which is fine for a
+        few requests but not for scans that make thousands. The pool belongs
+        to the calling task: other requests running meanwhile don't use it, so
+        closing it can't break them. A nested session reuses the outer one.
+        """
+        if self._shared.get() is not None:
+            yield
+            return
+        async with _http_client() as client:
+            token = self._shared.set(client)
+            try:
+                yield
+            finally:
+                self._shared.reset(token)
+
+    @asynccontextmanager
+    async def _client(self) -> AsyncIterator[httpx.AsyncClient]:
+        shared = self._shared.get()
+        if shared is not None:
+            yield shared
+        else:
+            async with _http_client() as client:
+                yield client
+
+    async def _paginate(self, path: str, key: str) -> list[str]:
+        """Follow the registry's Link: rel="next" headers and concatenate `key` from every page."""
+        items: list[str] = []
+        url = f"{self.base_url}{path}"
+        async with self._client() as client:
+            while url:
+                resp = await client.get(url, timeout=10)
                 resp.raise_for_status()
-                return resp.json().get("repositories", [])
+                items.extend(resp.json().get(key) or [])
+                next_link = resp.links.get("next", {}).get("url")
+                url = f"{self.base_url}{next_link}" if next_link and next_link.startswith("/") else next_link
+        return items
+
+    @_coalesced
+    async def list_repositories(self, strict: bool = False) -> list[str]:
+        """Every repository in the catalog. [] on failure, or with strict the error is raised."""
+        try:
+            return await self._paginate("/v2/_catalog", "repositories")
         except Exception as e:
+            if strict:
+                raise
             logger.error("Failed to list repositories: %s", e)
             return []
 
-    async def list_tags(self, repository: str) -> list[str]:
+    @_coalesced
+    async def list_tags(self, repository: str, strict: bool = False) -> list[str]:
+        """A repository's tags. [] on failure, or with strict the error is raised."""
         try:
-            async with httpx.AsyncClient() as client:
-                resp = await client.get(f"{self.base_url}/v2/{repository}/tags/list", timeout=10)
-                resp.raise_for_status()
-                return resp.json().get("tags", []) or []
+            return await self._paginate(f"/v2/{repository}/tags/list", "tags")
         except Exception as e:
+            if strict:
+                raise
             logger.error("Failed to list tags for %s: %s", repository, e)
             return []
 
+    @_coalesced
+    async def head_manifest(self, repository: str, reference: str, accept: str = MANIFEST_ACCEPT) -> str:
+        """Digest a tag currently points at, without downloading the manifest. "" on failure."""
+        try:
+            async with self._client() as client:
+                resp = await client.head(
+                    f"{self.base_url}/v2/{repository}/manifests/{reference}",
+                    headers={"Accept": accept},
+                    timeout=10,
+                )
+                resp.raise_for_status()
+                return resp.headers.get("Docker-Content-Digest", "")
+        except Exception as e:
+            logger.error("Failed to resolve %s:%s: %s", repository, reference, e)
+            return ""
+
+    async def resolve_digest(self, repository: str, tag: str) -> str:
+        """Digest to pin repository:tag to at deploy time. "" on failure.
+
+        Results are kept for DIGEST_CACHE_TTL seconds, and concurrent lookups
+        share one HEAD request, so a batch deploying one tag to many services
+        asks the registry once. Failures are not cached.
+        """
+        now = time.monotonic()
+        cached = self._digests.get((repository, tag))
+        if cached and cached[1] > now:
+            return cached[0]
+        digest = await self.head_manifest(repository, tag, accept=RESOLVE_ACCEPT)
+        if digest:
+            self._digests[(repository, tag)] = (digest, time.monotonic() + settings.digest_cache_ttl)
+        return digest
+
+    def forget_digest(self, repository: str, tag: str) -> None:
+        """Drop a cached resolve_digest result, e.g. after pushing a new image to the tag."""
+        self._digests.pop((repository, tag), None)
+
+    @_coalesced
     async def get_manifest(self, repository: str, tag: str) -> dict[str, Any]:
         """Fetch manifest for a repo:tag. Returns digest, media_type, size, layer_count."""
         try:
-            async with httpx.AsyncClient() as client:
+            async with self._client() as client:
                 resp = await client.get(
                     f"{self.base_url}/v2/{repository}/manifests/{tag}",
                     headers={"Accept": MANIFEST_ACCEPT},
@@ -63,15 +202,21 @@ class RegistryClient:
                     "size": total_size,
                     "layer_count": len(layers),
                     "config_digest": config.get("digest", ""),
+                    "config_size": config.get("size", 0),
+                    "layers": [{"digest": l.get("digest", ""), "size": l.get("size", 0)} for l in layers],
                 }
         except Exception as e:
             logger.error("Failed to get manifest for %s:%s: %s", repository, tag, e)
-            return {"digest": "", "media_type": "", "size": 0, "layer_count": 0, "config_digest": ""}
+            return {
+                "digest": "", "media_type": "", "size": 0, "layer_count": 0,
+                "config_digest": "", "config_size": 0, "layers": [],
+            }
 
+    @_coalesced
     async def get_image_config(self, repository: str, config_digest: str) -> dict[str, Any]:
         """Fetch the image config blob. Returns created, architecture, os."""
         try:
-            async with httpx.AsyncClient() as client:
+            async with self._client() as client:
                 resp = await client.get(
                     f"{self.base_url}/v2/{repository}/blobs/{config_digest}",
                     timeout=10,
@@ -90,7 +235,7 @@ class RegistryClient:
     async def delete_manifest(self, repository: str, digest: str) -> bool:
         """Delete a manifest by digest. Registry must have REGISTRY_STORAGE_DELETE_ENABLED=true."""
         try:
-            async with httpx.AsyncClient() as client:
+            async with self._client() as client:
                 resp = await client.delete(
                     f"{self.base_url}/v2/{repository}/manifests/{digest}",
                     headers={"Accept": MANIFEST_ACCEPT},
@@ -0,0 +1,286 @@
+"""Retention planning and bulk deletion for registry manifests."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+
+from backend.config import settings
+from backend.database import get_db
+from backend.models.schemas import (
+    GCCandidate,
+    GCDeleteResult,
+    GCExecution,
+    GCPlan,
+    RetentionPolicy,
+)
+from backend.services.clusters import clusters
+from backend.services.registry_client import RegistryClient, registry_client, split_image_ref
+from backend.services.throttle import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+_MAX_PLANS = 20
+
+
+@dataclass(slots=True)
+class _Manifest:
+    repository: str
+    digest: str
+    tags: list[str] = field(default_factory=list)
+    created: str = ""
+    blobs: dict[str, int] = field(default_factory=dict)
+
+
+async def _scan_repository(
+    client: RegistryClient, repository: str, sem: asyncio.Semaphore
+) -> list[_Manifest]:
+    async with sem:
+        tags = await client.list_tags(repository)
+
+    async def fetch(tag: str) -> tuple[str, dict, str]:
+        async with sem:
+            manifest = await client.get_manifest(repository, tag)
+            created = ""
+            if manifest.get("config_digest"):
+                config = await client.get_image_config(repository, manifest["config_digest"])
+                created = config.get("created", "")
+        return tag, manifest, created
+
+    by_digest: dict[str, _Manifest] = {}
+    for tag, manifest, created in await asyncio.gather(*(fetch(t) for t in tags)):
+        digest = manifest.get("digest")
+        if not digest:
+            continue
+        m = by_digest.get(digest)
+        if m is None:
+            blobs = {l["digest"]: l["size"] for l in manifest.get("layers", [])}
+            if manifest.get("config_digest"):
+                blobs[manifest["config_digest"]] = manifest.get("config_size", 0)
+            m = by_digest[digest] = _Manifest(repository, digest, created=created, blobs=blobs)
+        m.tags.append(tag)
+    return list(by_digest.values())
+
+
+async def _in_use_refs(
+    client: RegistryClient, max_age: float | None = None
+) -> tuple[set[str], set[tuple[str, str]]]:
+    """Digests and (repository, tag) pairs referenced by services running on any cluster.
+
+    Raises if a cluster can't be listed, since its services might use any image.
+    """
+    services, errors = await clusters.fan_out(lambda c: c.state.services(max_age))
+    if errors:
+        raise RuntimeError("; ".join(f"cluster {name}: {error}" for name, error in errors.items()))
+    digests: set[str] = set()
+    tags: set[tuple[str, str]] = set()
+    for svc in services:
+        host, repository, tag, digest = split_image_ref(svc.image)
+        if host and host != client.host and host not in settings.registry_aliases:
+            continue
+        if digest:
+            digests.add(digest)
+        tags.add((repository, tag or "latest"))
+    return digests, tags
+
+
+def _retained(manifests: list[_Manifest], policy: RetentionPolicy, cutoff: str) -> set[str]:
+    """Digests in one repository kept by the keep-last-N and keep-younger-than rules."""
+    ordered = sorted(manifests, key=lambda m: m.created, reverse=True)
+    keep = {m.digest for m in ordered[:policy.keep_last]}
+    keep.update(m.digest for m in ordered if m.created and m.created >= cutoff)
+    return keep
+
+
+async def plan_gc(policy: RetentionPolicy, client: RegistryClient = registry_client) -> GCPlan:
+    """Build a dry-run deletion plan for `policy`.
+
+    Every repository is scanned so that blobs shared with repositories outside
+    the policy's scope still count as referenced. Reclaimable bytes only include
+    blobs that no retained manifest references, each counted once.
+    """
+    errors: list[str] = []
+    sem = asyncio.Semaphore(settings.registry_concurrency)
+    repositories = await client.list_repositories()
+    scoped = set(policy.repositories) if policy.repositories is not None else set(repositories)
+
+    async with client.session():
+        scans = await asyncio.gather(
+            *(_scan_repository(client, r, sem) for r in repositories), return_exceptions=True
+        )
+    manifests: dict[str, list[_Manifest]] = {}
+    for repo, result in zip(repositories, scans):
+        if isinstance(result, BaseException):
+            errors.append(f"{repo}: {result}")
+            scoped.discard(repo)
+            result = []
+        manifests[repo] = result
+
+    in_use_digests: set[str] = set()
+    in_use_tags: set[tuple[str, str]] = set()
+    if policy.protect_in_use:
+        try:
+            in_use_digests, in_use_tags = await _in_use_refs(client)
+        except Exception as e:
+            # Without knowing what is running nothing can be safely deleted
+            errors.append(f"Cannot list running services: {e}")
+            scoped = set()
+
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=policy.keep_days)).isoformat()
+    candidates: list[_Manifest] = []
+    kept: list[_Manifest] = []
+    protected: set[str] = set()
+    for repo, repo_manifests in manifests.items():
+        retained = _retained(repo_manifests, policy, cutoff) if repo in scoped else None
+        for m in repo_manifests:
+            in_use = m.digest in in_use_digests or any((repo, t) in in_use_tags for t in m.tags)
+            if in_use:
+                protected.add(m.digest)
+            if retained is None or m.digest in retained or in_use:
+                kept.append(m)
+            else:
+                candidates.append(m)
+
+    referenced = {blob for m in kept for blob in m.blobs}
+    reclaimable: dict[str, int] = {}
+    for m in candidates:
+        for blob, size in m.blobs.items():
+            if blob not in referenced:
+                reclaimable[blob] = size
+
+    plan = GCPlan(
+        id=uuid.uuid4().hex[:12],
+        created_at=datetime.now(timezone.utc),
+        policy=policy,
+        candidates=[
+            GCCandidate(
+                repository=m.repository,
+                digest=m.digest,
+                tags=sorted(m.tags),
+                created=m.created,
+                size=sum(m.blobs.values()),
+            )
+            for m in sorted(candidates, key=lambda m: (m.repository, m.created))
+        ],
+        kept_manifests=len(kept),
+        in_use_digests=sorted(protected),
+        reclaimable_bytes=sum(reclaimable.values()),
+        errors=errors,
+    )
+    # In the database, so any API process can show or execute the plan
+    db = await get_db()
+    try:
+        await db.execute(
+            "INSERT INTO gc_plans (id, created_at, plan) VALUES (?, ?, ?)",
+            (plan.id, plan.created_at.isoformat(), plan.model_dump_json()),
+        )
+        await db.execute(
+            "DELETE FROM gc_plans WHERE id NOT IN (SELECT id FROM gc_plans ORDER BY created_at DESC LIMIT ?)",
+            (_MAX_PLANS,),
+        )
+        await db.commit()
+    finally:
+        await db.close()
+    return plan
+
+
+async def get_plan(plan_id: str) -> GCPlan | None:
+    db = await get_db()
+    try:
+        cursor = await db.execute("SELECT plan FROM gc_plans WHERE id = ?", (plan_id,))
+        row = await cursor.fetchone()
+    finally:
+        await db.close()
+    return GCPlan.model_validate_json(row["plan"]) if row else None
+
+
+async def execute_plan(
+    plan: GCPlan,
+    client: RegistryClient = registry_client,
+    concurrency: int | None = None,
+    rate: float | None = None,
+) -> GCExecution:
+    """Delete every candidate in `plan` with bounded concurrency and a request-rate cap.
+
+    Everything the plan was based on is read again first: every tag of the
+    candidates' repositories and, if the policy protects them, the images of
+    running services. A candidate is skipped if none of its tags still points
+    at the planned digest, if any other tag now points at it, or if a running
+    service uses it, so tags pushed or moved after planning are never removed.
+    A repository whose tags can't all be resolved is skipped entirely.
+    """
+    sem = asyncio.Semaphore(concurrency or settings.registry_concurrency)
+    limiter = RateLimiter(settings.registry_delete_rate if rate is None else rate)
+
+    in_use_digests: set[str] = set()
+    in_use_tags: set[tuple[str, str]] = set()
+    in_use_error = ""
+    if plan.policy.protect_in_use:
+        try:
+            in_use_digests, in_use_tags = await _in_use_refs(client, max_age=0)
+        except Exception as e:
+            in_use_error = f"cannot list running services: {e}"
+
+    async def current_tags(repository: str) -> dict[str, list[str]]:
+        """Digest -> the tags that point at it now. Raises unless every tag resolves."""
+        async with sem:
+            tags = await client.list_tags(repository, strict=True)
+
+        async def head(tag: str) -> tuple[str, str]:
+            async with sem:
+                return tag, await client.head_manifest(repository, tag)
+
+        by_digest: dict[str, list[str]] = defaultdict(list)
+        for tag, digest in await asyncio.gather(*(head(t) for t in tags)):
+            if not digest:
+                raise RuntimeError(f"cannot resolve {repository}:{tag}")
+            by_digest[digest].append(tag)
+        return by_digest
+
+    repositories = sorted({c.repository for c in plan.candidates})
+    async with client.session():
+        listings = await asyncio.gather(*(current_tags(r) for r in repositories), return_exceptions=True)
+    tagged = dict(zip(repositories, listings))
+
+    def blocker(c: GCCandidate) -> str:
+        """Why the candidate must not be deleted now, or ""."""
+        if in_use_error:
+            return in_use_error
+        current = tagged[c.repository]
+        if isinstance(current, BaseException):
+            return f"cannot re-read tags: {current}"
+        tags = current.get(c.digest, [])
+        if c.digest in in_use_digests or any((c.repository, t) in in_use_tags for t in tags):
+            return "in use by a running service"
+        if c.tags and not tags:
+            return "tag no longer points at planned digest"
+        added = sorted(set(tags) - set(c.tags))
+        if added:
+            return f"now also tagged {', '.join(added)}"
+        return ""
+
+    async def delete(c: GCCandidate) -> GCDeleteResult:
+        reason = blocker(c)
+        if reason:
+            return GCDeleteResult(repository=c.repository, digest=c.digest, tags=c.tags, deleted=False, error=reason)
+        async with sem:
+            await limiter.wait()
+            ok = await client.delete_manifest(c.repository, c.digest)
+            return GCDeleteResult(
+                repository=c.repository, digest=c.digest, tags=c.tags,
+                deleted=ok, error="" if ok else "delete failed",
+            )
+
+    results = await asyncio.gather(*(delete(c) for c in plan.candidates))
+    deleted = sum(1 for r in results if r.deleted)
+    logger.info("Registry GC plan %s: %d deleted, %d failed", plan.id, deleted, len(results) - deleted)
+    db = await get_db()
+    try:
+        await db.execute("DELETE FROM gc_plans WHERE id = ?", (plan.id,))
+        await db.commit()
+    finally:
+        await db.close()
+    return GCExecution(plan_id=plan.id, deleted=deleted, failed=len(results) - deleted, results=results)
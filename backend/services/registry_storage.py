@@ -0,0 +1,275 @@
+"""Layer-level storage accounting for the private registry.
+
+Summing layer sizes per tag counts a layer once for every image that uses it.
+This module keeps an index of the registry in SQLite instead: which digest each
+tag points at, and the blobs (layers and config) of each manifest. Manifests are
+content-addressed and never change, so a rescan only HEADs tags and downloads
+manifests it has not seen. Reports are computed from the index without calling
+the registry.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING
+
+from backend.config import settings
+from backend.database import get_db
+from backend.models.schemas import (
+    LayerUsage,
+    RegistryScan,
+    RegistryStorageReport,
+    RepositoryStorage,
+    TagStorage,
+)
+from backend.services.registry_client import RegistryClient, registry_client
+
+if TYPE_CHECKING:
+    import aiosqlite
+
+logger = logging.getLogger(__name__)
+
+_MAX_ERRORS = 50
+_scan_lock = asyncio.Lock()
+_last_scan: RegistryScan | None = None
+
+# Blobs of currently tagged manifests, with how many (repository, manifest)
+# pairs and how many repositories reference each one.
+_BLOBS_CTE = """
+WITH live AS (SELECT DISTINCT repository, digest FROM registry_tags),
+refs AS (
+    SELECT l.repository, l.digest, b.blob_digest, b.size
+    FROM live l JOIN registry_manifest_blobs b ON b.manifest_digest = l.digest
+),
+blobs AS (
+    SELECT blob_digest, MAX(size) AS size, COUNT(*) AS manifests,
+           COUNT(DISTINCT repository) AS repos
+    FROM refs GROUP BY blob_digest
+)
+"""
+
+
+async def scan(client: RegistryClient = registry_client) -> RegistryScan:
+    """Bring the index up to date with the registry.
+
+    Every tag is resolved to a digest with a HEAD request; only manifests
+    missing from the index are fetched. Manifests no tag points at any more
+    are dropped. A tag that cannot be resolved keeps its previous digest, and
+    a repository whose tags cannot be listed keeps its previous tags. Raises
+    if the repository list itself cannot be read, leaving the index as it was.
+    """
+    global _last_scan
+    async with _scan_lock:
+        started = time.perf_counter()
+        errors: list[str] = []
+        sem = asyncio.Semaphore(settings.registry_concurrency)
+
+        db = await get_db()
+        try:
+            cursor = await db.execute("SELECT digest FROM registry_manifests")
+            known = {r["digest"] for r in await cursor.fetchall()}
+            cursor = await db.execute("SELECT repository, tag, digest FROM registry_tags")
+            previous = {(r["repository"], r["tag"]): r["digest"] for r in await cursor.fetchall()}
+        finally:
+            await db.close()
+
+        async def resolve(repository: str) -> list[tuple[str, str, str]] | None:
+            async with sem:
+                try:
+                    tags = await client.list_tags(repository, strict=True)
+                except Exception as e:
+                    errors.append(f"{repository}: cannot list tags: {e}")
+                    return None
+
+            async def head(tag: str) -> tuple[str, str, str]:
+                async with sem:
+                    digest = await client.head_manifest(repository, tag)
+                if not digest:
+                    errors.append(f"{repository}:{tag}: cannot resolve digest")
+                    digest = previous.get((repository, tag), "")
+                return repository, tag, digest
+
+            return await asyncio.gather(*(head(t) for t in tags))
+
+        async def fetch(repository: str, digest: str) -> tuple[str, str, dict[str, int]] | None:
+            async with sem:
+                manifest = await client.get_manifest(repository, digest)
+            if manifest.get("digest") != digest:
+                errors.append(f"{repository}@{digest}: cannot fetch manifest")
+                return None
+            blobs = {l["digest"]: l["size"] for l in manifest.get("layers", [])}
+            if manifest.get("config_digest"):
+                blobs[manifest["config_digest"]] = manifest.get("config_size", 0)
+            return digest, manifest.get("media_type", ""), blobs
+
+        async with client.session():
+            repositories = await client.list_repositories(strict=True)
+            resolved = await asyncio.gather(*(resolve(r) for r in repositories))
+            unlisted = [r for r, repo_tags in zip(repositories, resolved) if repo_tags is None]
+            tags = [t for repo_tags in resolved if repo_tags for t in repo_tags if t[2]]
+            missing = {digest: repo for repo, _, digest in tags if digest not in known}
+            fetched = [m for m in await asyncio.gather(*(fetch(r, d) for d, r in missing.items())) if m]
+
+        now = datetime.now(timezone.utc).isoformat()
+        db = await get_db()
+        try:
+            # Replace every repository's tags except those that couldn't be listed
+            placeholders = ", ".join("?" * len(unlisted))
+            await db.execute(f"DELETE FROM registry_tags WHERE repository NOT IN ({placeholders})", unlisted)
+            await db.executemany("INSERT INTO registry_tags (repository, tag, digest) VALUES (?, ?, ?)", tags)
+            await db.executemany(
+                "INSERT OR REPLACE INTO registry_manifests (digest, media_type, fetched_at) VALUES (?, ?, ?)",
+                [(digest, media_type, now) for digest, media_type, _ in fetched],
+            )
+            await db.executemany(
+                "INSERT OR REPLACE INTO registry_manifest_blobs (manifest_digest, blob_digest, size) VALUES (?, ?, ?)",
+                [(digest, blob, size) for digest, _, blobs in fetched for blob, size in blobs.items()],
+            )
+            cursor = await db.execute(
+                "DELETE FROM registry_manifests WHERE digest NOT IN (SELECT digest FROM registry_tags)"
+            )
+            removed = cursor.rowcount
+            await db.execute(
+                "DELETE FROM registry_manifest_blobs WHERE manifest_digest NOT IN (SELECT digest FROM registry_manifests)"
+            )
+            await db.commit()
+        finally:
+            await db.close()
+
+        _last_scan = RegistryScan(
+            scanned_at=datetime.now(timezone.utc),
+            repositories=len(repositories),
+            tags=len(tags),
+            manifests=len({digest for _, _, digest in tags}),
+            manifests_fetched=len(fetched),
+            manifests_removed=removed,
+            errors=errors[:_MAX_ERRORS],
+            error_count=len(errors),
+            elapsed_ms=round((time.perf_counter() - started) * 1000, 1),
+        )
+        logger.info(
+            "Registry scan: %d tags, %d manifests fetched, %d removed, %d error(s) in %.0f ms",
+            _last_scan.tags, _last_scan.manifests_fetched, removed, len(errors), _last_scan.elapsed_ms,
+        )
+        return _last_scan
+
+
+async def _repositories(db: aiosqlite.Connection, name: str | None = None) -> list[RepositoryStorage]:
+    where, params = ("WHERE t.repository = ?", (name,)) if name else ("", ())
+    cursor = await db.execute(
+        f"""SELECT t.repository, COUNT(*) AS tag_count, COUNT(DISTINCT t.digest) AS manifest_count,
+                   COALESCE(SUM(m.size), 0) AS logical_bytes
+            FROM registry_tags t LEFT JOIN (
+                SELECT manifest_digest, SUM(size) AS size FROM registry_manifest_blobs GROUP BY manifest_digest
+            ) m ON m.manifest_digest = t.digest
+            {where}
+            GROUP BY t.repository""",
+        params,
+    )
+    repos = {
+        r["repository"]: RepositoryStorage(
+            name=r["repository"], tag_count=r["tag_count"],
+            manifest_count=r["manifest_count"], logical_bytes=r["logical_bytes"],
+        )
+        for r in await cursor.fetchall()
+    }
+    where = where.replace("t.", "r.")
+    cursor = await db.execute(
+        _BLOBS_CTE + f"""
+        SELECT r.repository, SUM(bl.size) AS stored_bytes,
+               SUM(CASE WHEN bl.repos = 1 THEN bl.size ELSE 0 END) AS unique_bytes
+        FROM (SELECT DISTINCT repository, blob_digest FROM refs) r JOIN blobs bl USING (blob_digest)
+        {where}
+        GROUP BY r.repository""",
+        params,
+    )
+    for r in await cursor.fetchall():
+        repo = repos[r["repository"]]
+        repo.stored_bytes = r["stored_bytes"]
+        repo.unique_bytes = r["unique_bytes"]
+        repo.shared_bytes = r["stored_bytes"] - r["unique_bytes"]
+    return sorted(repos.values(), key=lambda r: r.stored_bytes, reverse=True)
+
+
+async def report(top: int = 20) -> RegistryStorageReport:
+    """Per-repository storage from the index, and the `top` largest layers used by only one image.
+
+    stored_bytes counts each blob of a repository once; unique_bytes is the part
+    no other repository references, i.e. roughly what deleting the repository
+    would free. logical_bytes is the naive per-tag sum.
+    """
+    db = await get_db()
+    try:
+        repositories = await _repositories(db)
+        cursor = await db.execute(
+            _BLOBS_CTE + "SELECT COUNT(*) AS blob_count, COALESCE(SUM(size), 0) AS stored_bytes FROM blobs"
+        )
+        totals = await cursor.fetchone()
+        cursor = await db.execute(
+            _BLOBS_CTE + """
+            SELECT r.blob_digest, r.size, r.repository, r.digest,
+                   (SELECT GROUP_CONCAT(tag) FROM registry_tags t
+                    WHERE t.repository = r.repository AND t.digest = r.digest) AS tags
+            FROM refs r JOIN blobs bl USING (blob_digest)
+            WHERE bl.manifests = 1
+            ORDER BY r.size DESC LIMIT ?""",
+            (top,),
+        )
+        largest = [
+            LayerUsage(
+                digest=r["blob_digest"], size=r["size"], repository=r["repository"],
+                manifest_digest=r["digest"], tags=sorted((r["tags"] or "").split(",")),
+            )
+            for r in await cursor.fetchall()
+        ]
+    finally:
+        await db.close()
+
+    return RegistryStorageReport(
+        tag_count=sum(r.tag_count for r in repositories),
+        manifest_count=sum(r.manifest_count for r in repositories),
+        blob_count=totals["blob_count"],
+        logical_bytes=sum(r.logical_bytes for r in repositories),
+        stored_bytes=totals["stored_bytes"],
+        repositories=repositories,
+        largest_unshared=largest,
+        last_scan=_last_scan,
+    )
+
+
+async def repository_report(name: str) -> RepositoryStorage | None:
+    """Storage for one repository with a per-tag breakdown. None if it is not indexed.
+
+    A tag's unique_bytes are the blobs no other image in the registry uses;
+    tags pointing at the same manifest report the same figures.
+    """
+    db = await get_db()
+    try:
+        found = await _repositories(db, name)
+        if not found:
+            return None
+        summary = found[0]
+        cursor = await db.execute(
+            _BLOBS_CTE + """
+            SELECT t.tag, t.digest, SUM(b.size) AS size,
+                   SUM(CASE WHEN bl.manifests = 1 THEN b.size ELSE 0 END) AS unique_bytes
+            FROM registry_tags t
+            JOIN registry_manifest_blobs b ON b.manifest_digest = t.digest
+            JOIN blobs bl ON bl.blob_digest = b.blob_digest
+            WHERE t.repository = ?
+            GROUP BY t.tag, t.digest
+            ORDER BY size DESC""",
+            (name,),
+        )
+        summary.tags = [
+            TagStorage(
+                tag=r["tag"], digest=r["digest"], size=r["size"],
+                unique_bytes=r["unique_bytes"], shared_bytes=r["size"] - r["unique_bytes"],
+            )
+            for r in await cursor.fetchall()
+        ]
+    finally:
+        await db.close()
+    return summary
@@ -0,0 +1,100 @@
+"""Circuit breaking and jittered retries for calls into an external daemon."""
+from __future__ import annotations
+
+import logging
+import random
+import threading
+import time
+from typing import Callable, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose breaker is open."""
+
+
+class CircuitBreaker:
+    """Fail fast after `failure_threshold` consecutive failures.
+
+    Once open, calls are rejected for `reset_timeout` seconds. The first call
+    after that is let through as a trial: success closes the breaker, failure
+    opens it again. Safe to share between threads.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float) -> None:
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        return self._state
+
+    def before_call(self) -> None:
+        with self._lock:
+            if self._state == CLOSED:
+                return
+            remaining = self._opened_at + self.reset_timeout - time.monotonic()
+            if self._state == OPEN and remaining <= 0:
+                self._state = HALF_OPEN
+                self._trial_in_flight = False
+            if self._state == HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return
+            raise CircuitOpenError(
+                f"{self.name} is unavailable; retrying in {max(remaining, 0):.0f}s"
+            )
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._state != CLOSED:
+                logger.info("Circuit %s closed", self.name)
+            self._state = CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    logger.warning(
+                        "Circuit %s opened after %d failure(s)", self.name, self._failures
+                    )
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+
+
+def retry(
+    fn: Callable[[], T],
+    attempts: int,
+    base_delay: float,
+    retryable: Callable[[Exception], bool],
+) -> T:
+    """Call fn up to `attempts` times, sleeping with full jitter between tries.
+
+    Only use this for idempotent operations. Errors for which `retryable`
+    returns False are raised immediately.
+    """
+    attempt = 0
+    while True:
+        try:
+            return fn()
+        except Exception as e:
+            attempt += 1
+            if attempt >= attempts or not retryable(e):
+                raise
+            time.sleep(random.uniform(0, base_delay * 2 ** (attempt - 1)))
@@ -0,0 +1,106 @@
+"""Coalescing concurrent identical calls into one.
+
+While a call for a key is in flight, further callers with the same key wait
+for it and get its result, or its exception, instead of making their own.
+Nothing is cached: a call made after it finished runs again. Waiters share
+the result object, so it must be treated as read-only.
+"""
+from __future__ import annotations
+
+import asyncio
+import functools
+import threading
+from typing import Any, Awaitable, Callable, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+def call_key(name: str, args: tuple, kwargs: dict[str, Any]) -> Hashable:
+    """Key for a call by method name and arguments; unhashable arguments such as filter dicts go by repr."""
+    try:
+        key = (name, args, tuple(sorted(kwargs.items())))
+        hash(key)
+        return key
+    except TypeError:
+        return name, repr(args), repr(sorted(kwargs.items()))
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException | None = None
+
+
+class SingleFlight:
+    """Single flight for blocking calls made from several threads."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._calls: dict[Hashable, _Call] = {}
+
+    def do(self, key: Hashable, fn: Callable[[], T]) -> T:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+class AsyncSingleFlight:
+    """Single flight for coroutines on one or more event loops.
+
+    The call runs as its own task, so a caller that is cancelled while waiting
+    does not cancel it for the others.
+    """
+
+    def __init__(self) -> None:
+        self._calls: dict[Hashable, asyncio.Future] = {}
+
+    def in_flight(self, key: Hashable) -> bool:
+        return (asyncio.get_running_loop(), key) in self._calls
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        key = (asyncio.get_running_loop(), key)
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+        return await asyncio.shield(task)
+
+    def _done(self, key: Hashable, task: asyncio.Future) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()  # retrieved, even if every waiter was cancelled
+
+
+_threads = AsyncSingleFlight()
+
+
+async def to_thread(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """asyncio.to_thread for reads, shared with concurrent calls of fn with the same arguments.
+
+    Coalescing before the thread pool means waiters hold no worker thread, so
+    a burst of identical reads costs one call however many callers there are.
+    """
+    key = (fn, call_key("", args, kwargs))
+    return await _threads.do(key, functools.partial(asyncio.to_thread, fn, *args, **kwargs))
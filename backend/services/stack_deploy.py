@@ -0,0 +1,276 @@
+"""Deploying a project's docker-compose.yml as a Swarm stack, like `docker stack deploy`.
+
+Services are named `<stack>_<service>` and labelled with the stack namespace,
+so list_stacks and scale-to-zero see them. Each one also carries the SHA-256
+of the definition it was deployed from. A service whose label matches the
+compose file is left alone, so redeploying an unchanged stack writes nothing.
+Networks used by the services are created once, before any service.
+Images are pinned to digests after hashing, so a moved tag alone does not
+count as a change.
+"""
+from __future__ import annotations
+
+import asyncio
+import re
+import shlex
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from backend.config import settings
+from backend.database import definition_digest
+from backend.models.schemas import ResourceSpec, ServiceDefinition, ServiceResources, StackDeployResult
+from backend.services import catalog, pinning
+from backend.services.cluster_state import cluster_state
+from backend.services.docker_client import swarm_client
+from backend.services.jobs import JobContext
+
+STACK_LABEL = "com.docker.stack.namespace"
+SPEC_HASH_LABEL = "swarm-orchestrator.spec-hash"
+COMPOSE_FILE = "docker-compose.yml"
+
+_NAME = re.compile(r"^[a-zA-Z0-9][a-zA-Z0-9_.-]*$")
+_SIZE = re.compile(r"^(\d+(?:\.\d+)?)\s*([bkmgt]?)b?$", re.IGNORECASE)
+_MB = {"b": 1 / (1024 * 1024), "k": 1 / 1024, "m": 1, "g": 1024, "t": 1024 * 1024}
+_SUPPORTED = {
+    "image", "deploy", "ports", "environment", "volumes", "networks", "command", "build", "container_name",
+}
+_SUPPORTED_DEPLOY = {"replicas", "labels", "placement", "resources", "mode"}
+
+
+@dataclass
+class Stack:
+    name: str
+    services: dict[str, ServiceDefinition]
+    # Real network name -> (driver, attachable) for the networks this stack creates
+    networks: dict[str, tuple[str, bool]]
+    ignored_keys: dict[str, list[str]] = field(default_factory=dict)
+
+
+def compose_path(project: str) -> Path:
+    """The compose file of a folder directly under PROJECTS_DIR. Raises ValueError for other names."""
+    if not _NAME.match(project):
+        raise ValueError(f"invalid project name: {project!r}")
+    return settings.projects_path / project / COMPOSE_FILE
+
+
+def _mapping(value: Any) -> dict[str, str]:
+    """Compose's list-or-dict form (environment, labels) as a dict."""
+    if isinstance(value, dict):
+        return {str(k): "" if v is None else str(v) for k, v in value.items()}
+    return dict(str(item).partition("=")[::2] for item in value or [])
+
+
+def _memory_mb(value: Any) -> float:
+    if isinstance(value, (int, float)):
+        return value / (1024 * 1024)
+    m = _SIZE.match(str(value).strip())
+    if not m:
+        raise ValueError(f"invalid memory size: {value!r}")
+    return float(m[1]) * _MB[m[2].lower() or "b"]
+
+
+def _resource_spec(value: dict[str, Any] | None) -> ResourceSpec:
+    value = value or {}
+    gpus = sum(
+        int(g.get("discrete_resource_spec", {}).get("value", 0))
+        for g in value.get("generic_resources") or []
+        if g.get("discrete_resource_spec", {}).get("kind") == "GPU"
+    )
+    return ResourceSpec(
+        cpus=float(value.get("cpus") or 0),
+        memory_mb=_memory_mb(value["memory"]) if value.get("memory") else 0,
+        gpus=gpus,
+    )
+
+
+def _ports(value: Any) -> list[str]:
+    """`published:target` pairs; ports without a published port are skipped."""
+    ports = []
+    for p in value or []:
+        if isinstance(p, dict):
+            published, target, protocol = p.get("published"), p.get("target"), p.get("protocol", "tcp")
+        else:
+            spec, _, protocol = str(p).partition("/")
+            parts = spec.split(":")
+            target = parts[-1]
+            published = parts[-2] if len(parts) > 1 else None
+        if (protocol or "tcp") != "tcp":
+            raise ValueError(f"only tcp ports are supported: {p!r}")
+        if published is None:
+            continue
+        if not str(published).isdigit() or not str(target).isdigit():
+            raise ValueError(f"unsupported port: {p!r}")
+        ports.append(f"{published}:{target}")
+    return ports
+
+
+def _mounts(value: Any, stack: str, project_dir: Path, volumes: dict[str, Any]) -> list[str]:
+    """`source:target[:ro]` entries; named volumes get the stack prefix unless external."""
+    mounts = []
+    for v in value or []:
+        if isinstance(v, dict):
+            source, target, read_only = v.get("source"), v.get("target"), v.get("read_only", False)
+        else:
+            parts = str(v).split(":")
+            if len(parts) < 2:
+                continue  # anonymous volume
+            source, target, read_only = parts[0], parts[1], parts[2:3] == ["ro"]
+        if not source or not target:
+            continue
+        if source.startswith("~"):
+            source = str(Path(source).expanduser())
+        elif source.startswith("."):
+            source = str((project_dir / source).resolve())
+        elif not source.startswith("/"):
+            volume = volumes.get(source) or {}
+            source = volume.get("name") or (source if volume.get("external") else f"{stack}_{source}")
+        mounts.append(f"{source}:{target}" + (":ro" if read_only else ""))
+    return mounts
+
+
+def _network_name(stack: str, key: str, networks: dict[str, Any]) -> str:
+    net = networks.get(key) or {}
+    return net.get("name") or (key if net.get("external") else f"{stack}_{key}")
+
+
+def parse_compose(stack: str, data: Any, project_dir: Path) -> Stack:
+    """Service definitions and networks of a parsed compose file. Raises ValueError when unusable."""
+    if not _NAME.match(stack):
+        raise ValueError(f"invalid stack name: {stack!r}")
+    if not isinstance(data, dict) or not isinstance(data.get("services"), dict) or not data["services"]:
+        raise ValueError("compose file has no services")
+    networks = data.get("networks") or {}
+    volumes = data.get("volumes") or {}
+
+    result = Stack(name=stack, services={}, networks={})
+    for key, svc in data["services"].items():
+        svc = svc or {}
+        if not svc.get("image"):
+            raise ValueError(f"service {key!r} has no image; build it and push it to the registry first")
+        deploy = svc.get("deploy") or {}
+        if deploy.get("mode", "replicated") != "replicated":
+            raise ValueError(f"service {key!r}: only replicated services are supported")
+        ignored = sorted(set(svc) - _SUPPORTED) + sorted(f"deploy.{k}" for k in set(deploy) - _SUPPORTED_DEPLOY)
+        if ignored:
+            result.ignored_keys[key] = ignored
+
+        service_networks = svc.get("networks") or ["default"]
+        real_networks = []
+        for net in service_networks:
+            name = _network_name(stack, net, networks)
+            real_networks.append(name)
+            definition = networks.get(net) or {}
+            if not definition.get("external"):
+                result.networks[name] = (definition.get("driver", "overlay"), bool(definition.get("attachable")))
+
+        command = svc.get("command")
+        if isinstance(command, list):
+            command = shlex.join(str(c) for c in command)
+        resources = deploy.get("resources") or {}
+        labels = _mapping(deploy.get("labels")) | {STACK_LABEL: stack}
+        defn = ServiceDefinition(
+            image=svc["image"],
+            replicas=deploy.get("replicas", 1),
+            ports=_ports(svc.get("ports")),
+            env=_mapping(svc.get("environment")),
+            constraints=(deploy.get("placement") or {}).get("constraints") or [],
+            labels=labels,
+            networks=real_networks,
+            mounts=_mounts(svc.get("volumes"), stack, project_dir, volumes),
+            command=str(command) if command else None,
+            resources=ServiceResources(
+                reservations=_resource_spec(resources.get("reservations")),
+                limits=_resource_spec(resources.get("limits")),
+            ) if resources else None,
+        )
+        digest = definition_digest(defn.model_dump_json())[1]
+        defn.labels[SPEC_HASH_LABEL] = digest
+        result.services[f"{stack}_{key}"] = defn
+    return result
+
+
+def load_stack(project: str, stack: str | None = None) -> Stack:
+    """Parse a project's compose file. Raises FileNotFoundError or ValueError."""
+    path = compose_path(project)
+    with path.open("rb") as f:
+        try:
+            data = catalog.load_yaml(f)
+        except Exception as e:
+            raise ValueError(f"invalid {COMPOSE_FILE}: {e}") from e
+    return parse_compose(stack or project.lower(), data, path.parent)
+
+
+async def deploy_stack(ctx: JobContext) -> dict:
+    """Job body. params: project, stack, prune."""
+    stack = load_stack(ctx.params["project"], ctx.params.get("stack"))
+    result = StackDeployResult(stack=stack.name, ignored_keys=stack.ignored_keys)
+    for key, ignored in stack.ignored_keys.items():
+        ctx.log(f"{key}: ignoring unsupported keys {', '.join(ignored)}")
+
+    existing_networks, attrs = await asyncio.gather(
+        asyncio.to_thread(swarm_client.network_names), asyncio.to_thread(swarm_client.list_service_attrs)
+    )
+    missing = sorted(set(stack.networks) - existing_networks)
+    if missing:
+        await ctx.progress(0.0, f"creating {len(missing)} network(s)")
+    await asyncio.gather(*(
+        asyncio.to_thread(
+            swarm_client.create_network, name, stack.networks[name][0], {STACK_LABEL: stack.name},
+            stack.networks[name][1],
+        )
+        for name in missing
+    ))
+    for name in missing:
+        ctx.log(f"Created network {name}")
+    result.networks_created = missing
+
+    deployed = {
+        a["Spec"]["Name"]: (a["Spec"].get("Labels") or {})
+        for a in attrs
+        if (a["Spec"].get("Labels") or {}).get(STACK_LABEL) == stack.name
+    }
+    prune = sorted(set(deployed) - set(stack.services)) if ctx.params.get("prune", False) else []
+    total = len(stack.services) + len(prune)
+    sem = asyncio.Semaphore(settings.stack_deploy_concurrency)
+
+    async def apply(name: str, defn: ServiceDefinition | None) -> None:
+        try:
+            if defn is None:
+                async with sem:
+                    if not await asyncio.to_thread(swarm_client.remove_service, name):
+                        raise RuntimeError("remove failed")
+                result.removed.append(name)
+            elif name not in deployed:
+                defn, _ = await pinning.pin_definition(defn)
+                async with sem:
+                    await asyncio.to_thread(swarm_client.deploy_service, name, defn)
+                result.created.append(name)
+            elif deployed[name].get(SPEC_HASH_LABEL) != defn.labels[SPEC_HASH_LABEL]:
+                defn, _ = await pinning.pin_definition(defn)
+                async with sem:
+                    await asyncio.to_thread(swarm_client.redeploy_service, name, defn)
+                result.updated.append(name)
+            else:
+                result.unchanged.append(name)
+        except Exception as e:
+            result.failed[name] = str(e)
+            ctx.log(f"{name}: {e}")
+
+    pending = [apply(name, defn) for name, defn in stack.services.items()] + [apply(name, None) for name in prune]
+    for finished, done in enumerate(asyncio.as_completed(pending), start=1):
+        await done
+        await ctx.progress(finished / total, f"{finished}/{total} service(s) applied")
+    for names in (result.created, result.updated, result.unchanged, result.removed):
+        names.sort()
+    result.writes = len(missing) + len(result.created) + len(result.updated) + len(result.removed)
+    if result.writes:
+        cluster_state.invalidate()
+    ctx.log(
+        f"Stack {stack.name}: {len(result.created)} created, {len(result.updated)} updated, "
+        f"{len(result.unchanged)} unchanged, {len(result.removed)} removed, {len(result.failed)} failed"
+    )
+    if result.failed:
+        await ctx.progress(1.0, "failed", result.model_dump())
+        raise RuntimeError(f"{len(result.failed)} service(s) failed: {', '.join(sorted(result.failed))}")
+    return result.model_dump()
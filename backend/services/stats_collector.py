@@ -0,0 +1,349 @@
+"""Container stats sampling for running tasks, kept in fixed-size ring buffers.
+
+Only the leader samples Docker. Each sampling round is also stored in SQLite,
+and the other API processes replay the rounds into buffers of their own
+before answering a query, so stats calls don't multiply with the number of
+processes.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+import time
+from array import array
+from typing import Any
+
+import orjson
+
+from backend.config import settings
+from backend.database import get_db
+from backend.models.records import TaskRecord
+from backend.models.schemas import NodeUtilization, Percentiles, ServiceUtilization
+from backend.services.cluster_state import cluster_state
+from backend.services.docker_client import SwarmClient, swarm_client
+from backend.services.leader import leader
+from backend.services.throttle import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+_MB = 1024 * 1024
+
+# Column layouts
+TASK_COLUMNS = ("cpu_cores", "memory_bytes", "memory_limit_bytes")
+AGGREGATE_COLUMNS = ("cpu_cores", "memory_bytes", "count")
+
+
+class RingBuffer:
+    """Fixed-capacity time series of float columns in preallocated arrays.
+
+    Appending never allocates; once full, the oldest sample is overwritten.
+    """
+
+    __slots__ = ("capacity", "_ts", "_cols", "_next", "_count")
+
+    def __init__(self, capacity: int, columns: int) -> None:
+        self.capacity = capacity
+        self._ts = array("d", bytes(8 * capacity))
+        self._cols = [array("d", bytes(8 * capacity)) for _ in range(columns)]
+        self._next = 0
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def append(self, ts: float, *values: float) -> None:
+        i = self._next
+        self._ts[i] = ts
+        for col, value in zip(self._cols, values):
+            col[i] = value
+        self._next = (i + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+
+    def latest(self) -> tuple[float, ...] | None:
+        if not self._count:
+            return None
+        i = (self._next - 1) % self.capacity
+        return tuple(col[i] for col in self._cols)
+
+    def window(self, since: float) -> list[list[float]]:
+        """Per-column values with timestamp >= since, oldest first."""
+        start = (self._next - self._count) % self.capacity
+        idxs = [
+            i for i in ((start + k) % self.capacity for k in range(self._count))
+            if self._ts[i] >= since
+        ]
+        return [[col[i] for i in idxs] for col in self._cols]
+
+
+def percentiles(values: list[float]) -> Percentiles:
+    """Nearest-rank percentiles."""
+    if not values:
+        return Percentiles()
+    ordered = sorted(values)
+    n = len(ordered)
+
+    def rank(p: float) -> float:
+        return round(ordered[max(0, math.ceil(p * n) - 1)], 3)
+
+    return Percentiles(p50=rank(0.5), p90=rank(0.9), p99=rank(0.99), max=round(ordered[-1], 3))
+
+
+class StatsCollector:
+    def __init__(self) -> None:
+        self._task: asyncio.Task | None = None
+        self._task_series: dict[str, RingBuffer] = {}
+        self._task_meta: dict[str, TaskRecord] = {}
+        self._cpu_counters: dict[str, tuple[float, float, float]] = {}
+        self._service_series: dict[str, RingBuffer] = {}
+        self._node_series: dict[str, RingBuffer] = {}
+        self._clients: dict[str, SwarmClient] = {}
+        self._limiters: dict[str, RateLimiter] = {}
+        self._local_node_id: str | None = None
+        self._synced_at = 0.0
+        self._sync_lock = asyncio.Lock()
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._poll_loop())
+        logger.info("Stats collector started (interval=%ds)", settings.stats_interval)
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            logger.info("Stats collector stopped")
+        for client in self._clients.values():
+            client.close()
+        self._clients.clear()
+
+    async def _poll_loop(self) -> None:
+        while True:
+            try:
+                if leader.leading():
+                    await self.collect()
+            except Exception as e:
+                logger.error("Stats collection error: %s", e)
+            await asyncio.sleep(settings.stats_interval)
+
+    async def _client_for(self, node_id: str) -> SwarmClient | None:
+        """Docker client able to see containers on node_id, or None if none is configured."""
+        if settings.stats_node_docker_port:
+            if node_id not in self._clients:
+                addr = next((n.addr for n in await cluster_state.nodes() if n.id == node_id), "")
+                if not addr:
+                    return None
+                self._clients[node_id] = SwarmClient(f"tcp://{addr}:{settings.stats_node_docker_port}")
+            return self._clients[node_id]
+        # Without per-node endpoints only the local daemon's containers are visible
+        if self._local_node_id is None:
+            self._local_node_id = await asyncio.to_thread(swarm_client.get_node_id)
+        return swarm_client if node_id == self._local_node_id else None
+
+    async def collect(self) -> int:
+        """Sample every running task once. Returns the number of samples recorded."""
+        tasks = [
+            t for t in await cluster_state.tasks(max_age=settings.stats_interval)
+            if t.state == "running" and t.container_id
+        ]
+        workers = asyncio.Semaphore(settings.stats_workers)
+
+        async def sample(t: TaskRecord) -> tuple[TaskRecord, dict[str, float] | None]:
+            client = await self._client_for(t.node_id)
+            if client is None:
+                return t, None
+            limiter = self._limiters.setdefault(t.node_id, RateLimiter(settings.stats_node_rate))
+            async with workers:
+                await limiter.wait()
+                return t, await asyncio.to_thread(client.container_stats, t.container_id, True)
+
+        results = await asyncio.gather(*(sample(t) for t in tasks), return_exceptions=True)
+        samples: list[list[Any]] = []
+        for result in results:
+            if isinstance(result, BaseException) or result[1] is None:
+                continue
+            t, s = result
+            counters = (s["cpu_total_usage"], s["system_cpu_usage"], s["online_cpus"])
+            previous = self._cpu_counters.get(t.id)
+            self._cpu_counters[t.id] = counters
+            if previous is None:
+                continue  # the first reading only primes the CPU counters
+            system_delta = counters[1] - previous[1]
+            cpu_delta = counters[0] - previous[0]
+            cores = cpu_delta / system_delta * counters[2] if system_delta > 0 and cpu_delta > 0 else 0.0
+            samples.append([t.id, cores, s["memory_bytes"], s["memory_limit_bytes"]])
+
+        round_ = {
+            "ts": time.time(),
+            "live": [[t.id, t.service_name, t.node_id, t.reserved_cpus, t.reserved_memory_mb] for t in tasks],
+            "samples": samples,
+        }
+        self._apply(round_)
+        self._synced_at = round_["ts"]
+        await _save_round(round_)
+        return len(samples)
+
+    async def sync(self) -> None:
+        """Replay the rounds the leader stored since the last sync. A no-op while collecting here."""
+        if self._task is not None:
+            return
+        async with self._sync_lock:
+            for round_ in await _load_rounds(max(self._synced_at, time.time() - _retention())):
+                self._apply(round_)
+                self._synced_at = round_["ts"]
+
+    def _apply(self, round_: dict[str, Any]) -> None:
+        """Add one sampling round to the buffers and drop series of tasks that stopped running."""
+        now = round_["ts"]
+        capacity = settings.stats_buffer_size
+        live = {
+            task_id: TaskRecord(
+                id=task_id, service_id="", service_name=service, node_id=node,
+                reserved_cpus=cpus, reserved_memory_mb=memory_mb,
+            )
+            for task_id, service, node, cpus, memory_mb in round_["live"]
+        }
+        services: dict[str, list[float]] = {}
+        nodes: dict[str, list[float]] = {}
+        for task_id, cores, memory, limit in round_["samples"]:
+            t = live[task_id]
+            series = self._task_series.get(task_id)
+            if series is None:
+                series = self._task_series[task_id] = RingBuffer(capacity, len(TASK_COLUMNS))
+            series.append(now, cores, memory, limit)
+            self._task_meta[task_id] = t
+            for key, agg in ((t.service_name, services), (t.node_id, nodes)):
+                totals = agg.setdefault(key, [0.0, 0.0, 0.0])
+                totals[0] += cores
+                totals[1] += memory
+                totals[2] += 1
+
+        for key, agg, store in (
+            ("service", services, self._service_series),
+            ("node", nodes, self._node_series),
+        ):
+            for name, totals in agg.items():
+                series = store.get(name)
+                if series is None:
+                    series = store[name] = RingBuffer(capacity, len(AGGREGATE_COLUMNS))
+                series.append(now, *totals)
+
+        # Keep memory bounded by what is currently running
+        live_services = {t.service_name for t in live.values()}
+        live_nodes = {t.node_id for t in live.values()}
+        for store, keep in (
+            (self._task_series, live),
+            (self._task_meta, live),
+            (self._cpu_counters, live),
+            (self._service_series, live_services),
+            (self._node_series, live_nodes),
+        ):
+            for key in [k for k in store if k not in keep]:
+                del store[key]
+
+    # --- Queries ---
+
+    def recent_samples(self, service: str, window: float) -> list[dict[str, float]]:
+        """Per-replica mean usage over the last `window` seconds, shaped like container_stats."""
+        since = time.time() - window
+        samples = []
+        for task_id, meta in self._task_meta.items():
+            if meta.service_name != service:
+                continue
+            cpu, mem, limit = self._task_series[task_id].window(since)
+            if cpu:
+                samples.append({
+                    "cpu_cores": sum(cpu) / len(cpu),
+                    "memory_bytes": sum(mem) / len(mem),
+                    "memory_limit_bytes": limit[-1],
+                })
+        return samples
+
+    async def node_utilization(self, window: float) -> list[NodeUtilization]:
+        since = time.time() - window
+        result = []
+        for node in sorted(await cluster_state.nodes(), key=lambda n: n.hostname):
+            cpus = float(node.resources.get("cpus", 0))
+            memory_mb = float(node.resources.get("memory_mb", 0))
+            util = NodeUtilization(id=node.id, hostname=node.hostname, cpus=cpus, memory_mb=memory_mb)
+            series = self._node_series.get(node.id)
+            if series:
+                cpu, mem, count = series.window(since)
+                if cpu:
+                    latest = series.latest()
+                    util.samples = len(cpu)
+                    util.tasks_sampled = int(latest[2])
+                    util.cpu_cores = round(latest[0], 3)
+                    util.memory_used_mb = round(latest[1] / _MB, 1)
+                    if cpus:
+                        util.cpu_percent = round(latest[0] / cpus * 100, 2)
+                        util.cpu_percent_pct = percentiles([c / cpus * 100 for c in cpu])
+                    if memory_mb:
+                        util.memory_percent = round(latest[1] / _MB / memory_mb * 100, 2)
+                        util.memory_percent_pct = percentiles([m / _MB / memory_mb * 100 for m in mem])
+            result.append(util)
+        return result
+
+    def service_utilization(self, window: float, name: str | None = None) -> list[ServiceUtilization]:
+        since = time.time() - window
+        replica_cpu: dict[str, list[float]] = {}
+        replica_mem: dict[str, list[float]] = {}
+        reserved: dict[str, tuple[float, float]] = {}
+        for task_id, meta in self._task_meta.items():
+            if name and meta.service_name != name:
+                continue
+            cpu, mem, _ = self._task_series[task_id].window(since)
+            replica_cpu.setdefault(meta.service_name, []).extend(cpu)
+            replica_mem.setdefault(meta.service_name, []).extend(m / _MB for m in mem)
+            reserved[meta.service_name] = (meta.reserved_cpus, meta.reserved_memory_mb)
+
+        result = []
+        for svc_name in sorted(replica_cpu):
+            series = self._service_series.get(svc_name)
+            latest = series.latest() if series else None
+            cpus, memory_mb = reserved.get(svc_name, (0.0, 0.0))
+            result.append(ServiceUtilization(
+                name=svc_name,
+                replicas_sampled=int(latest[2]) if latest else 0,
+                cpu_cores=round(latest[0], 3) if latest else 0,
+                memory_used_mb=round(latest[1] / _MB, 1) if latest else 0,
+                replica_cpu_cores_pct=percentiles(replica_cpu[svc_name]),
+                replica_memory_mb_pct=percentiles(replica_mem[svc_name]),
+                reserved_cpus=cpus,
+                reserved_memory_mb=memory_mb,
+                samples=len(series.window(since)[0]) if series else 0,
+            ))
+        return result
+
+
+def _retention() -> float:
+    """Seconds of rounds kept in SQLite: as many as a ring buffer holds."""
+    return settings.stats_buffer_size * settings.stats_interval
+
+
+async def _save_round(round_: dict[str, Any]) -> None:
+    db = await get_db()
+    try:
+        await db.execute(
+            "INSERT OR REPLACE INTO stats_rounds (ts, data) VALUES (?, ?)",
+            (round_["ts"], orjson.dumps(round_).decode()),
+        )
+        await db.execute("DELETE FROM stats_rounds WHERE ts < ?", (round_["ts"] - _retention(),))
+        await db.commit()
+    finally:
+        await db.close()
+
+
+async def _load_rounds(after: float) -> list[dict[str, Any]]:
+    db = await get_db()
+    try:
+        rows = await db.execute_fetchall("SELECT data FROM stats_rounds WHERE ts > ? ORDER BY ts", (after,))
+    finally:
+        await db.close()
+    return [orjson.loads(r["data"]) for r in rows]
+
+
+stats_collector = StatsCollector()
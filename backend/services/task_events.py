@@ -0,0 +1,211 @@
+"""Append-only history of swarm task state changes, kept past Docker's task pruning.
+
+Swarm keeps only a few old tasks per slot, so the exit code and error of a crash
+are soon gone. The recorder lists every task on each poll and writes one row
+per (task, state) it has not recorded yet; the failure queries below then read
+SQLite instead of the daemon.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+
+from backend.config import settings
+from backend.database import get_db
+from backend.models.schemas import NodeFailures, ServiceRestarts, TaskEvent
+from backend.services.clusters import clusters
+from backend.services.docker_client import parse_docker_time
+from backend.services.leader import leader
+
+logger = logging.getLogger(__name__)
+
+# Tasks in every desired state, not just running, so ended tasks are seen too
+_ALL_TASKS = {"desired-state": ["running", "shutdown", "accepted"]}
+# Terminal states other than shutdown, which Swarm only uses for tasks it stopped on
+# purpose. Written out literally so SQLite can match the partial idx_task_events_ended.
+_ENDED_SQL = "state IN ('complete', 'failed', 'rejected', 'orphaned')"
+_FAILED_SQL = "state IN ('failed', 'rejected')"
+_PRUNE_INTERVAL = 3600
+
+
+def _since(window: int) -> str:
+    return (datetime.now(timezone.utc) - timedelta(seconds=window)).isoformat(timespec="microseconds")
+
+
+class TaskEventRecorder:
+    def __init__(self) -> None:
+        self._task: asyncio.Task | None = None
+        self._last: dict[tuple[str, str], str] = {}
+        self._pruned_at = 0.0
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._poll_loop())
+        logger.info("Task event recorder started (interval=%ds)", settings.task_events_interval)
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            logger.info("Task event recorder stopped")
+
+    async def _poll_loop(self) -> None:
+        while True:
+            try:
+                if leader.leading():
+                    await self.record()
+                    if time.monotonic() - self._pruned_at >= _PRUNE_INTERVAL:
+                        await self.prune()
+            except Exception as e:
+                logger.error("Task event poll error: %s", e)
+            await asyncio.sleep(settings.task_events_interval)
+
+    async def record(self) -> int:
+        """Store the state of every task whose state changed since the last poll.
+
+        Rows are unique per (task, state), so tasks seen again after a restart
+        or an unreachable cluster are not recorded twice. Returns rows written.
+        """
+        tasks, _ = await clusters.fan_out(lambda c: asyncio.to_thread(c.client.list_tasks, _ALL_TASKS))
+        seen: dict[tuple[str, str], str] = {}
+        rows = []
+        for t in tasks:
+            key = (t.cluster, t.id)
+            seen[key] = t.state
+            if not t.state or self._last.get(key) == t.state:
+                continue
+            rows.append((
+                t.cluster, t.id, t.service_name or t.service_id, t.slot, t.node_id, t.state,
+                t.desired_state, t.exit_code, t.error, t.message, parse_docker_time(t.timestamp),
+            ))
+        self._last = seen
+        if not rows:
+            return 0
+
+        db = await get_db()
+        try:
+            cursor = await db.executemany(
+                """INSERT OR IGNORE INTO task_events
+                   (cluster, task_id, service, slot, node_id, state, desired_state,
+                    exit_code, error, message, ts)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                rows,
+            )
+            await db.commit()
+            return max(cursor.rowcount, 0)
+        finally:
+            await db.close()
+
+    async def prune(self) -> int:
+        """Delete events older than the retention period. Returns rows deleted."""
+        cutoff = _since(settings.task_events_retention_days * 86400)
+        db = await get_db()
+        try:
+            cursor = await db.execute("DELETE FROM task_events WHERE ts < ?", (cutoff,))
+            await db.commit()
+        finally:
+            await db.close()
+        self._pruned_at = time.monotonic()
+        if cursor.rowcount:
+            logger.info("Pruned %d task event(s) older than %s", cursor.rowcount, cutoff)
+        return cursor.rowcount
+
+
+async def list_events(
+    service: str | None = None,
+    node: str | None = None,
+    cluster: str | None = None,
+    state: str | None = None,
+    window: int = 3600,
+    limit: int = 200,
+) -> list[TaskEvent]:
+    """Recorded events from the last `window` seconds, newest first."""
+    where, params = ["ts >= ?"], [_since(window)]
+    for column, value in (("service", service), ("node_id", node), ("cluster", cluster), ("state", state)):
+        if value:
+            where.append(f"{column} = ?")
+            params.append(value)
+    db = await get_db()
+    try:
+        cursor = await db.execute(
+            f"SELECT * FROM task_events WHERE {' AND '.join(where)} ORDER BY ts DESC LIMIT ?",
+            (*params, limit),
+        )
+        rows = await cursor.fetchall()
+    finally:
+        await db.close()
+    return [TaskEvent(**dict(r)) for r in rows]
+
+
+async def restarts_by_service(window: int = 3600, cluster: str | None = None) -> list[ServiceRestarts]:
+    """Tasks per service that ended in the last `window` seconds and were replaced.
+
+    A task that ends in complete, failed, rejected or orphaned is one restart;
+    failed and rejected ones are also counted as failures.
+    """
+    params: list = [_since(window)]
+    cluster_filter = ""
+    if cluster:
+        cluster_filter = "AND cluster = ?"
+        params.append(cluster)
+    db = await get_db()
+    try:
+        # With a single max() aggregate, SQLite takes the bare columns exit_code
+        # and error from the row holding that max, i.e. the latest event.
+        cursor = await db.execute(
+            f"""SELECT service, cluster, COUNT(*) AS restarts,
+                       SUM({_FAILED_SQL}) AS failures,
+                       MAX(ts) AS last_event_at, exit_code AS last_exit_code, error AS last_error
+                FROM task_events
+                WHERE ts >= ? AND {_ENDED_SQL} {cluster_filter}
+                GROUP BY service, cluster
+                ORDER BY restarts DESC, service""",
+            params,
+        )
+        rows = await cursor.fetchall()
+    finally:
+        await db.close()
+    return [ServiceRestarts(**dict(r)) for r in rows]
+
+
+async def failures_by_node(window: int = 86400, cluster: str | None = None) -> list[NodeFailures]:
+    """Failed and rejected tasks per node in the last `window` seconds."""
+    params: list = [_since(window)]
+    cluster_filter = ""
+    if cluster:
+        cluster_filter = "AND cluster = ?"
+        params.append(cluster)
+    db = await get_db()
+    try:
+        cursor = await db.execute(
+            f"""SELECT node_id, cluster, COUNT(*) AS failures,
+                       GROUP_CONCAT(DISTINCT service) AS services,
+                       MAX(ts) AS last_event_at, service AS last_service, error AS last_error
+                FROM task_events
+                WHERE ts >= ? AND {_ENDED_SQL} AND {_FAILED_SQL} {cluster_filter}
+                GROUP BY node_id, cluster
+                ORDER BY failures DESC, node_id""",
+            params,
+        )
+        rows = await cursor.fetchall()
+    finally:
+        await db.close()
+
+    # Hostnames come from the cached node snapshots; nodes that left keep only their ID
+    nodes, _ = await clusters.fan_out(lambda c: c.state.nodes())
+    hostnames = {(n.cluster, n.id): n.hostname for n in nodes}
+    return [
+        NodeFailures(
+            **{**dict(r), "services": sorted((r["services"] or "").split(","))},
+            hostname=hostnames.get((r["cluster"], r["node_id"]), ""),
+        )
+        for r in rows
+    ]
+
+
+task_event_recorder = TaskEventRecorder()
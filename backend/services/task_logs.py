@@ -0,0 +1,159 @@
+"""Service logs read per task and merged into one time-ordered stream.
+
+Docker's service log endpoint interleaves replicas in arrival order and
+applies `tail` to every task, so a 50-replica service returns 50 x tail lines
+in no useful order. Here every task's log is fetched on its own, concurrently
+and with timestamps, and the streams are merged with a heap. Each line is
+labelled with its replica slot and node.
+
+By default the newest `limit` lines are returned: no task is asked for more
+lines than could be returned, and the merge walks back from the newest line. With
+head=True the first `limit` lines from `since` are returned instead; the
+merge pulls lines one at a time and closes every stream once it has enough.
+Either way the result is oldest first.
+"""
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+from collections import deque
+from datetime import datetime, timezone
+from typing import Iterator
+
+from backend.config import settings
+from backend.models.records import TaskRecord
+from backend.models.schemas import TaskLogLine, TaskLogResult
+from backend.services import singleflight
+from backend.services.cluster_state import cluster_state
+from backend.services.docker_client import parse_docker_time, swarm_client
+
+_Line = tuple[str, str]  # (sortable UTC timestamp, message)
+
+
+def _iso(dt: datetime | None) -> str:
+    return dt.astimezone(timezone.utc).isoformat(timespec="microseconds") if dt else ""
+
+
+def _parse(raw: bytes) -> _Line | None:
+    ts, _, message = raw.decode("utf-8", errors="replace").rstrip("\r").partition(" ")
+    if not ts[:1].isdigit():
+        return None
+    return parse_docker_time(ts), message
+
+
+def _read(
+    task_id: str, tty: bool, since: datetime | None, until: str, tail: int | None, errors: dict[str, str]
+) -> Iterator[_Line]:
+    """A task's lines from since to until, oldest first. Stops reading at the first line past until.
+
+    A failure ends the stream early and is recorded in errors, so one
+    unreachable node doesn't fail the whole query.
+    """
+    lo = _iso(since)
+    try:
+        stream = swarm_client.task_logs(task_id, int(since.timestamp()) if since else 0, tail, tty)
+        try:
+            for raw in stream:
+                line = _parse(raw)
+                if line is None or line[0] < lo:
+                    continue
+                if until and line[0] > until:
+                    break
+                yield line
+        finally:
+            stream.close()
+    except Exception as e:
+        errors[task_id] = str(e)
+
+
+def _newest(task_id: str, tty: bool, since: datetime | None, until: str, keep: int, errors: dict) -> list[_Line]:
+    # Docker applies tail before our until filter, so with until the task is read up to it instead
+    return list(deque(_read(task_id, tty, since, until, None if until else keep, errors), maxlen=keep))
+
+
+def _open(task_id: str, tty: bool, since: datetime | None, until: str, errors: dict) -> tuple[list[_Line], Iterator]:
+    """Start a task's stream and read its first line, so the merge doesn't wait on each request in turn."""
+    lines = _read(task_id, tty, since, until, None, errors)
+    first = next(lines, None)
+    return [first] if first else [], lines
+
+
+def _tagged(index: int, lines: Iterator[_Line]) -> Iterator[tuple[str, int, str]]:
+    # The stream index breaks timestamp ties, so equal lines keep their task order
+    for ts, message in lines:
+        yield ts, index, message
+
+
+def _merge(streams: list[Iterator[_Line]], limit: int, reverse: bool) -> tuple[list[tuple[str, int, str]], bool]:
+    """The first `limit` lines of the merged streams, and whether there were more."""
+    tagged = [_tagged(i, lines) for i, lines in enumerate(streams)]
+    merged = list(itertools.islice(heapq.merge(*tagged, reverse=reverse), limit + 1))
+    return merged[:limit], len(merged) > limit
+
+
+def _matches(task: TaskRecord, tasks: list[str] | None, nodes: list[str] | None, hostnames: dict[str, str]) -> bool:
+    if not task.container_id:
+        return False  # never started, so it has no logs
+    if tasks and not any(task.id.startswith(t) or str(task.slot) == t for t in tasks):
+        return False
+    return not nodes or task.node_id in nodes or hostnames.get(task.node_id, "") in nodes
+
+
+async def query(
+    name: str,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    limit: int = 100,
+    tasks: list[str] | None = None,
+    nodes: list[str] | None = None,
+    head: bool = False,
+) -> TaskLogResult:
+    """Merged logs of a service's tasks; see the module docstring.
+
+    tasks matches task ID prefixes or replica slots, nodes matches node IDs or
+    hostnames. Raises docker's NotFound for an unknown service.
+    """
+    (records, tty), node_list = await asyncio.gather(
+        singleflight.to_thread(swarm_client.log_tasks, name), cluster_state.nodes()
+    )
+    hostnames = {n.id: n.hostname for n in node_list}
+    selected = [t for t in records if _matches(t, tasks, nodes, hostnames)]
+    hi = _iso(until)
+    errors: dict[str, str] = {}
+    sem = asyncio.Semaphore(settings.task_logs_concurrency)
+
+    opened: list[Iterator] = []
+
+    async def fetch(task: TaskRecord) -> Iterator[_Line]:
+        async with sem:
+            if head:
+                first, rest = await asyncio.to_thread(_open, task.id, tty, since, hi, errors)
+                opened.append(rest)
+                return itertools.chain(first, rest)
+            # One line more than the limit, so truncated is right even for a single task
+            return reversed(await asyncio.to_thread(_newest, task.id, tty, since, hi, limit + 1, errors))
+
+    try:
+        streams = await asyncio.gather(*(fetch(t) for t in selected))
+        merged, truncated = await asyncio.to_thread(_merge, list(streams), limit, not head)
+    finally:
+        # Stop reading tasks the merge didn't get to the end of
+        for rest in opened:
+            rest.close()
+    if not head:
+        merged.reverse()
+    return TaskLogResult(
+        service=name,
+        items=[
+            TaskLogLine(
+                ts=ts, service=selected[i].service_name or name, task_id=selected[i].id,
+                node_id=selected[i].node_id, message=message, replica=selected[i].slot,
+                node=hostnames.get(selected[i].node_id, ""),
+            )
+            for ts, i, message in merged
+        ],
+        tasks=len(selected),
+        truncated=truncated,
+        errors=errors,
+    )
@@ -0,0 +1,133 @@
+"""Serving the built frontend from an index made at startup.
+
+Every file under frontend/dist is stat'ed once, when the app is created, so
+requests never touch the filesystem to find one. Precompressed `.br` and
+`.gz` siblings written by scripts/precompress.py are served to clients that
+accept them. Vite fingerprints everything under assets/, so those files are
+cached as immutable; index.html is kept in memory and revalidated by ETag.
+Unknown paths get index.html for client-side routing, except under /api and
+/assets, which get a plain 404.
+"""
+from __future__ import annotations
+
+import gzip
+import hashlib
+import mimetypes
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, JSONResponse, PlainTextResponse, Response
+from starlette.types import Receive, Scope, Send
+
+_ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+_IMMUTABLE = "public, max-age=31536000, immutable"
+_REVALIDATE = "no-cache"
+
+
+@dataclass
+class _File:
+    path: Path
+    stat: os.stat_result
+    media_type: str
+    etag: str
+    # Content-Encoding -> precompressed file and its stat
+    variants: dict[str, tuple[Path, os.stat_result]] = field(default_factory=dict)
+
+
+def _etag(stat: os.stat_result, suffix: str = "") -> str:
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}{suffix}"'
+
+
+def _accepted(accept_encoding: str) -> set[str]:
+    """Content codings the client accepts, leaving out those with q=0."""
+    accepted = set()
+    for part in accept_encoding.split(","):
+        coding, *params = part.split(";")
+        q = 1.0
+        for param in params:
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if q > 0:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+class SpaFiles:
+    """ASGI app serving a Vite build directory; mount it after every API route."""
+
+    def __init__(self, directory: Path) -> None:
+        self.files: dict[str, _File] = {}
+        variant_suffixes = {suffix for _, suffix in _ENCODINGS}
+        for path in sorted(directory.rglob("*")):
+            if not path.is_file() or path.suffix in variant_suffixes:
+                continue
+            stat = path.stat()
+            entry = _File(
+                path=path, stat=stat, etag=_etag(stat),
+                media_type=mimetypes.guess_type(path.name)[0] or "application/octet-stream",
+            )
+            for encoding, suffix in _ENCODINGS:
+                variant = path.with_name(path.name + suffix)
+                if variant.is_file():
+                    entry.variants[encoding] = (variant, variant.stat())
+            self.files["/" + path.relative_to(directory).as_posix()] = entry
+
+        index = self.files.get("/index.html")
+        self.index = index.path.read_bytes() if index else b""
+        self.index_etag = f'"{hashlib.sha256(self.index).hexdigest()[:32]}"'
+        # index.html is small; keep compressed copies in memory too
+        self.index_variants = {"gzip": gzip.compress(self.index, mtime=0)}
+        if index and "br" in index.variants:
+            self.index_variants["br"] = index.variants["br"][0].read_bytes()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            return
+        path = scope["path"]
+        if path == "/api" or (path.startswith(("/api/", "/assets/")) and path not in self.files):
+            response: Response = JSONResponse({"detail": "Not Found"}, status_code=404)
+        elif scope["method"] not in ("GET", "HEAD"):
+            response = PlainTextResponse("Method Not Allowed", status_code=405, headers={"Allow": "GET, HEAD"})
+        else:
+            response = self._response(path, Headers(scope=scope))
+        await response(scope, receive, send)
+
+    def _response(self, path: str, headers: Headers) -> Response:
+        accepted = _accepted(headers.get("accept-encoding", ""))
+        entry = self.files.get(path)
+        if entry is None or path == "/index.html":
+            return self._index(headers, accepted)
+
+        cache = _IMMUTABLE if path.startswith("/assets/") else _REVALIDATE
+        encoding = next((e for e, _ in _ENCODINGS if e in accepted and e in entry.variants), None)
+        response_headers = {"Cache-Control": cache}
+        if entry.variants:
+            response_headers["Vary"] = "Accept-Encoding"
+        file, stat, etag = entry.path, entry.stat, entry.etag
+        if encoding:
+            file, stat = entry.variants[encoding]
+            etag = _etag(entry.stat, f"-{encoding}")
+            response_headers["Content-Encoding"] = encoding
+        response_headers["ETag"] = etag
+        if etag in headers.get("if-none-match", ""):
+            return Response(status_code=304, headers=response_headers)
+        return FileResponse(file, headers=response_headers, media_type=entry.media_type, stat_result=stat)
+
+    def _index(self, headers: Headers, accepted: set[str]) -> Response:
+        response_headers = {"Cache-Control": _REVALIDATE, "Vary": "Accept-Encoding"}
+        encoding = next((e for e, _ in _ENCODINGS if e in accepted and e in self.index_variants), None)
+        body, etag = self.index, self.index_etag
+        if encoding:
+            body = self.index_variants[encoding]
+            etag = f'{self.index_etag[:-1]}-{encoding}"'
+            response_headers["Content-Encoding"] = encoding
+        response_headers["ETag"] = etag
+        if etag in headers.get("if-none-match", ""):
+            return Response(status_code=304, headers=response_headers)
+        return Response(body, media_type="text/html", headers=response_headers)
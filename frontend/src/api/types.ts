@@ -1,3 +1,20 @@
+export interface ResourceSpec {
+  cpus: number;
+  memory_mb: number;
+  gpus: number;
+}
+
+export interface AutoscalePolicy {
+  min_replicas: number;
+  max_replicas: number;
+  metric: "cpu" | "memory" | "custom";
+  target: number;
+  metric_url: string | null;
+  cooldown: number;
+  step: number;
+  tolerance: number;
+}
+
 export interface ServiceDefinition {
   image: string;
   replicas: number;
@@ -9,6 +26,8 @@ export interface ServiceDefinition {
   mounts: string[];
   command: string | null;
   build_context: string | null;
+  resources: { reservations: ResourceSpec; limits: ResourceSpec } | null;
+  autoscale: AutoscalePolicy | null;
 }
 
 export interface CatalogService {
@@ -44,6 +63,7 @@ export interface SwarmNode {
     gpus: number;
   };
   services: NodeService[];
+  cluster: string;
 }
 
 export interface ClusterHealth {
@@ -65,6 +85,7 @@ export interface SwarmService {
   ports: string[];
   nodes: string[];
   created_at: string;
+  cluster: string;
 }
 
 export interface SwarmStack {
@@ -76,6 +97,7 @@ export interface SwarmStack {
   desired_replicas: number;
   ports: string[];
   nodes: string[];
+  cluster: string;
 }
 
 export interface ProjectFolder {
@@ -0,0 +1,72 @@
+"""Measure cold-import time of each entry point against the budget in pyproject.toml.
+
+Runs `python -X importtime -c "import <module>"` several times per entry point,
+reports the median cumulative time and the heaviest imports, and exits non-zero
+if an entry point is over budget or imports a module it should defer.
+
+    python scripts/import_budget.py [--runs N]
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tomllib
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)")
+
+
+def measure(module: str) -> dict[str, tuple[int, int]]:
+    """Map of imported module -> (self us, cumulative us) for one cold import."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, env={**os.environ, "PYTHONPATH": str(ROOT)},
+        capture_output=True, text=True,
+    )
+    if proc.returncode:
+        raise SystemExit(f"import {module} failed:\n{proc.stderr[-2000:]}")
+    timings = {}
+    for line in proc.stderr.splitlines():
+        m = _LINE.match(line)
+        if m:
+            timings[m.group(4)] = (int(m.group(1)), int(m.group(2)))
+    return timings
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=8)
+    args = parser.parse_args()
+
+    config = tomllib.loads((ROOT / "pyproject.toml").read_text())["tool"]["import-budget"]
+    failed = False
+    for module, budget_ms in config["entry-points"].items():
+        measure(module)  # warm the bytecode cache
+        runs = [measure(module) for _ in range(args.runs)]
+        total_ms = statistics.median(r[module][1] for r in runs) / 1000
+        over = total_ms > budget_ms
+        print(f"{module}: {total_ms:.0f} ms (budget {budget_ms} ms){'  OVER BUDGET' if over else ''}")
+
+        heaviest: dict[str, int] = {}
+        for name, (_, cumulative) in runs[0].items():
+            root = name.split(".")[0]
+            if name != module and root != module.split(".")[0]:
+                heaviest[root] = max(heaviest.get(root, 0), cumulative)
+        for root, us in sorted(heaviest.items(), key=lambda kv: -kv[1])[:args.top]:
+            print(f"    {us / 1000:8.1f} ms  {root}")
+
+        eager = [name for name in config.get("deferred", []) if name in runs[0]]
+        if eager:
+            print(f"    imported at startup but should be deferred: {', '.join(eager)}")
+        failed |= over or bool(eager)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
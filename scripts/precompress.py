@@ -0,0 +1,53 @@
+"""Write gzip and brotli copies of a frontend build's text files next to them.
+
+backend/spa.py serves `<file>.gz` and `<file>.br` to clients that accept
+them. Brotli copies need the `brotli` package and are skipped without it.
+Copies that would not be smaller than the original are not written.
+
+    python scripts/precompress.py [frontend/dist]
+"""
+from __future__ import annotations
+
+import argparse
+import gzip
+from pathlib import Path
+from typing import Callable
+
+ROOT = Path(__file__).resolve().parent.parent
+SUFFIXES = {".html", ".js", ".mjs", ".css", ".svg", ".json", ".map", ".txt", ".xml", ".wasm", ".ico"}
+MIN_SIZE = 1024
+
+
+def compressors() -> dict[str, Callable[[bytes], bytes]]:
+    found = {".gz": lambda data: gzip.compress(data, compresslevel=9, mtime=0)}
+    try:
+        import brotli
+    except ImportError:
+        print("brotli not installed; writing gzip copies only")
+    else:
+        found[".br"] = lambda data: brotli.compress(data, quality=11)
+    return found
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("directory", nargs="?", type=Path, default=ROOT / "frontend" / "dist")
+    args = parser.parse_args()
+
+    codecs = compressors()
+    original = written = 0
+    for path in sorted(args.directory.rglob("*")):
+        if not path.is_file() or path.suffix not in SUFFIXES or path.stat().st_size < MIN_SIZE:
+            continue
+        data = path.read_bytes()
+        original += len(data)
+        for suffix, compress in codecs.items():
+            packed = compress(data)
+            if len(packed) < len(data):
+                path.with_name(path.name + suffix).write_bytes(packed)
+                written += 1
+    print(f"{written} compressed copies written for {original / 1024:.0f} KiB of text files")
+
+
+if __name__ == "__main__":
+    main()